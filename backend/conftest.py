@@ -1,10 +1,43 @@
 """Pytest configuration for Django."""
 import os
 import django
+import pytest
 from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 def pytest_configure():
     settings.DEBUG = True
+    # Run Celery tasks inline with in-memory broker/results
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    settings.CELERY_BROKER_URL = 'memory://'
+    settings.CELERY_RESULT_BACKEND = 'cache+memory://'
+    # Write SifenLog rows inline so tests see them in their transaction
+    settings.SIFEN_LOG_MODE = 'sync'
     django.setup()
+
+
+@pytest.fixture
+def company():
+    from companies.models import Company
+    return Company.objects.create(
+        ruc="80012345-6",
+        razon_social="Empresa Test S.A.",
+        actividad_economica="47111",
+        departamento="CENTRAL",
+        distrito="SAN LORENZO",
+        ciudad="SAN LORENZO",
+        direccion="Av. España 1234",
+        email="test@example.com",
+    )
+
+
+@pytest.fixture
+def establishment(company):
+    from companies.models import EstablishmentPoint
+    return EstablishmentPoint.objects.create(
+        company=company,
+        codigo_establecimiento="001",
+        codigo_punto="001",
+        descripcion="Casa matriz",
+    )
@@ -0,0 +1,29 @@
+"""Celery application for ERP Paraguay."""
+import os
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+
+# All CELERY_* settings from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load tasks.py from installed apps
+app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def prewarm_sifen_signers(**kwargs):
+    """Pre-load SIFEN certificate keys in each worker process."""
+    from sifen.signer import prewarm_signers
+    prewarm_signers()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_sifen_logs(**kwargs):
+    """Write the buffered SifenLog records before the worker exits."""
+    from sifen.log_sink import flush_sifen_logs
+    flush_sifen_logs()
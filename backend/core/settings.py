@@ -116,6 +116,8 @@ CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
     'http://127.0.0.1:5173',
 ])
 CORS_ALLOW_ALL_ORIGINS = env.bool('CORS_ALLOW_ALL_ORIGINS', default=False)
+# Read by the frontend to request catalogs with ?v=<version> (immutable)
+CORS_EXPOSE_HEADERS = ['X-Catalog-Version']
 
 # Static files (WhiteNoise)
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -126,6 +128,74 @@ SIFEN_API_URL = env('SIFEN_API_URL', default='https://sifen-test.set.gov.py/de/w
 SIFEN_CERT_PATH = env('SIFEN_CERT_PATH', default='')
 SIFEN_CERT_PASSWORD = env('SIFEN_CERT_PASSWORD', default='')
 
+# Multi-tenant certificates: Company.certificado_path (relative to SIFEN_CERT_DIR)
+SIFEN_CERT_DIR = env('SIFEN_CERT_DIR', default='')
+SIFEN_CERT_PASSWORDS = env.dict('SIFEN_CERT_PASSWORDS', default={})  # RUC=password,...
+SIFEN_KEY_CACHE_SIZE = env.int('SIFEN_KEY_CACHE_SIZE', default=64)
+SIFEN_PREWARM_SIGNERS = env.int('SIFEN_PREWARM_SIGNERS', default=20)
+SIFEN_SIGN_WORKERS = env.int('SIFEN_SIGN_WORKERS', default=0)  # bulk signing processes, 0 = CPU count
+
+# Server-side document numbering (invoicing/numbering.py)
+INVOICE_NUMBER_BLOCK_SIZE = env.int('INVOICE_NUMBER_BLOCK_SIZE', default=50)  # numbers leased per worker
+INVOICE_NUMBER_LEASE_TTL = env.int('INVOICE_NUMBER_LEASE_TTL', default=900)  # seconds
+
+# Signed XML storage (InvoiceDocument): 'zstd' or 'gzip', empty = zstd if installed
+SIFEN_XML_COMPRESSION = env('SIFEN_XML_COMPRESSION', default='')
+
+# Cached DE skeletons (emisor part of the XML), one per establishment
+SIFEN_SKELETON_CACHE_SIZE = env.int('SIFEN_SKELETON_CACHE_SIZE', default=256)
+
+# SIFEN HTTP connection pool (per worker process)
+SIFEN_HTTP_MAX_CONNECTIONS = env.int('SIFEN_HTTP_MAX_CONNECTIONS', default=20)
+SIFEN_HTTP_MAX_KEEPALIVE = env.int('SIFEN_HTTP_MAX_KEEPALIVE', default=10)
+SIFEN_HTTP_KEEPALIVE_EXPIRY = env.float('SIFEN_HTTP_KEEPALIVE_EXPIRY', default=60.0)
+SIFEN_HTTP2 = env.bool('SIFEN_HTTP2', default=False)  # requires the h2 package
+SIFEN_TLS_CERT = env('SIFEN_TLS_CERT', default='')  # PEM client cert for mutual TLS
+SIFEN_TLS_KEY = env('SIFEN_TLS_KEY', default='')
+SIFEN_ASYNC_CONCURRENCY = env.int('SIFEN_ASYNC_CONCURRENCY', default=20)
+
+# SifenLog writes (sifen/log_sink.py): 'buffered' (bulk, background thread) or 'sync'
+SIFEN_LOG_MODE = env('SIFEN_LOG_MODE', default='buffered')
+SIFEN_LOG_BUFFER_SIZE = env.int('SIFEN_LOG_BUFFER_SIZE', default=200)  # records per bulk INSERT
+SIFEN_LOG_FLUSH_INTERVAL = env.float('SIFEN_LOG_FLUSH_INTERVAL', default=2.0)  # seconds
+SIFEN_LOG_MAX_PENDING = env.int('SIFEN_LOG_MAX_PENDING', default=10000)  # then write synchronously
+SIFEN_LOG_CAPTURE = env('SIFEN_LOG_CAPTURE', default='full')  # 'full': complete XML compressed, 'truncated'
+
+# SifenLog retention (sifen/log_retention.py): older months archived as .jsonl.gz and dropped
+SIFEN_LOG_RETENTION_MONTHS = env.int('SIFEN_LOG_RETENTION_MONTHS', default=12)
+SIFEN_LOG_ARCHIVE_DIR = env('SIFEN_LOG_ARCHIVE_DIR', default='')  # empty = no automatic retention
+
+# DNIT catalogs (sifen/catalogs/store.py): updated data files and compiled packs
+SIFEN_CATALOG_DIR = env('SIFEN_CATALOG_DIR', default='')  # empty = bundled data only, packs in a private temp dir
+SIFEN_CATALOG_MAX_AGE = env.int('SIFEN_CATALOG_MAX_AGE', default=3600)  # seconds, unversioned catalog URLs
+
+# SIFEN lotes (consulta-lote polling, seconds)
+SIFEN_LOTE_POLL_INITIAL = env.int('SIFEN_LOTE_POLL_INITIAL', default=10)
+SIFEN_LOTE_POLL_MAX = env.int('SIFEN_LOTE_POLL_MAX', default=300)
+SIFEN_LOTE_MAX_POLLS = env.int('SIFEN_LOTE_MAX_POLLS', default=20)
+SIFEN_LOTE_MAX_SUBMITS = env.int('SIFEN_LOTE_MAX_SUBMITS', default=5)  # per invoice, then rejected
+
 # Celery
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)  # run inline (tests/dev)
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_STORE_EAGER_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_RESULT_EXPIRES = 60 * 60 * 24
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'process-sifen-lotes': {
+        'task': 'sifen.tasks.process_lotes_task',
+        'schedule': SIFEN_LOTE_POLL_INITIAL,
+    },
+    'recover-invoice-numbers': {
+        'task': 'invoicing.tasks.recover_numbers_task',
+        'schedule': 60,
+    },
+    'maintain-sifen-logs': {
+        'task': 'sifen.tasks.maintain_sifen_logs_task',
+        'schedule': 60 * 60 * 24,
+    },
+}
@@ -0,0 +1,7 @@
+"""Gunicorn configuration (loaded automatically from the working directory)."""
+
+
+def post_worker_init(worker):
+    """Pre-load SIFEN certificate keys of the most active companies."""
+    from sifen.signer import prewarm_signers
+    prewarm_signers()
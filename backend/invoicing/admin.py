@@ -1,6 +1,6 @@
 """Invoicing admin."""
 from django.contrib import admin
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, DocumentSequence, NumberLease
 
 
 class InvoiceItemInline(admin.TabularInline):
@@ -15,5 +15,20 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_filter = ['status', 'document_type', 'company']
     search_fields = ['numero', 'cdc', 'receptor_nombre', 'receptor_ruc']
     readonly_fields = ['cdc', 'xml_signed']
+    exclude = ['xml_signed_legacy']
     inlines = [InvoiceItemInline]
     date_hierarchy = 'fecha_emision'
+
+
+class NumberLeaseInline(admin.TabularInline):
+    model = NumberLease
+    extra = 0
+    readonly_fields = ['start', 'end', 'owner', 'expires_at', 'created_at']
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ['establishment', 'document_type', 'next_number']
+    list_filter = ['document_type', 'establishment__company']
+    readonly_fields = ['next_number']
+    inlines = [NumberLeaseInline]
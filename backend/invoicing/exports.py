@@ -0,0 +1,134 @@
+"""
+Streaming ZIP export of signed XML (auditors, RG 90/21).
+
+The archive holds one ``<cdc>.xml`` per invoice plus ``manifest.csv``.
+It is produced as a sequence of byte chunks: invoices are read with
+``.iterator(chunk_size=…)`` and each entry is compressed and yielded as
+soon as it is written, so memory does not grow with the period size
+(the manifest spills to a temporary file once it gets large).
+
+Usage:
+    for chunk in stream_xml_zip(export_queryset(company_id, desde, hasta)):
+        out.write(chunk)
+"""
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+from django.utils import timezone
+
+from sifen.compression import decompress
+
+from .models import Invoice
+
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_COLUMNS = ['cdc', 'archivo', 'document_type', 'establecimiento', 'punto', 'numero',
+                    'fecha_emision', 'receptor_ruc', 'total', 'status']
+
+# Invoices fetched per database round trip
+EXPORT_CHUNK_SIZE = 200
+
+# Manifest rows kept in memory before spilling to disk
+MANIFEST_MEMORY_LIMIT = 1024 * 1024
+
+
+def export_queryset(company_id, desde: Optional[date] = None, hasta: Optional[date] = None, queryset=None):
+    """
+    Invoices with signed XML of a company, optionally within a period.
+
+    Args:
+        company_id: Company
+        desde: First day (inclusive)
+        hasta: Last day (inclusive)
+        queryset: Base queryset (default: all invoices)
+
+    Returns:
+        Queryset ordered by fecha_emision, id
+    """
+    queryset = (Invoice.objects.all() if queryset is None else queryset).filter(company_id=company_id)
+    queryset = queryset.with_signed_xml().exclude(cdc__isnull=True)
+    if desde:
+        queryset = queryset.filter(fecha_emision__gte=_day_start(desde))
+    if hasta:
+        queryset = queryset.filter(fecha_emision__lt=_day_start(hasta + timedelta(days=1)))
+    return queryset.order_by('fecha_emision', 'id')
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink for ZipFile; collects bytes until they are taken."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_xml_zip(queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive with the signed XML of each invoice and a manifest.
+
+    Args:
+        queryset: Invoices to export (see export_queryset)
+        chunk_size: Invoices fetched per database round trip
+
+    Yields:
+        Chunks of the ZIP file
+    """
+    rows = queryset.values_list(
+        'cdc', 'document_type', 'establishment__codigo_establecimiento',
+        'establishment__codigo_punto', 'numero', 'fecha_emision',
+        'receptor_ruc', 'total', 'status',
+        'document__codec', 'document__data', 'xml_signed_legacy',
+    )
+    buffer = _ChunkBuffer()
+
+    with tempfile.SpooledTemporaryFile(max_size=MANIFEST_MEMORY_LIMIT, mode='w+', encoding='UTF-8',
+                                       newline='') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(MANIFEST_COLUMNS)
+
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for (cdc, document_type, est, punto, numero, fecha, ruc, total, status,
+                 codec, data, legacy) in rows.iterator(chunk_size=chunk_size):
+                name = f'{cdc}.xml'
+                info = zipfile.ZipInfo(name, date_time=timezone.localtime(fecha).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, decompress(codec, data) if codec else legacy.encode('UTF-8'))
+                writer.writerow([cdc, name, document_type, est, punto, f'{numero:07d}',
+                                 fecha.isoformat(), ruc, total, status])
+                yield buffer.take()
+
+            manifest.seek(0)
+            with archive.open(MANIFEST_NAME, 'w') as entry:
+                while True:
+                    block = manifest.read(64 * 1024)
+                    if not block:
+                        break
+                    entry.write(block.encode('UTF-8'))
+                    yield buffer.take()
+
+    yield buffer.take()
+
+
+def export_filename(company_id, desde: Optional[date] = None, hasta: Optional[date] = None) -> str:
+    """Download name, e.g. ``xml_1_2024-01-01_2024-01-31.zip``."""
+    parts = ['xml', str(company_id)]
+    parts += [d.isoformat() for d in (desde, hasta) if d]
+    return '_'.join(parts) + '.zip'
@@ -0,0 +1,289 @@
+"""
+Streaming invoice import (CSV / JSONL) for migrations from legacy systems.
+
+Records are read one at a time, validated with InvoiceCreateSerializer,
+and inserted in chunks (one transaction and two bulk INSERTs per chunk).
+After every committed chunk the byte offset of the next record is written
+to a checkpoint file, so an interrupted import resumes where it stopped.
+
+JSONL: one invoice per line, same shape as the create API (``items`` list).
+
+CSV: one row per item; invoice columns are repeated on each row and item
+columns are prefixed with ``item_`` (item_descripcion, item_cantidad,
+item_precio_unitario, item_tasa_iva, ...). Consecutive rows with the same
+``ref`` column (or company/establishment/document_type/numero when there is
+no ``ref``) form one invoice.
+
+Explicit numbers raise the document sequence when their chunk is saved
+(see numbering.advance_sequences). Records without ``numero`` get one from
+the sequence only when their chunk is saved; numbers of records that then
+fail are given back.
+"""
+import csv
+import json
+import os
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+from django.db import IntegrityError
+from rest_framework import serializers
+
+from .numbering import allocate_number, give_back_number
+from .serializers import InvoiceCreateSerializer, save_built_invoices
+
+ITEM_PREFIX = "item_"
+
+
+class _LineReader:
+    """Iterates decoded lines of a binary file, tracking the byte offset."""
+
+    def __init__(self, f, offset: int = 0):
+        self.f = f
+        self.offset = offset
+        self.line = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        raw = self.f.readline()
+        if not raw:
+            raise StopIteration
+        self.offset += len(raw)
+        self.line += 1
+        return raw.decode("UTF-8-sig" if self.offset == len(raw) else "UTF-8")
+
+
+def _reset(entry):
+    """Forget the pks a rolled-back bulk INSERT assigned."""
+    invoice, items = entry
+    for obj in [invoice, *items]:
+        obj.pk = None
+        obj._state.adding = True
+
+
+class _CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks up each company/establishment once per import."""
+
+    def to_internal_value(self, data):
+        cache = self.context.setdefault("related_cache", {})
+        key = (self.field_name, str(data))
+        if key not in cache:
+            cache[key] = super().to_internal_value(data)
+        return cache[key]
+
+
+class ImportInvoiceSerializer(InvoiceCreateSerializer):
+    """InvoiceCreateSerializer with cached related lookups."""
+
+    def next_number(self, validated_data):
+        return None  # Allocated when the chunk is saved
+
+    def build_relational_field(self, field_name, relation_info):
+        field_class, field_kwargs = super().build_relational_field(field_name, relation_info)
+        if field_class is serializers.PrimaryKeyRelatedField:
+            field_class = _CachedPrimaryKeyRelatedField
+        return field_class, field_kwargs
+
+
+class InvoiceImporter:
+    """Imports invoices from a CSV or JSONL file in chunks."""
+
+    def __init__(
+        self,
+        path: str,
+        format: Optional[str] = None,
+        chunk_size: int = 500,
+        checkpoint_path: Optional[str] = None,
+        defaults: Optional[dict] = None,
+        status: Optional[str] = None,
+        on_error: Optional[Callable[[int, object], None]] = None,
+        on_chunk: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        Args:
+            path: CSV or JSONL file
+            format: "csv" or "jsonl" (default: from the file extension)
+            chunk_size: Invoices per transaction
+            checkpoint_path: Progress file (default: <path>.checkpoint)
+            defaults: Values for fields missing in a record (e.g. company)
+            status: Status of imported invoices (default: draft)
+            on_error: Called with (line, errors) for every rejected record
+            on_chunk: Called with the progress dict after every chunk
+        """
+        self.path = path
+        self.format = format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        self.chunk_size = max(1, chunk_size)
+        self.checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+        self.defaults = defaults or {}
+        self.status = status
+        self.on_error = on_error or (lambda line, errors: None)
+        self.on_chunk = on_chunk or (lambda progress: None)
+        self.context = {}
+
+    # Checkpoint
+
+    def load_checkpoint(self) -> dict:
+        """Saved progress of this file, or a fresh one."""
+        fresh = {"offset": 0, "line": 0, "imported": 0, "failed": 0}
+        if not os.path.exists(self.checkpoint_path):
+            return fresh
+        with open(self.checkpoint_path, encoding="UTF-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("size") is not None and checkpoint["size"] > os.path.getsize(self.path):
+            raise ValueError("El checkpoint no corresponde a este archivo")
+        return {**fresh, **checkpoint}
+
+    def save_checkpoint(self, progress: dict):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="UTF-8") as f:
+            json.dump({**progress, "path": os.path.abspath(self.path), "size": os.path.getsize(self.path)}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # Readers: yield (line, record, offset and line count after the record)
+
+    def _read_jsonl(self, f, offset: int, line: int) -> Iterator[Tuple[int, object, int, int]]:
+        reader = _LineReader(f, offset)
+        reader.line = line
+        for text in reader:
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                record = e
+            yield reader.line, record, reader.offset, reader.line
+
+    def _read_csv(self, f, offset: int, line: int) -> Iterator[Tuple[int, object, int, int]]:
+        # The header is always read from the start, even when resuming
+        f.seek(0)
+        header_reader = _LineReader(f)
+        columns = next(csv.reader(header_reader))
+        if offset > header_reader.offset:
+            f.seek(offset)
+        else:
+            offset, line = header_reader.offset, header_reader.line
+
+        reader = _LineReader(f, offset)
+        reader.line = line
+        rows = csv.DictReader(reader, fieldnames=columns)
+
+        record, key, first_line = None, None, None
+        previous_offset, previous_line = reader.offset, reader.line
+        for row in rows:
+            row_key = row.get("ref") or (
+                row.get("company"), row.get("establishment"), row.get("document_type"), row.get("numero"),
+            )
+            if record is not None and row_key != key:
+                yield first_line, record, previous_offset, previous_line
+                record = None
+
+            if record is None:
+                key, first_line = row_key, reader.line
+                record = {
+                    k: v for k, v in row.items()
+                    if k and k != "ref" and not k.startswith(ITEM_PREFIX) and v not in ("", None)
+                }
+                record["items"] = []
+
+            item = {
+                k[len(ITEM_PREFIX):]: v for k, v in row.items()
+                if k and k.startswith(ITEM_PREFIX) and v not in ("", None)
+            }
+            if item:
+                record["items"].append(item)
+            previous_offset, previous_line = reader.offset, reader.line
+
+        if record is not None:
+            yield first_line, record, reader.offset, reader.line
+
+    # Import
+
+    def _validate(self, record):
+        """Returns ((invoice, items), None) or (None, errors)."""
+        if not isinstance(record, dict):
+            return None, str(record)
+        data = {**self.defaults, **record}
+        serializer = ImportInvoiceSerializer(data=data, context=self.context)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        invoice, items = serializer.build(serializer.validated_data)
+        if self.status:
+            invoice.status = self.status
+        return (invoice, items), None
+
+    def _save_chunk(self, chunk: list) -> int:
+        """Insert a chunk; on a conflict, fall back to one invoice at a time."""
+        built = [entry for _, entry in chunk]
+        allocated = set()
+        for invoice, _ in built:
+            if invoice.numero is None:
+                invoice.numero = allocate_number(invoice.establishment, invoice.document_type)
+                allocated.add(id(invoice))
+        try:
+            save_built_invoices(built)
+            return 0
+        except IntegrityError:
+            failed = 0
+            for line, entry in chunk:
+                _reset(entry)
+                try:
+                    save_built_invoices([entry])
+                except IntegrityError as e:
+                    failed += 1
+                    self.on_error(line, str(e))
+                    invoice = entry[0]
+                    if id(invoice) in allocated:
+                        give_back_number(invoice.establishment, invoice.document_type, invoice.numero)
+            return failed
+
+    def run(self, resume: bool = False) -> dict:
+        """
+        Import the file.
+
+        Args:
+            resume: Continue from the checkpoint instead of the start
+
+        Returns:
+            Progress dict with imported, failed, line, offset and rate
+        """
+        progress = self.load_checkpoint() if resume else {"offset": 0, "line": 0, "imported": 0, "failed": 0}
+        progress["rate"] = 0.0
+        start = time.time()
+        imported_at_start = progress["imported"]
+
+        def flush(chunk, next_offset, next_line):
+            failed = self._save_chunk(chunk) if chunk else 0
+            progress["imported"] += len(chunk) - failed
+            progress["failed"] += failed
+            progress["offset"] = next_offset
+            progress["line"] = next_line
+            self.save_checkpoint(progress)
+            elapsed = max(time.time() - start, 1e-6)
+            progress["rate"] = round((progress["imported"] - imported_at_start) / elapsed, 1)
+            self.on_chunk(dict(progress))
+
+        with open(self.path, "rb") as f:
+            f.seek(progress["offset"])
+            read = self._read_csv if self.format == "csv" else self._read_jsonl
+            chunk, pending = [], 0
+            last_offset, last_line = progress["offset"], progress["line"]
+
+            for line, record, next_offset, next_line in read(f, progress["offset"], progress["line"]):
+                entry, errors = self._validate(record)
+                if errors is not None:
+                    progress["failed"] += 1
+                    self.on_error(line, errors)
+                else:
+                    chunk.append((line, entry))
+                pending += 1
+                last_offset, last_line = next_offset, next_line
+
+                if pending >= self.chunk_size:
+                    flush(chunk, last_offset, last_line)
+                    chunk, pending = [], 0
+
+            if pending:
+                flush(chunk, last_offset, last_line)
+
+        return progress
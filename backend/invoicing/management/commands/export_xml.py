@@ -0,0 +1,33 @@
+"""Export the signed XML of a company and period as a ZIP file."""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoicing.exports import export_queryset, export_filename, stream_xml_zip
+
+
+class Command(BaseCommand):
+    help = "Exporta en un ZIP los XML firmados de una empresa (un archivo por CDC y un manifiesto)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, help='ID de la empresa')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--output', help='Archivo ZIP (default: xml_<empresa>_<desde>_<hasta>.zip)')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Facturas leídas por consulta (default: 200)')
+
+    def handle(self, *args, **options):
+        desde, hasta = options['desde'], options['hasta']
+        output = options['output'] or export_filename(options['company'], desde, hasta)
+        queryset = export_queryset(options['company'], desde, hasta)
+        count = queryset.count()
+
+        try:
+            with open(output, 'wb') as f:
+                for chunk in stream_xml_zip(queryset, chunk_size=options['chunk_size']):
+                    f.write(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"{count} XML exportados a {output}"))
@@ -0,0 +1,58 @@
+"""Import invoices from a CSV or JSONL file (resumable)."""
+from django.core.management.base import BaseCommand, CommandError
+
+from invoicing.importers import InvoiceImporter
+from invoicing.models import InvoiceStatus
+
+
+class Command(BaseCommand):
+    help = "Importa facturas desde un archivo CSV o JSONL por lotes, con reanudación"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV o JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Formato del archivo (default: según la extensión)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Facturas por transacción (default: 500)')
+        parser.add_argument('--checkpoint', help='Archivo de progreso (default: <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continuar desde el último lote confirmado')
+        parser.add_argument('--company', type=int, help='Empresa para filas sin columna company')
+        parser.add_argument('--establishment', type=int,
+                            help='Establecimiento para filas sin columna establishment')
+        parser.add_argument('--status', choices=InvoiceStatus.values,
+                            help='Estado de las facturas importadas (default: draft)')
+
+    def handle(self, *args, **options):
+        defaults = {
+            key: options[key] for key in ('company', 'establishment') if options[key] is not None
+        }
+
+        def on_error(line, errors):
+            self.stderr.write(f"Línea {line}: {errors}")
+
+        def on_chunk(progress):
+            self.stdout.write(
+                f"Línea {progress['line']}: {progress['imported']} importadas, "
+                f"{progress['failed']} con errores ({progress['rate']:.1f} facturas/s)"
+            )
+
+        importer = InvoiceImporter(
+            options['path'],
+            format=options['format'],
+            chunk_size=options['chunk_size'],
+            checkpoint_path=options['checkpoint'],
+            defaults=defaults,
+            status=options['status'],
+            on_error=on_error,
+            on_chunk=on_chunk,
+        )
+        try:
+            progress = importer.run(resume=options['resume'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación finalizada: {progress['imported']} facturas, "
+            f"{progress['failed']} con errores ({progress['rate']:.1f} facturas/s)"
+        ))
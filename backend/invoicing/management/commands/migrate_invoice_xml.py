@@ -0,0 +1,46 @@
+"""Move signed XML from the invoice table to compressed InvoiceDocument rows."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from invoicing.models import Invoice, InvoiceDocument
+
+
+class Command(BaseCommand):
+    help = "Mueve el XML firmado de la tabla de facturas a InvoiceDocument (comprimido), por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Facturas por transacción (default: 500)')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        moved = raw_bytes = stored_bytes = 0
+        last_pk = 0
+
+        while True:
+            rows = list(
+                Invoice.objects
+                .filter(pk__gt=last_pk)
+                .exclude(xml_signed_legacy='')
+                .order_by('pk')
+                .values_list('pk', 'cdc', 'xml_signed_legacy')[:batch_size]
+            )
+            if not rows:
+                break
+
+            documents = [InvoiceDocument.build(Invoice(pk=pk, cdc=cdc), xml) for pk, cdc, xml in rows]
+            with transaction.atomic():
+                # An existing document was written after the legacy XML: keep it
+                InvoiceDocument.objects.bulk_create(documents, ignore_conflicts=True)
+                Invoice.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(xml_signed_legacy='')
+
+            last_pk = rows[-1][0]
+            moved += len(rows)
+            raw_bytes += sum(document.size for document in documents)
+            stored_bytes += sum(len(document.data) for document in documents)
+            self.stdout.write(f"{moved} facturas migradas (hasta id {last_pk})")
+
+        ratio = f" ({raw_bytes / stored_bytes:.1f}x)" if stored_bytes else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Migración finalizada: {moved} XML, {raw_bytes} → {stored_bytes} bytes{ratio}"
+        ))
@@ -0,0 +1,12 @@
+"""Free the unused numbers of expired numbering leases."""
+from django.core.management.base import BaseCommand
+
+from invoicing.numbering import recover_numbers
+
+
+class Command(BaseCommand):
+    help = "Recupera los números reservados y no usados de reservas vencidas"
+
+    def handle(self, *args, **options):
+        recovered = recover_numbers()
+        self.stdout.write(f"Números recuperados: {recovered}")
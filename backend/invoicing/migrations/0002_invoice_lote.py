@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0001_initial'),
+        ('sifen', '0002_sifenlote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='lote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='sifen.sifenlote'),
+        ),
+    ]
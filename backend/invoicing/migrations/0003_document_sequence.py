@@ -0,0 +1,63 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def blank_cdc_to_null(apps, schema_editor):
+    Invoice = apps.get_model('invoicing', 'Invoice')
+    Invoice.objects.filter(cdc='').update(cdc=None)
+
+
+def null_cdc_to_blank(apps, schema_editor):
+    Invoice = apps.get_model('invoicing', 'Invoice')
+    Invoice.objects.filter(cdc__isnull=True).update(cdc='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('invoicing', '0002_invoice_lote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='cdc',
+            field=models.CharField(blank=True, max_length=44, null=True, unique=True),
+        ),
+        migrations.RunPython(blank_cdc_to_null, null_cdc_to_blank),
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('1', 'Factura Electrónica'), ('2', 'Factura Electrónica de Exportación'), ('3', 'Factura Electrónica de Importación'), ('4', 'Autofactura Electrónica'), ('5', 'Nota de Crédito Electrónica'), ('6', 'Nota de Débito Electrónica'), ('7', 'Nota de Remisión Electrónica')], default='1', max_length=2)),
+                ('next_number', models.PositiveIntegerField(default=1)),
+                ('establishment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sequences', to='companies.establishmentpoint')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de numeración',
+                'verbose_name_plural': 'Secuencias de numeración',
+                'unique_together': {('establishment', 'document_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='NumberLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('owner', models.CharField(blank=True, max_length=100)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leases', to='invoicing.documentsequence')),
+            ],
+            options={
+                'verbose_name': 'Reserva de numeración',
+                'verbose_name_plural': 'Reservas de numeración',
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['sequence', 'owner', 'start'], name='invoicing_n_sequenc_b3cf54_idx'), models.Index(fields=['expires_at'], name='invoicing_n_expires_5c6373_idx')],
+            },
+        ),
+    ]
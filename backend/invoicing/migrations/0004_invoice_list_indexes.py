@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0003_document_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='invoice',
+            options={'ordering': ['-fecha_emision', '-id'], 'verbose_name': 'Factura', 'verbose_name_plural': 'Facturas'},
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['fecha_emision', 'id'], name='invoicing_i_fecha_e_0093ec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'status', 'fecha_emision', 'id'], name='invoicing_i_company_e505bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'document_type', 'fecha_emision', 'id'], name='invoicing_i_company_8316fd_idx'),
+        ),
+    ]
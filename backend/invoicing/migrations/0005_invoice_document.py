@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0004_invoice_list_indexes'),
+    ]
+
+    operations = [
+        # Same column, new attribute name: xml_signed is now a property
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='invoice',
+                    old_name='xml_signed',
+                    new_name='xml_signed_legacy',
+                ),
+                migrations.AlterField(
+                    model_name='invoice',
+                    name='xml_signed_legacy',
+                    field=models.TextField(blank=True, db_column='xml_signed'),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InvoiceDocument',
+            fields=[
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='invoicing.invoice')),
+                ('cdc', models.CharField(blank=True, db_index=True, max_length=44)),
+                ('codec', models.CharField(max_length=10)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Documento XML',
+                'verbose_name_plural': 'Documentos XML',
+            },
+        ),
+    ]
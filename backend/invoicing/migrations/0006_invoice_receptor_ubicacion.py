@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0005_invoice_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='receptor_ciudad',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='receptor_departamento',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='receptor_distrito',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0007_invoice_status_queued'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='lote_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='lote_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0008_invoice_lote_attempts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Borrador'), ('pending', 'Pendiente de envío'), ('queued', 'En cola para envío por lote'), ('sending', 'Enviando a SIFEN'), ('sent', 'Enviado a SIFEN'), ('approved', 'Aprobado'), ('rejected', 'Rechazado'), ('cancelled', 'Anulado')], default='draft', max_length=20),
+        ),
+    ]
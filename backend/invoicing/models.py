@@ -1,6 +1,14 @@
 """Invoicing models for ERP Paraguay."""
-from django.db import models
+import hashlib
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Q
 from companies.models import Company, EstablishmentPoint
+from sifen.compression import compress, decompress
+
+
+CENTAVOS = Decimal('0.01')
 
 
 class DocumentType(models.TextChoices):
@@ -18,12 +26,21 @@ class InvoiceStatus(models.TextChoices):
     """Estados del documento electrónico."""
     DRAFT = 'draft', 'Borrador'
     PENDING = 'pending', 'Pendiente de envío'
+    QUEUED = 'queued', 'En cola para envío por lote'
+    SENDING = 'sending', 'Enviando a SIFEN'
     SENT = 'sent', 'Enviado a SIFEN'
     APPROVED = 'approved', 'Aprobado'
     REJECTED = 'rejected', 'Rechazado'
     CANCELLED = 'cancelled', 'Anulado'
 
 
+class InvoiceQuerySet(models.QuerySet):
+    
+    def with_signed_xml(self):
+        """Invoices whose signed XML is stored (document or legacy column)."""
+        return self.filter(Q(document__isnull=False) | ~Q(xml_signed_legacy=''))
+
+
 class Invoice(models.Model):
     """Documento electrónico (Factura, Nota de Crédito, etc.)."""
     
@@ -45,10 +62,10 @@ class Invoice(models.Model):
         choices=DocumentType.choices,
         default=DocumentType.FACTURA_ELECTRONICA
     )
-    numero = models.PositiveIntegerField()  # 0000001-9999999
+    numero = models.PositiveIntegerField()  # 0000001-9999999 (see numbering.py)
     
-    # CDC (Código de Control) - 44 caracteres
-    cdc = models.CharField(max_length=44, unique=True, blank=True)
+    # CDC (Código de Control) - 44 caracteres; NULL until generated
+    cdc = models.CharField(max_length=44, unique=True, null=True, blank=True)
     
     # Timbrado
     timbrado = models.CharField(max_length=8)
@@ -57,6 +74,9 @@ class Invoice(models.Model):
     receptor_ruc = models.CharField(max_length=12, blank=True)
     receptor_nombre = models.CharField(max_length=255)
     receptor_direccion = models.TextField(blank=True)
+    receptor_departamento = models.CharField(max_length=50, blank=True)
+    receptor_distrito = models.CharField(max_length=100, blank=True)
+    receptor_ciudad = models.CharField(max_length=100, blank=True)
     receptor_email = models.EmailField(blank=True)
     
     # Fechas
@@ -87,9 +107,20 @@ class Invoice(models.Model):
     sifen_response_code = models.CharField(max_length=10, blank=True)
     sifen_response_message = models.TextField(blank=True)
     sifen_batch_id = models.CharField(max_length=50, blank=True)
+    lote = models.ForeignKey(
+        'sifen.SifenLote',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='invoices'
+    )
+    # Envíos por lote sin respuesta de SIFEN (ver sifen/lotes.py)
+    lote_attempts = models.PositiveSmallIntegerField(default=0)
+    lote_retry_at = models.DateTimeField(null=True, blank=True)
     
-    # XML firmado
-    xml_signed = models.TextField(blank=True)
+    # XML firmado: comprimido en InvoiceDocument (ver xml_signed). La columna
+    # solo conserva filas antiguas hasta correr migrate_invoice_xml.
+    xml_signed_legacy = models.TextField(blank=True, db_column='xml_signed')
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -104,12 +135,73 @@ class Invoice(models.Model):
     class Meta:
         verbose_name = 'Factura'
         verbose_name_plural = 'Facturas'
-        ordering = ['-fecha_emision']
+        ordering = ['-fecha_emision', '-id']
         unique_together = ['company', 'establishment', 'document_type', 'numero']
+        indexes = [
+            # Keyset pagination (see pagination.py) and the usual list filters
+            models.Index(fields=['fecha_emision', 'id']),
+            models.Index(fields=['company', 'status', 'fecha_emision', 'id']),
+            models.Index(fields=['company', 'document_type', 'fecha_emision', 'id']),
+        ]
+    
+    objects = InvoiceQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.get_document_type_display()} {self.numero_completo}"
     
+    @property
+    def xml_signed(self) -> str:
+        """
+        Signed XML, loaded (and decompressed) from InvoiceDocument on first access.
+        
+        Use select_related('document') to load many invoices at once.
+        """
+        if not hasattr(self, '_xml_signed'):
+            try:
+                document = self.document if self.pk else None
+            except InvoiceDocument.DoesNotExist:
+                document = None
+            self._xml_signed = document.xml if document else self.xml_signed_legacy
+        return self._xml_signed
+    
+    @xml_signed.setter
+    def xml_signed(self, value: str):
+        self._xml_signed = value or ''
+        self._xml_signed_changed = True
+    
+    def save(self, *args, **kwargs):
+        """Guardar y, si cambió, almacenar el XML firmado comprimido."""
+        if not getattr(self, '_xml_signed_changed', False):
+            return super().save(*args, **kwargs)
+        self.xml_signed_legacy = ''
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            InvoiceDocument.store(self, self._xml_signed)
+            self._xml_signed_changed = False
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.__dict__.pop('_xml_signed', None)
+        self._state.fields_cache.pop('document', None)
+        self._xml_signed_changed = False
+    
+    def calculate_totals(self, items):
+        """Calcular subtotales e IVA de la factura en una sola pasada por los ítems."""
+        subtotales = {10: Decimal('0'), 5: Decimal('0'), 0: Decimal('0')}
+        ivas = {10: Decimal('0'), 5: Decimal('0'), 0: Decimal('0')}
+        total = Decimal('0')
+        for item in items:
+            subtotales[item.tasa_iva] += item.subtotal
+            ivas[item.tasa_iva] += item.iva
+            total += item.total
+        
+        self.subtotal_gravado_10 = subtotales[10]
+        self.subtotal_gravado_5 = subtotales[5]
+        self.subtotal_exento = subtotales[0]
+        self.total_iva_10 = ivas[10]
+        self.total_iva_5 = ivas[5]
+        self.total = total
+    
     @property
     def numero_completo(self):
         """Número completo: establecimiento-punto-numero."""
@@ -120,6 +212,127 @@ class Invoice(models.Model):
         )
 
 
+class InvoiceDocument(models.Model):
+    """
+    XML firmado de una factura, comprimido y fuera de la tabla de facturas.
+    
+    Se busca por CDC; sha256 y size son del XML sin comprimir.
+    """
+    
+    invoice = models.OneToOneField(
+        Invoice,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document'
+    )
+    cdc = models.CharField(max_length=44, db_index=True, blank=True)
+    codec = models.CharField(max_length=10)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Documento XML'
+        verbose_name_plural = 'Documentos XML'
+    
+    def __str__(self):
+        return f"{self.cdc} ({self.codec}, {self.size} bytes)"
+    
+    @classmethod
+    def build(cls, invoice, xml: str) -> 'InvoiceDocument':
+        """Compress an XML string into an unsaved document."""
+        raw = xml.encode('UTF-8')
+        codec, data = compress(raw)
+        return cls(
+            invoice=invoice,
+            cdc=invoice.cdc or '',
+            codec=codec,
+            data=data,
+            size=len(raw),
+            sha256=hashlib.sha256(raw).hexdigest(),
+        )
+    
+    @classmethod
+    def store(cls, invoice, xml: str):
+        """Replace the stored XML of an invoice (empty deletes it)."""
+        if not xml:
+            cls.objects.filter(invoice=invoice).delete()
+        else:
+            document = cls.build(invoice, xml)
+            cls.objects.update_or_create(
+                invoice=invoice,
+                defaults={
+                    field: getattr(document, field)
+                    for field in ('cdc', 'codec', 'data', 'size', 'sha256')
+                },
+            )
+        # Drop the cached reverse relation
+        invoice._state.fields_cache.pop('document', None)
+    
+    @property
+    def xml(self) -> str:
+        return decompress(self.codec, self.data).decode('UTF-8')
+
+
+class DocumentSequence(models.Model):
+    """Secuencia de numeración por establecimiento/punto y tipo de documento."""
+    
+    establishment = models.ForeignKey(
+        EstablishmentPoint,
+        on_delete=models.CASCADE,
+        related_name='sequences'
+    )
+    document_type = models.CharField(
+        max_length=2,
+        choices=DocumentType.choices,
+        default=DocumentType.FACTURA_ELECTRONICA
+    )
+    
+    # Primer número aún no reservado por ningún proceso
+    next_number = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        verbose_name = 'Secuencia de numeración'
+        verbose_name_plural = 'Secuencias de numeración'
+        unique_together = ['establishment', 'document_type']
+    
+    def __str__(self):
+        return f"{self.establishment} ({self.get_document_type_display()}): {self.next_number}"
+
+
+class NumberLease(models.Model):
+    """
+    Rango de números [start, end) reservado por un proceso.
+    
+    Sin owner, el rango está libre: son números reservados que nunca se
+    usaron y se vuelven a entregar antes de reservar un bloque nuevo.
+    """
+    
+    sequence = models.ForeignKey(
+        DocumentSequence,
+        on_delete=models.CASCADE,
+        related_name='leases'
+    )
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()  # exclusivo
+    owner = models.CharField(max_length=100, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Reserva de numeración'
+        verbose_name_plural = 'Reservas de numeración'
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['sequence', 'owner', 'start']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.sequence_id}: {self.start}-{self.end - 1} ({self.owner or 'libre'})"
+
+
 class InvoiceItem(models.Model):
     """Línea/ítem de factura."""
     
@@ -158,13 +371,21 @@ class InvoiceItem(models.Model):
     def __str__(self):
         return f"{self.descripcion} x {self.cantidad}"
     
-    def save(self, *args, **kwargs):
-        """Calcular totales antes de guardar."""
-        self.subtotal = (self.cantidad * self.precio_unitario) - self.descuento
+    def calculate(self):
+        """Calcular subtotal, IVA y total del ítem (sin consultar la base)."""
+        self.subtotal = (
+            Decimal(self.cantidad) * Decimal(self.precio_unitario) - Decimal(self.descuento)
+        ).quantize(CENTAVOS)
         if self.tasa_iva > 0:
             # IVA incluido en Paraguay
-            self.iva = self.subtotal - (self.subtotal / (1 + self.tasa_iva / 100))
+            self.iva = (
+                self.subtotal - self.subtotal / (1 + Decimal(self.tasa_iva) / 100)
+            ).quantize(CENTAVOS)
         else:
-            self.iva = 0
+            self.iva = Decimal('0')
         self.total = self.subtotal
+    
+    def save(self, *args, **kwargs):
+        """Calcular totales antes de guardar."""
+        self.calculate()
         super().save(*args, **kwargs)
@@ -0,0 +1,374 @@
+"""
+Server-side document numbering.
+
+Numbers come from one DocumentSequence row per (establishment/punto,
+document type). Allocating never locks that row per invoice: each worker
+process leases a block of INVOICE_NUMBER_BLOCK_SIZE numbers with a single
+``UPDATE ... SET next_number = next_number + n`` (no SELECT ... FOR UPDATE)
+and then hands them out from memory.
+
+Every block is recorded as a NumberLease. When a worker exits, or its lease
+expires (crash), recover_numbers() turns the numbers no Invoice used into
+free ranges, which are handed out again before any new block is leased.
+
+Numbers given explicitly (API, bulk, import) raise next_number past them
+when saved (advance_sequences), and numbers inside a lease are refused
+(number_reserved), so the allocator never hands them out again.
+
+Usage:
+    numero = allocate_number(establishment, document_type)
+"""
+import atexit
+import os
+import socket
+import threading
+import uuid
+from collections import deque
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import DocumentSequence, NumberLease
+
+# 0000001-9999999 (dNumDoc has 7 digits)
+MAX_NUMERO = 9999999
+
+# Stop using a lease this long before it expires, so recovery never frees
+# a number that is about to be saved
+LEASE_SAFETY_MARGIN = timedelta(seconds=30)
+
+
+def get_sequence(establishment, document_type) -> DocumentSequence:
+    """
+    Get (or create) the sequence of an establishment and document type.
+
+    A new sequence continues after the highest number already used.
+    """
+    from .models import Invoice
+
+    document_type = str(document_type)
+    sequence = DocumentSequence.objects.filter(
+        establishment=establishment,
+        document_type=document_type,
+    ).first()
+    if sequence is not None:
+        return sequence
+
+    last = (
+        Invoice.objects
+        .filter(establishment=establishment, document_type=document_type)
+        .order_by('-numero')
+        .values_list('numero', flat=True)
+        .first()
+    )
+    sequence, _ = DocumentSequence.objects.get_or_create(
+        establishment=establishment,
+        document_type=document_type,
+        defaults={'next_number': (last or 0) + 1},
+    )
+    return sequence
+
+
+def advance_sequences(invoices):
+    """
+    Raise the sequences of saved invoices past their numbers.
+
+    One UPDATE per establishment and document type; sequences not created
+    yet start after the highest number anyway (see get_sequence). Call it
+    in the transaction that inserts the invoices, so a concurrent lease
+    waits for it.
+
+    Args:
+        invoices: Invoices with establishment and numero set
+    """
+    highest = {}
+    for invoice in invoices:
+        key = (invoice.establishment_id, str(invoice.document_type))
+        if invoice.numero and invoice.numero > highest.get(key, 0):
+            highest[key] = invoice.numero
+
+    for (establishment_id, document_type), numero in highest.items():
+        DocumentSequence.objects.filter(
+            establishment_id=establishment_id,
+            document_type=document_type,
+        ).update(next_number=Greatest(F('next_number'), numero + 1))
+
+
+def number_reserved(establishment, document_type, numero: int) -> bool:
+    """Whether a lease (held by a worker, or free) covers a number."""
+    return NumberLease.objects.filter(
+        sequence__establishment=establishment,
+        sequence__document_type=str(document_type),
+        start__lte=numero,
+        end__gt=numero,
+    ).exists()
+
+
+class _Block:
+    """Numbers of one lease held in memory."""
+
+    def __init__(self, lease: NumberLease):
+        self.lease_id = lease.pk
+        self.start = lease.start
+        self.end = lease.end
+        self.numbers = deque(range(lease.start, lease.end))
+        self.expires_at = lease.expires_at
+
+    def usable(self) -> bool:
+        return bool(self.numbers) and timezone.now() < self.expires_at - LEASE_SAFETY_MARGIN
+
+
+class NumberAllocator:
+    """
+    Hands out document numbers from leased blocks.
+
+    One instance per process (see ``allocator``); safe to use from several
+    threads. Blocks are dropped after a fork so parent and child never share
+    numbers.
+    """
+
+    def __init__(self, block_size: Optional[int] = None, lease_ttl: Optional[int] = None):
+        """
+        Args:
+            block_size: Numbers per lease (default INVOICE_NUMBER_BLOCK_SIZE)
+            lease_ttl: Lease lifetime in seconds (default INVOICE_NUMBER_LEASE_TTL)
+        """
+        self._block_size = block_size
+        self._lease_ttl = lease_ttl
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        self._blocks: Dict[tuple, _Block] = {}
+        # Blocks leased in a transaction not committed yet: (key, thread) -> block
+        self._uncommitted: Dict[tuple, _Block] = {}
+        self._locks: Dict[tuple, threading.Lock] = {}
+
+    @property
+    def block_size(self) -> int:
+        return max(1, self._block_size or settings.INVOICE_NUMBER_BLOCK_SIZE)
+
+    @property
+    def lease_ttl(self) -> timedelta:
+        return timedelta(seconds=self._lease_ttl or settings.INVOICE_NUMBER_LEASE_TTL)
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked: the parent still owns its leases
+                self._reset()
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def allocate(self, establishment, document_type) -> int:
+        """
+        Allocate the next number of an establishment and document type.
+
+        Preferably call it before opening the invoice transaction. A block
+        leased inside an atomic block (which keeps the sequence row locked
+        until the commit) is reused by the same thread for the rest of that
+        transaction, dropped if the lease was rolled back, and shared with
+        the process once it commits.
+
+        Returns:
+            Document number
+
+        Raises:
+            ValueError: If the numbering reached MAX_NUMERO
+        """
+        key = (establishment.pk, str(document_type))
+
+        with self._key_lock(key):
+            block = self._blocks.get(key)
+            if block is not None and block.usable():
+                return block.numbers.popleft()
+
+            if block is not None:
+                self._release(block)
+                del self._blocks[key]
+
+            in_transaction = connection.in_atomic_block
+            pending_key = (key, threading.get_ident())
+            if in_transaction:
+                pending = self._uncommitted.get(pending_key)
+                if pending is not None and pending.usable() and self._lease_exists(pending):
+                    return pending.numbers.popleft()
+
+            block = _Block(self._lease(get_sequence(establishment, document_type)))
+            number = block.numbers.popleft()
+
+            if in_transaction:
+                # A rollback would undo the lease: reuse the block only in
+                # this thread (same transaction), share it once it commits
+                self._uncommitted[pending_key] = block
+                transaction.on_commit(lambda: self._commit(pending_key, block))
+            else:
+                self._blocks[key] = block
+            return number
+
+    def _lease_exists(self, block: _Block) -> bool:
+        """Whether an uncommitted lease is still there (not rolled back)."""
+        return NumberLease.objects.filter(pk=block.lease_id, owner=self.owner).exists()
+
+    def _commit(self, pending_key: tuple, block: _Block):
+        with self._key_lock(pending_key[0]):
+            if self._uncommitted.get(pending_key) is block:
+                del self._uncommitted[pending_key]
+        self._keep(pending_key[0], block)
+
+    def give_back(self, establishment, document_type, numero: int):
+        """
+        Return an allocated number that no invoice used (e.g. its INSERT failed).
+
+        It is handed out again if it belongs to the block this process still
+        holds; otherwise recover_numbers frees it when its lease expires.
+        """
+        key = (establishment.pk, str(document_type))
+        with self._key_lock(key):
+            block = self._blocks.get(key)
+            if block is not None and block.start <= numero < block.end and numero not in block.numbers:
+                block.numbers = deque(sorted([numero, *block.numbers]))
+
+    def _keep(self, key: tuple, block: _Block):
+        with self._key_lock(key):
+            if key in self._blocks:
+                self._release(block)
+            else:
+                self._blocks[key] = block
+
+    def _lease(self, sequence: DocumentSequence) -> NumberLease:
+        """Claim a free range, or reserve a new block from the sequence."""
+        expires_at = timezone.now() + self.lease_ttl
+
+        free = (
+            NumberLease.objects
+            .filter(sequence=sequence, owner='')
+            .order_by('start')
+            .values_list('pk', flat=True)[:5]
+        )
+        for lease_id in free:
+            # Compare-and-swap: only one process can take a free range
+            claimed = NumberLease.objects.filter(pk=lease_id, owner='').update(
+                owner=self.owner,
+                expires_at=expires_at,
+            )
+            if claimed:
+                return NumberLease.objects.get(pk=lease_id)
+
+        with transaction.atomic():
+            DocumentSequence.objects.filter(pk=sequence.pk).update(
+                next_number=F('next_number') + self.block_size
+            )
+            end = DocumentSequence.objects.values_list('next_number', flat=True).get(pk=sequence.pk)
+            start = end - self.block_size
+            if start > MAX_NUMERO:
+                raise ValueError(
+                    f"Numeración agotada para {sequence.establishment} "
+                    f"(tipo {sequence.document_type})"
+                )
+            return NumberLease.objects.create(
+                sequence=sequence,
+                start=start,
+                end=min(end, MAX_NUMERO + 1),
+                owner=self.owner,
+                expires_at=expires_at,
+            )
+
+    def _release(self, block: _Block):
+        """
+        Expire a lease so recover_numbers frees what was not used.
+
+        It expires after LEASE_SAFETY_MARGIN, not now: a number handed out
+        just before may still be saved by another thread.
+        """
+        if block.numbers:
+            NumberLease.objects.filter(pk=block.lease_id, owner=self.owner).update(
+                expires_at=timezone.now() + LEASE_SAFETY_MARGIN
+            )
+
+    def release_all(self):
+        """Give back every block held by this process (shutdown hook)."""
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            blocks = list(self._blocks.values())
+            self._blocks.clear()
+        for block in blocks:
+            try:
+                self._release(block)
+            except Exception:
+                pass  # Recovered anyway once the lease expires
+
+
+def recover_numbers(now=None) -> int:
+    """
+    Turn the unused numbers of expired leases into free ranges.
+
+    Returns:
+        Number of document numbers recovered
+    """
+    from .models import Invoice
+
+    now = now or timezone.now()
+    recovered = 0
+
+    expired = (
+        NumberLease.objects
+        .filter(expires_at__lt=now)
+        .exclude(owner='')
+        .select_related('sequence')
+    )
+    for lease in expired:
+        with transaction.atomic():
+            # Delete first: a concurrent recovery of the same lease gets 0
+            deleted, _ = NumberLease.objects.filter(pk=lease.pk, expires_at__lt=now).delete()
+            if not deleted:
+                continue
+
+            used = set(
+                Invoice.objects
+                .filter(
+                    establishment_id=lease.sequence.establishment_id,
+                    document_type=lease.sequence.document_type,
+                    numero__gte=lease.start,
+                    numero__lt=lease.end,
+                )
+                .values_list('numero', flat=True)
+            )
+
+            ranges = []
+            start = None
+            for number in range(lease.start, lease.end + 1):
+                if number < lease.end and number not in used:
+                    if start is None:
+                        start = number
+                elif start is not None:
+                    ranges.append(NumberLease(sequence=lease.sequence, start=start, end=number))
+                    recovered += number - start
+                    start = None
+            NumberLease.objects.bulk_create(ranges)
+
+    return recovered
+
+
+allocator = NumberAllocator()
+atexit.register(allocator.release_all)
+
+
+def allocate_number(establishment, document_type) -> int:
+    """Allocate the next document number (see NumberAllocator.allocate)."""
+    return allocator.allocate(establishment, document_type)
+
+
+def give_back_number(establishment, document_type, numero: int):
+    """Return an unused number (see NumberAllocator.give_back)."""
+    allocator.give_back(establishment, document_type, numero)
@@ -0,0 +1,82 @@
+"""
+Keyset pagination for the invoice list.
+
+Page numbers make the database count every row and skip ``OFFSET`` rows,
+so deep pages get slower as a company accumulates invoices. DRF's cursor
+encodes the last fecha_emision seen plus an offset within that value, so
+each page starts with an index range scan (``fecha_emision < last``) on the
+composite indexes of Invoice, ordered by (fecha_emision, id).
+
+The offset only covers rows sharing the last fecha_emision: pages inside a
+long run of equal timestamps (e.g. a bulk import) skip those rows with
+OFFSET, which costs in proportion to the run, not to the whole list.
+
+The total is not computed unless asked for:
+    ?count=exact   COUNT(*)
+    ?count=approx  Planner estimate on PostgreSQL (COUNT(*) elsewhere)
+"""
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def approximate_count(queryset) -> int:
+    """
+    Estimated row count of a queryset.
+
+    On PostgreSQL this is the planner estimate (EXPLAIN, nothing is
+    scanned); other databases fall back to COUNT(*).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class InvoiceCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by (fecha_emision, id), newest first.
+
+    The cursor holds fecha_emision and an offset among equal values (see
+    the module docstring).
+    """
+
+    ordering = ('-fecha_emision', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'approx':
+            self.count = approximate_count(queryset)
+        elif mode == 'exact':
+            self.count = queryset.order_by().count()
+        else:
+            self.count = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response
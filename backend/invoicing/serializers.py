@@ -1,13 +1,15 @@
 """Invoicing serializers."""
+from django.db import connection, transaction
 from rest_framework import serializers
 from .models import Invoice, InvoiceItem
+from .numbering import advance_sequences, allocate_number, number_reserved, MAX_NUMERO
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = InvoiceItem
         fields = '__all__'
-        read_only_fields = ['subtotal', 'iva', 'total']
+        read_only_fields = ['invoice', 'subtotal', 'iva', 'total']
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
@@ -17,44 +19,159 @@ class InvoiceSerializer(serializers.ModelSerializer):
         source='get_document_type_display',
         read_only=True
     )
+    xml_signed = serializers.CharField(read_only=True)
     
     class Meta:
         model = Invoice
-        fields = '__all__'
-        read_only_fields = ['cdc', 'xml_signed', 'sifen_response_code', 'sifen_response_message']
+        exclude = ['xml_signed_legacy']
+        read_only_fields = [
+            'cdc', 'sifen_response_code', 'sifen_response_message',
+            'lote_attempts', 'lote_retry_at',
+        ]
+
+
+class InvoiceListSerializer(InvoiceSerializer):
+    """
+    Invoice list row: no XML or SIFEN message, items only with ?expand=items.
+    
+    Expects a queryset with select_related('establishment') (numero_completo)
+    and, when items are expanded, prefetch_related('items').
+    """
+    xml_signed = None
+    
+    class Meta:
+        model = Invoice
+        exclude = ['xml_signed_legacy', 'sifen_response_message']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'items' not in self.context.get('expand', ()):
+            self.fields.pop('items')
+
+
+def save_built_invoices(built):
+    """
+    Insert invoices built by InvoiceCreateSerializer.build.
+    
+    Uses one bulk INSERT for the invoices and one for all their items
+    (batched), so the query count does not depend on the line count.
+    
+    Args:
+        built: List of (invoice, items) tuples
+    
+    Returns:
+        List of saved invoices
+    """
+    with transaction.atomic():
+        # Explicit numbers must never be allocated again; updating the
+        # sequence first makes a concurrent lease wait for this transaction
+        advance_sequences([invoice for invoice, _ in built])
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # Backend cannot return the new pks: one invoice at a time
+            for invoice, _ in built:
+                invoice.save()
+            invoices = [invoice for invoice, _ in built]
+        else:
+            invoices = Invoice.objects.bulk_create([invoice for invoice, _ in built])
+        
+        items = []
+        for invoice, invoice_items in built:
+            for item in invoice_items:
+                item.invoice = invoice
+            items.extend(invoice_items)
+        InvoiceItem.objects.bulk_create(items, batch_size=1000)
+    
+    return invoices
+
+
+class InvoiceBulkCreateSerializer(serializers.ListSerializer):
+    """Creates a list of invoices with two bulk INSERTs (invoices, items)."""
+    
+    def validate(self, attrs):
+        """Reject invoices repeated within the batch (same company, establishment, type and numero)."""
+        default_type = Invoice._meta.get_field('document_type').default
+        seen = {}
+        duplicates = []
+        for index, invoice in enumerate(attrs):
+            if invoice.get('numero') is None:
+                continue  # Allocated by the sequence
+            key = (
+                invoice['company'].pk,
+                invoice['establishment'].pk,
+                str(invoice.get('document_type', default_type)),
+                invoice['numero'],
+            )
+            if key in seen:
+                duplicates.append(f"{seen[key]} y {index} (número {invoice['numero']})")
+            else:
+                seen[key] = index
+        if duplicates:
+            raise serializers.ValidationError(
+                f"Facturas duplicadas en la petición: {'; '.join(duplicates)}"
+            )
+        return attrs
+    
+    def create(self, validated_data):
+        return save_built_invoices([self.child.build(attrs) for attrs in validated_data])
 
 
 class InvoiceCreateSerializer(serializers.ModelSerializer):
     items = InvoiceItemSerializer(many=True)
+    # Omitted: assigned by the server-side sequence (see numbering.py)
+    numero = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        min_value=1,
+        max_value=MAX_NUMERO
+    )
     
     class Meta:
         model = Invoice
-        exclude = ['cdc', 'xml_signed', 'status']
+        exclude = ['cdc', 'xml_signed_legacy', 'status', 'lote_attempts', 'lote_retry_at']
+        # Calculated from the items
+        read_only_fields = [
+            'subtotal_gravado_10', 'subtotal_gravado_5', 'subtotal_exento',
+            'total_iva_10', 'total_iva_5', 'total',
+        ]
+        list_serializer_class = InvoiceBulkCreateSerializer
     
-    def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        invoice = Invoice.objects.create(**validated_data)
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        numero = attrs.get('numero')
+        document_type = attrs.get('document_type', Invoice._meta.get_field('document_type').default)
+        if numero is not None and number_reserved(attrs['establishment'], document_type, numero):
+            raise serializers.ValidationError({
+                'numero': 'El número está reservado por la numeración automática; omítalo.'
+            })
+        return attrs
+    
+    def build(self, validated_data):
+        """
+        Build an unsaved invoice and its items, computing item amounts and
+        invoice totals in one in-memory pass.
         
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
+        Returns:
+            Tuple of (invoice, items)
+        """
+        validated_data = dict(validated_data)
+        items_data = validated_data.pop('items')
+        if validated_data.get('numero') is None:
+            validated_data['numero'] = self.next_number(validated_data)
         
-        # Calcular totales
-        invoice.subtotal_gravado_10 = sum(
-            i.subtotal for i in invoice.items.filter(tasa_iva=10)
-        )
-        invoice.subtotal_gravado_5 = sum(
-            i.subtotal for i in invoice.items.filter(tasa_iva=5)
-        )
-        invoice.subtotal_exento = sum(
-            i.subtotal for i in invoice.items.filter(tasa_iva=0)
-        )
-        invoice.total_iva_10 = sum(
-            i.iva for i in invoice.items.filter(tasa_iva=10)
-        )
-        invoice.total_iva_5 = sum(
-            i.iva for i in invoice.items.filter(tasa_iva=5)
+        invoice = Invoice(**validated_data)
+        items = [InvoiceItem(**item_data) for item_data in items_data]
+        for item in items:
+            item.calculate()
+        invoice.calculate_totals(items)
+        return invoice, items
+    
+    def next_number(self, validated_data):
+        """Number of an invoice sent without numero (from the sequence)."""
+        return allocate_number(
+            validated_data['establishment'],
+            validated_data.get('document_type', Invoice._meta.get_field('document_type').default)
         )
-        invoice.total = sum(i.total for i in invoice.items.all())
-        invoice.save()
-        
-        return invoice
+    
+    def create(self, validated_data):
+        return save_built_invoices([self.build(validated_data)])[0]
@@ -0,0 +1,10 @@
+"""Celery tasks for invoicing."""
+from celery import shared_task
+
+from .numbering import recover_numbers
+
+
+@shared_task
+def recover_numbers_task() -> int:
+    """Free the unused numbers of expired numbering leases."""
+    return recover_numbers()
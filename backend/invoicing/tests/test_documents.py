@@ -0,0 +1,86 @@
+"""Tests for compressed out-of-row signed XML storage."""
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from invoicing.models import Invoice, InvoiceDocument
+from sifen.compression import compress, decompress
+
+XML = '<rDE><DE Id="01800123456001001000000122024011512345678909">' + "<gCamItem/>" * 200 + "</DE></rDE>"
+
+
+def _invoice(company, establishment, numero, **kwargs):
+    return Invoice.objects.create(
+        company=company,
+        establishment=establishment,
+        numero=numero,
+        timbrado="12345678",
+        receptor_nombre="Cliente Test",
+        fecha_emision=timezone.now(),
+        total=0,
+        **kwargs,
+    )
+
+
+class TestCompression:
+    """Codec round trips."""
+
+    def test_gzip_round_trip_is_deterministic(self):
+        """Equal input gives equal output (no timestamp in the header)."""
+        codec, data = compress(XML.encode(), "gzip")
+        assert compress(XML.encode(), "gzip") == (codec, data)
+        assert decompress(codec, memoryview(data)) == XML.encode()
+        assert len(data) < len(XML) / 5
+
+
+@pytest.mark.django_db
+class TestInvoiceDocument:
+    """xml_signed is stored compressed in InvoiceDocument and loaded lazily."""
+
+    def test_stored_out_of_row(self, company, establishment):
+        """The invoice row keeps no XML; the document is compressed."""
+        invoice = _invoice(company, establishment, 1, cdc="1" * 44, xml_signed=XML)
+
+        document = InvoiceDocument.objects.get(cdc="1" * 44)
+        assert document.invoice_id == invoice.pk
+        assert document.size == len(XML)
+        assert len(document.data) < document.size
+        assert Invoice.objects.values_list("xml_signed_legacy", flat=True).get() == ""
+
+    def test_lazy_load(self, company, establishment, django_assert_num_queries):
+        """The XML is fetched on first access only."""
+        invoice = _invoice(company, establishment, 1, xml_signed=XML)
+        invoice = Invoice.objects.get(pk=invoice.pk)
+
+        with django_assert_num_queries(1):
+            assert invoice.xml_signed == XML
+            assert invoice.xml_signed == XML
+
+        invoice = Invoice.objects.select_related("document").get(pk=invoice.pk)
+        with django_assert_num_queries(0):
+            assert invoice.xml_signed == XML
+
+    def test_replace_and_clear(self, company, establishment):
+        """Setting a new XML replaces the document; an empty one deletes it."""
+        invoice = _invoice(company, establishment, 1, xml_signed=XML)
+        invoice.xml_signed = "<rDE/>"
+        invoice.save()
+        invoice.refresh_from_db()
+        assert invoice.xml_signed == "<rDE/>"
+
+        invoice.xml_signed = ""
+        invoice.save()
+        assert not InvoiceDocument.objects.exists()
+
+    def test_migrate_command(self, company, establishment):
+        """Legacy inline XML is moved in batches and still readable."""
+        for numero in range(1, 6):
+            _invoice(company, establishment, numero, xml_signed_legacy=f"<rDE n='{numero}'/>")
+        assert Invoice.objects.get(numero=2).xml_signed == "<rDE n='2'/>"
+
+        call_command("migrate_invoice_xml", "--batch-size", "2")
+
+        assert InvoiceDocument.objects.count() == 5
+        assert not Invoice.objects.exclude(xml_signed_legacy="").exists()
+        assert Invoice.objects.get(numero=2).xml_signed == "<rDE n='2'/>"
+        assert Invoice.objects.with_signed_xml().count() == 5
@@ -0,0 +1,161 @@
+"""Tests for the streaming CSV/JSONL invoice import."""
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from invoicing.importers import InvoiceImporter
+from invoicing.models import Invoice, InvoiceItem
+from invoicing.numbering import NumberAllocator
+
+CSV_HEADER = (
+    "ref,timbrado,receptor_nombre,fecha_emision,numero,"
+    "item_descripcion,item_cantidad,item_precio_unitario,item_tasa_iva\n"
+)
+
+
+def _record(numero, items=1):
+    return {
+        "timbrado": "12345678",
+        "receptor_nombre": "Cliente Test",
+        "fecha_emision": "2024-01-15T10:30:00Z",
+        "numero": numero,
+        "items": [
+            {"descripcion": f"Producto {n}", "cantidad": "1", "precio_unitario": "110000", "tasa_iva": 10}
+            for n in range(items)
+        ],
+    }
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="UTF-8")
+    return str(path)
+
+
+@pytest.mark.django_db
+class TestInvoiceImporter:
+    """Chunked inserts, validation errors and resuming."""
+
+    def test_jsonl(self, tmp_path, company, establishment):
+        """Every line becomes an invoice with its items and totals."""
+        path = _write_jsonl(tmp_path / "invoices.jsonl", [_record(n, items=2) for n in range(1, 6)])
+        importer = InvoiceImporter(
+            path,
+            chunk_size=2,
+            defaults={"company": company.id, "establishment": establishment.id},
+        )
+
+        progress = importer.run()
+
+        assert progress["imported"] == 5
+        assert Invoice.objects.count() == 5
+        assert InvoiceItem.objects.count() == 10
+        assert Invoice.objects.get(numero=3).total == Decimal("220000")
+
+    def test_csv_groups_item_rows(self, tmp_path, company, establishment):
+        """Consecutive rows with the same ref are one invoice."""
+        path = tmp_path / "invoices.csv"
+        path.write_text(
+            CSV_HEADER
+            + 'A,12345678,"Cliente, Test",2024-01-15T10:30:00Z,1,"Producto\nlargo",1,110000,10\n'
+            + "A,12345678,Cliente,2024-01-15T10:30:00Z,1,Otro,2,55000,5\n"
+            + "B,12345678,Cliente,2024-01-15T10:30:00Z,2,Servicio,1,50000,0\n",
+            encoding="UTF-8",
+        )
+
+        InvoiceImporter(str(path), defaults={"company": company.id, "establishment": establishment.id}).run()
+
+        first = Invoice.objects.get(numero=1)
+        assert first.receptor_nombre == "Cliente, Test"
+        assert first.items.count() == 2
+        assert first.total == Decimal("220000")
+        assert Invoice.objects.get(numero=2).items.count() == 1
+
+    def test_invalid_records_are_reported(self, tmp_path, company, establishment):
+        """Invalid lines are skipped with their line number."""
+        records = [_record(1), {**_record(2), "timbrado": ""}, _record(3)]
+        path = _write_jsonl(tmp_path / "invoices.jsonl", records)
+        errors = []
+
+        progress = InvoiceImporter(
+            path,
+            defaults={"company": company.id, "establishment": establishment.id},
+            on_error=lambda line, e: errors.append(line),
+        ).run()
+
+        assert progress["imported"] == 2
+        assert progress["failed"] == 1
+        assert errors == [2]
+
+    def test_duplicates_fall_back_to_single_inserts(self, tmp_path, company, establishment):
+        """A conflicting invoice fails alone; the rest of its chunk is kept."""
+        path = _write_jsonl(tmp_path / "invoices.jsonl", [_record(1), _record(2), _record(1)])
+
+        progress = InvoiceImporter(
+            path,
+            defaults={"company": company.id, "establishment": establishment.id},
+        ).run()
+
+        assert progress["imported"] == 2
+        assert progress["failed"] == 1
+        assert InvoiceItem.objects.count() == 2
+
+    def test_imported_numbers_are_not_allocated_again(self, tmp_path, company, establishment):
+        """Numbers allocated after an import never collide with imported ones."""
+        assert NumberAllocator(block_size=5).allocate(establishment, "1") == 1
+        path = _write_jsonl(tmp_path / "invoices.jsonl", [_record(10), _record(None), _record(11)])
+
+        progress = InvoiceImporter(
+            path,
+            defaults={"company": company.id, "establishment": establishment.id},
+        ).run()
+
+        assert progress["imported"] == 3
+        numeros = set(Invoice.objects.values_list("numero", flat=True))
+        assert len(numeros) == 3
+        assert NumberAllocator(block_size=5).allocate(establishment, "1") > max(numeros)
+
+    def test_resume_from_checkpoint(self, tmp_path, company, establishment, monkeypatch):
+        """After a crash, --resume continues after the last committed chunk."""
+        path = _write_jsonl(tmp_path / "invoices.jsonl", [_record(n) for n in range(1, 8)])
+        importer = InvoiceImporter(
+            path,
+            chunk_size=3,
+            defaults={"company": company.id, "establishment": establishment.id},
+        )
+
+        original = importer._save_chunk
+        calls = []
+
+        def crash_on_second_chunk(chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise RuntimeError("crash")
+            return original(chunk)
+
+        monkeypatch.setattr(importer, "_save_chunk", crash_on_second_chunk)
+        with pytest.raises(RuntimeError):
+            importer.run()
+        assert Invoice.objects.count() == 3
+
+        progress = InvoiceImporter(
+            path,
+            chunk_size=3,
+            defaults={"company": company.id, "establishment": establishment.id},
+        ).run(resume=True)
+
+        assert progress["imported"] == 7
+        assert sorted(Invoice.objects.values_list("numero", flat=True)) == list(range(1, 8))
+
+    def test_command(self, tmp_path, company, establishment, capsys):
+        """The management command reports throughput and the summary."""
+        path = _write_jsonl(tmp_path / "invoices.jsonl", [_record(1), _record(2)])
+
+        call_command(
+            "import_invoices", path,
+            "--company", str(company.id),
+            "--establishment", str(establishment.id),
+        )
+
+        assert "Importación finalizada: 2 facturas" in capsys.readouterr().out
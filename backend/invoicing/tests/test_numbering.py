@@ -0,0 +1,170 @@
+"""Tests for server-side document numbering."""
+from datetime import timedelta
+
+import pytest
+from django.db import transaction
+from django.utils import timezone
+
+from invoicing.models import Invoice, NumberLease
+from invoicing.numbering import LEASE_SAFETY_MARGIN, NumberAllocator, recover_numbers
+
+
+def _api_client():
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user("tester"))
+    return client
+
+
+def _payload(company, establishment, **fields):
+    return {
+        "company": company.id,
+        "establishment": establishment.id,
+        "timbrado": "12345678",
+        "receptor_nombre": "Cliente Test",
+        "fecha_emision": "2024-01-15T10:30:00Z",
+        "total": "0",
+        "items": [],
+        **fields,
+    }
+
+
+def _invoice(company, establishment, numero):
+    return Invoice.objects.create(
+        company=company,
+        establishment=establishment,
+        numero=numero,
+        timbrado="12345678",
+        receptor_nombre="Cliente Test",
+        fecha_emision=timezone.now(),
+        total=0,
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestNumberAllocator:
+    """Block leases, memory allocation and recovery."""
+
+    def test_sequential_within_block(self, establishment):
+        """Numbers come from one lease until the block is used up."""
+        allocator = NumberAllocator(block_size=5)
+        numbers = [allocator.allocate(establishment, "1") for _ in range(7)]
+
+        assert numbers == [1, 2, 3, 4, 5, 6, 7]
+        assert NumberLease.objects.count() == 2
+
+    def test_continues_after_existing_numbers(self, company, establishment):
+        """A new sequence starts after the highest number in use."""
+        _invoice(company, establishment, 41)
+        assert NumberAllocator(block_size=5).allocate(establishment, "1") == 42
+
+    def test_concurrent_allocators_never_collide(self, establishment):
+        """Two workers get disjoint blocks."""
+        first, second = NumberAllocator(block_size=3), NumberAllocator(block_size=3)
+        numbers = []
+        for _ in range(6):
+            numbers.append(first.allocate(establishment, "1"))
+            numbers.append(second.allocate(establishment, "1"))
+
+        assert sorted(numbers) == list(range(1, 13))
+
+    def test_document_types_are_independent(self, establishment):
+        """Each document type has its own sequence."""
+        allocator = NumberAllocator(block_size=5)
+        assert allocator.allocate(establishment, "1") == 1
+        assert allocator.allocate(establishment, "5") == 1
+
+    def test_released_numbers_are_reused(self, company, establishment):
+        """Unused numbers of a released lease are handed out again."""
+        worker = NumberAllocator(block_size=5)
+        for _ in range(2):
+            _invoice(company, establishment, worker.allocate(establishment, "1"))
+        worker.release_all()
+
+        assert recover_numbers() == 0  # Not before the safety margin
+        assert recover_numbers(now=timezone.now() + LEASE_SAFETY_MARGIN + timedelta(seconds=1)) == 3
+
+        other = NumberAllocator(block_size=5)
+        assert [other.allocate(establishment, "1") for _ in range(4)] == [3, 4, 5, 6]
+
+    def test_given_back_number_is_reused(self, establishment):
+        """A number whose invoice was not saved is handed out again."""
+        allocator = NumberAllocator(block_size=5)
+        assert [allocator.allocate(establishment, "1") for _ in range(2)] == [1, 2]
+
+        allocator.give_back(establishment, "1", 1)
+
+        assert [allocator.allocate(establishment, "1") for _ in range(2)] == [1, 3]
+
+    def test_expired_lease_is_not_used(self, establishment):
+        """A worker stops using a lease that is about to expire."""
+        allocator = NumberAllocator(block_size=5, lease_ttl=10)  # below the safety margin
+        assert allocator.allocate(establishment, "1") == 1
+        assert allocator.allocate(establishment, "1") == 6
+
+    def test_block_reused_inside_transaction(self, establishment):
+        """Allocating inside an atomic block leases a single block."""
+        allocator = NumberAllocator(block_size=5)
+        with transaction.atomic():
+            numbers = [allocator.allocate(establishment, "1") for _ in range(3)]
+
+        assert numbers == [1, 2, 3]
+        assert NumberLease.objects.count() == 1
+        assert allocator.allocate(establishment, "1") == 4
+
+    def test_block_dropped_on_rollback(self, establishment):
+        """A lease undone by a rollback is never handed out from memory."""
+        allocator = NumberAllocator(block_size=5)
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                assert allocator.allocate(establishment, "1") == 1
+                raise RuntimeError
+
+        assert NumberLease.objects.count() == 0
+        with transaction.atomic():
+            assert allocator.allocate(establishment, "1") == 1
+        assert NumberLease.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestInvoiceCreateNumbering:
+    """The create endpoint numbers invoices when numero is omitted."""
+
+    def test_numero_assigned(self, company, establishment):
+        client = _api_client()
+        payload = _payload(company, establishment)
+
+        first = client.post("/api/invoicing/invoices/", payload, format="json")
+        second = client.post("/api/invoicing/invoices/", payload, format="json")
+
+        assert first.status_code == 201, first.data
+        assert second.status_code == 201, second.data
+        numeros = sorted(Invoice.objects.values_list("numero", flat=True))
+        assert len(set(numeros)) == 2
+        assert Invoice.objects.filter(cdc__isnull=True).count() == 2
+
+    def test_explicit_numero_advances_sequence(self, company, establishment):
+        """An explicit number should never be allocated afterwards."""
+        client = _api_client()
+        allocator = NumberAllocator(block_size=5)
+        assert allocator.allocate(establishment, "1") == 1
+
+        response = client.post(
+            "/api/invoicing/invoices/", _payload(company, establishment, numero=6), format="json"
+        )
+
+        assert response.status_code == 201, response.data
+        assert NumberAllocator(block_size=5).allocate(establishment, "1") == 7
+
+    def test_explicit_numero_in_lease_rejected(self, company, establishment):
+        """A number leased to a worker should be refused with a 400."""
+        NumberAllocator(block_size=5).allocate(establishment, "1")
+
+        response = _api_client().post(
+            "/api/invoicing/invoices/", _payload(company, establishment, numero=3), format="json"
+        )
+
+        assert response.status_code == 400
+        assert "numero" in response.data
@@ -0,0 +1,319 @@
+"""Tests for invoicing API views."""
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from invoicing.models import Invoice, InvoiceItem
+
+
+@pytest.fixture
+def api_client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user("tester"))
+    return client
+
+
+@pytest.fixture
+def draft_invoice(company, establishment):
+    invoice = Invoice.objects.create(
+        company=company,
+        establishment=establishment,
+        numero=1,
+        timbrado="12345678",
+        receptor_ruc="12345678-9",
+        receptor_nombre="Cliente Test",
+        fecha_emision="2024-01-15T10:30:00Z",
+        total=110000,
+        subtotal_gravado_10=110000,
+    )
+    InvoiceItem.objects.create(
+        invoice=invoice,
+        descripcion="Producto",
+        cantidad=1,
+        precio_unitario=110000,
+    )
+    return invoice
+
+
+@pytest.mark.django_db
+class TestSifenTaskEndpoints:
+    """generate_cdc/send_to_sifen run as Celery tasks (eager in tests)."""
+
+    def test_send_to_sifen_returns_202(self, api_client, draft_invoice):
+        """send_to_sifen should enqueue and return a task id."""
+        response = api_client.post(f"/api/invoicing/invoices/{draft_invoice.id}/send_to_sifen/")
+        assert response.status_code == 202
+        assert response.data["task_id"]
+
+        draft_invoice.refresh_from_db()
+        assert draft_invoice.status == "approved"
+        assert len(draft_invoice.cdc) == 44
+
+    def test_task_status(self, api_client, draft_invoice):
+        """The status endpoint should expose the task result."""
+        response = api_client.post(f"/api/invoicing/invoices/{draft_invoice.id}/generate_cdc/")
+        status = api_client.get(response.data["status_url"])
+
+        assert status.data["state"] == "SUCCESS"
+        assert status.data["result"]["cdc"] == Invoice.objects.get().cdc
+
+    def test_send_rejects_approved(self, api_client, draft_invoice):
+        """Approved invoices cannot be sent again."""
+        draft_invoice.status = "approved"
+        draft_invoice.save()
+        response = api_client.post(f"/api/invoicing/invoices/{draft_invoice.id}/send_to_sifen/")
+        assert response.status_code == 400
+
+    def test_queue_signed_invoice(self, api_client, draft_invoice):
+        """Only signed invoices can be queued for the lote pipeline."""
+        url = f"/api/invoicing/invoices/{draft_invoice.id}/queue/"
+        assert api_client.post(url).status_code == 400
+
+        api_client.post(f"/api/invoicing/invoices/{draft_invoice.id}/generate_cdc/")
+        response = api_client.post(url)
+
+        assert response.status_code == 200
+        assert response.data["status"] == "queued"
+        assert api_client.post(url).status_code == 400
+
+
+def _payload(company, establishment, items=1):
+    return {
+        "company": company.id,
+        "establishment": establishment.id,
+        "timbrado": "12345678",
+        "receptor_ruc": "12345678-9",
+        "receptor_nombre": "Cliente Test",
+        "fecha_emision": "2024-01-15T10:30:00Z",
+        "items": [
+            {
+                "descripcion": f"Producto {n}",
+                "cantidad": "2",
+                "precio_unitario": "55000",
+                "tasa_iva": [10, 5, 0][n % 3],
+            }
+            for n in range(items)
+        ],
+    }
+
+
+@pytest.mark.django_db
+class TestBulkCreate:
+    """Bulk endpoint: totals in one pass, constant queries per invoice."""
+
+    def test_single_invoice_totals(self, api_client, company, establishment):
+        """Totals are computed from the items."""
+        response = api_client.post(
+            "/api/invoicing/invoices/bulk/", _payload(company, establishment, items=3), format="json"
+        )
+        assert response.status_code == 201, response.data
+
+        invoice = Invoice.objects.get()
+        assert invoice.subtotal_gravado_10 == 110000
+        assert invoice.subtotal_gravado_5 == 110000
+        assert invoice.subtotal_exento == 110000
+        assert invoice.total_iva_10 == 10000
+        assert str(invoice.total_iva_5) == "5238.10"
+        assert invoice.total == 330000
+        assert len(response.data["items"]) == 3
+
+    def test_list_of_invoices(self, api_client, company, establishment):
+        """A list creates every invoice with distinct numbers."""
+        payload = [_payload(company, establishment, items=2) for _ in range(3)]
+        response = api_client.post("/api/invoicing/invoices/bulk/", payload, format="json")
+
+        assert response.status_code == 201, response.data
+        assert len(response.data) == 3
+        assert InvoiceItem.objects.count() == 6
+        assert len(set(Invoice.objects.values_list("numero", flat=True))) == 3
+
+    def test_queries_independent_of_line_count(self, api_client, company, establishment):
+        """Query count must not grow with the number of items."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        numero = 100
+        for items in (1, 20):
+            payload = []
+            for _ in range(2):
+                numero += 1
+                payload.append(dict(_payload(company, establishment, items=items), numero=numero))
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.post("/api/invoicing/invoices/bulk/", payload, format="json")
+            assert response.status_code == 201, response.data
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+
+    def test_duplicate_numero_in_batch_rejected(self, api_client, company, establishment):
+        """Two invoices with the same number in one batch get a 400 naming them."""
+        payload = [dict(_payload(company, establishment), numero=n) for n in (7, 8, 7)]
+        response = api_client.post("/api/invoicing/invoices/bulk/", payload, format="json")
+
+        assert response.status_code == 400
+        assert "0 y 2" in str(response.data)
+        assert not Invoice.objects.exists()
+
+    def test_invalid_item_rejected(self, api_client, company, establishment):
+        """Validation errors create nothing."""
+        payload = _payload(company, establishment)
+        payload["items"][0]["cantidad"] = "abc"
+        response = api_client.post("/api/invoicing/invoices/bulk/", payload, format="json")
+
+        assert response.status_code == 400
+        assert not Invoice.objects.exists()
+
+
+def _signed_invoice(company, establishment, numero, fecha):
+    cdc = f"{numero:044d}"
+    return Invoice.objects.create(
+        company=company,
+        establishment=establishment,
+        numero=numero,
+        cdc=cdc,
+        timbrado="12345678",
+        receptor_nombre="Cliente Test",
+        fecha_emision=fecha,
+        total=110000,
+        status="approved",
+        xml_signed=f'<rDE><DE Id="{cdc}"/></rDE>',
+    )
+
+
+@pytest.mark.django_db
+class TestExport:
+    """Streaming ZIP export of signed XML."""
+
+    def test_zip_contains_xml_and_manifest(self, api_client, company, establishment, draft_invoice):
+        """One XML per CDC in the period plus a manifest; drafts are skipped."""
+        import csv
+        import io
+        import zipfile
+
+        _signed_invoice(company, establishment, 2, "2024-01-10T10:00:00Z")
+        _signed_invoice(company, establishment, 3, "2024-01-20T10:00:00Z")
+        _signed_invoice(company, establishment, 4, "2024-02-01T10:00:00Z")
+
+        response = api_client.get(
+            "/api/invoicing/invoices/export/",
+            {"company": company.id, "fecha_desde": "2024-01-01", "fecha_hasta": "2024-01-31"},
+        )
+        assert response.status_code == 200
+        assert response.streaming
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == [f"{2:044d}.xml", f"{3:044d}.xml", "manifest.csv"]
+        assert archive.read(f"{2:044d}.xml").startswith(b"<rDE>")
+
+        manifest = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode())))
+        assert [row["numero"] for row in manifest] == ["0000002", "0000003"]
+
+    def test_company_required(self, api_client):
+        """The export is always scoped to one company."""
+        response = api_client.get("/api/invoicing/invoices/export/")
+        assert response.status_code == 400
+
+    def test_command(self, company, establishment, tmp_path):
+        """export_xml writes the same archive to a file."""
+        import zipfile
+        from django.core.management import call_command
+
+        _signed_invoice(company, establishment, 2, "2024-01-10T10:00:00Z")
+        output = tmp_path / "export.zip"
+        call_command("export_xml", str(company.id), "--output", str(output))
+
+        assert len(zipfile.ZipFile(output).namelist()) == 2
+
+
+@pytest.mark.django_db
+class TestInvoiceList:
+    """List representation: no XML, optional items, no N+1."""
+
+    def test_list_omits_xml_and_items(self, api_client, company, establishment):
+        """Rows carry numero_completo but not the XML blob or items."""
+        _signed_invoice(company, establishment, 2, "2024-01-10T10:00:00Z")
+
+        row = api_client.get("/api/invoicing/invoices/").data["results"][0]
+
+        assert row["numero_completo"] == "001-001-0000002"
+        assert "xml_signed" not in row
+        assert "sifen_response_message" not in row
+        assert "items" not in row
+
+    def test_expand_items(self, api_client, draft_invoice):
+        """?expand=items includes the items."""
+        row = api_client.get("/api/invoicing/invoices/", {"expand": "items"}).data["results"][0]
+        assert len(row["items"]) == 1
+
+    def test_detail_keeps_full_representation(self, api_client, draft_invoice):
+        """The detail view still returns items and XML."""
+        data = api_client.get(f"/api/invoicing/invoices/{draft_invoice.id}/").data
+        assert "xml_signed" in data
+        assert len(data["items"]) == 1
+
+    def test_queries_independent_of_page_size(self, api_client, company, establishment):
+        """Listing 1 or 10 invoices costs the same number of queries."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for numero in range(1, 11):
+            _signed_invoice(company, establishment, numero, "2024-01-10T10:00:00Z")
+            if numero in (1, 10):
+                with CaptureQueriesContext(connection) as queries:
+                    response = api_client.get("/api/invoicing/invoices/", {"expand": "items"})
+                assert len(response.data["results"]) == numero
+                counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+        assert not any("xml_signed" in query["sql"] for query in queries)
+
+
+@pytest.mark.django_db
+class TestInvoicePagination:
+    """Cursor pagination ordered by (fecha_emision, id)."""
+
+    def test_cursor_walks_all_pages(self, api_client, company, establishment):
+        """Following next visits every invoice once, newest first."""
+        for numero in range(1, 8):
+            # Two invoices per timestamp: the id breaks the tie
+            _signed_invoice(company, establishment, numero, f"2024-01-{10 + numero // 2}T10:00:00Z")
+
+        seen = []
+        url = "/api/invoicing/invoices/?page_size=3"
+        while url:
+            data = api_client.get(url).data
+            seen.extend(row["numero"] for row in data["results"])
+            url = data["next"]
+
+        assert sorted(seen) == list(range(1, 8))
+        assert seen[0] == 7
+        assert "count" not in data
+
+    def test_cursor_with_shared_fecha_emision(self, api_client, company, establishment):
+        """A run of invoices with the same fecha_emision is paged without gaps or repeats."""
+        for numero in range(1, 26):
+            _signed_invoice(company, establishment, numero, "2024-01-15T10:00:00Z")
+        _signed_invoice(company, establishment, 26, "2024-01-14T10:00:00Z")
+
+        seen = []
+        url = "/api/invoicing/invoices/?page_size=4"
+        while url:
+            data = api_client.get(url).data
+            seen.extend(row["numero"] for row in data["results"])
+            url = data["next"]
+
+        assert seen == list(range(25, 0, -1)) + [26]
+
+    def test_no_count_query_by_default(self, api_client, draft_invoice):
+        """The total is only computed when asked for."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            api_client.get("/api/invoicing/invoices/")
+        assert not any("COUNT(" in query["sql"] for query in queries)
+
+        for mode in ("exact", "approx"):
+            assert api_client.get("/api/invoicing/invoices/", {"count": mode}).data["count"] == 1
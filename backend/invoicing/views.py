@@ -1,27 +1,128 @@
 """Invoicing views."""
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from .exports import export_queryset, export_filename, stream_xml_zip
 from .models import Invoice
-from .serializers import InvoiceSerializer, InvoiceCreateSerializer
+from .pagination import InvoiceCursorPagination
+from .serializers import InvoiceSerializer, InvoiceCreateSerializer, InvoiceListSerializer
 from sifen.services import SifenService
+from sifen.tasks import SENDABLE_STATUSES, generate_invoice_task, send_invoice_task
+
+# Invoices accepted by one bulk request
+MAX_BULK_INVOICES = 500
 
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     """CRUD para facturas."""
-    queryset = Invoice.objects.prefetch_related('items').all()
+    queryset = Invoice.objects.select_related('company', 'establishment').prefetch_related('items')
     filterset_fields = ['company', 'status', 'document_type']
     search_fields = ['numero', 'cdc', 'receptor_nombre', 'receptor_ruc']
     ordering_fields = ['fecha_emision', 'numero', 'total']
+    ordering = ('-fecha_emision', '-id')
+    pagination_class = InvoiceCursorPagination
+    
+    def get_expand(self):
+        """Related data requested with ?expand=items (comma separated)."""
+        value = self.request.query_params.get('expand', '')
+        return {name.strip() for name in value.split(',') if name.strip()}
+    
+    def get_queryset(self):
+        if self.action in ('retrieve', 'xml'):
+            return super().get_queryset().select_related('document')
+        if self.action != 'list':
+            return super().get_queryset()
+        # The list never loads the XML or SIFEN message text
+        queryset = (
+            Invoice.objects
+            .select_related('company', 'establishment')
+            .defer('xml_signed_legacy', 'sifen_response_message')
+        )
+        if 'items' in self.get_expand():
+            queryset = queryset.prefetch_related('items')
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['expand'] = self.get_expand()
+        return context
     
     def get_serializer_class(self):
         if self.action == 'create':
             return InvoiceCreateSerializer
+        if self.action == 'list':
+            return InvoiceListSerializer
         return InvoiceSerializer
     
+    def _task_response(self, invoice, task):
+        """202 response pointing to the task status endpoint."""
+        return Response(
+            {
+                'task_id': task.id,
+                'invoice_id': invoice.id,
+                'status_url': reverse('sifen-task-status', args=[task.id], request=self.request),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Crear una factura o una lista de facturas con inserciones masivas."""
+        many = isinstance(request.data, list)
+        if many and len(request.data) > MAX_BULK_INVOICES:
+            return Response(
+                {'error': f'Máximo {MAX_BULK_INVOICES} facturas por petición'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = InvoiceCreateSerializer(
+            data=request.data,
+            many=many,
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        created = serializer.save()
+        
+        invoices = created if many else [created]
+        prefetch_related_objects(invoices, 'items')
+        data = InvoiceSerializer(invoices, many=True, context=self.get_serializer_context()).data
+        return Response(data if many else data[0], status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Descargar en un ZIP los XML firmados de una empresa y período."""
+        company = request.query_params.get('company')
+        if not company:
+            return Response(
+                {'error': 'El parámetro company es requerido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dates = {}
+        for param in ('fecha_desde', 'fecha_hasta'):
+            value = request.query_params.get(param)
+            dates[param] = parse_date(value) if value else None
+            if value and dates[param] is None:
+                return Response(
+                    {'error': f'{param} debe tener el formato AAAA-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        desde, hasta = dates['fecha_desde'], dates['fecha_hasta']
+        
+        # status / document_type filters; no prefetch (values only)
+        queryset = export_queryset(company, desde, hasta, self.filter_queryset(Invoice.objects.all()))
+        response = StreamingHttpResponse(stream_xml_zip(queryset), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(company, desde, hasta)}"'
+        return response
+    
     @action(detail=True, methods=['post'])
     def generate_cdc(self, request, pk=None):
-        """Generar CDC y XML para la factura."""
+        """Generar CDC y XML para la factura (en segundo plano)."""
         invoice = self.get_object()
         
         if invoice.status not in ['draft']:
@@ -30,54 +131,46 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            service = SifenService()
-            result = service.generate_invoice(invoice)
-            
-            return Response({
-                'success': True,
-                'cdc': result['cdc'],
-                'message': 'CDC y XML generados correctamente',
-            })
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        task = generate_invoice_task.delay(invoice.id)
+        return self._task_response(invoice, task)
     
     @action(detail=True, methods=['post'])
     def send_to_sifen(self, request, pk=None):
-        """Enviar factura a SIFEN."""
+        """Generar, firmar y enviar factura a SIFEN (en segundo plano)."""
         invoice = self.get_object()
         
-        if invoice.status not in ['draft', 'pending', 'rejected']:
+        if invoice.status not in SENDABLE_STATUSES:
             return Response(
                 {'error': 'La factura no puede ser enviada en este estado'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            service = SifenService()
-            
-            # Generate CDC/XML if not already done
-            if not invoice.cdc:
-                service.generate_invoice(invoice)
-                invoice.refresh_from_db()
-            
-            # Send to SIFEN
-            result = service.send_to_sifen(invoice)
-            
-            return Response({
-                'success': result['success'],
-                'cdc': invoice.cdc,
-                'response_code': result['response_code'],
-                'message': result['response_message'],
-            })
-        except Exception as e:
+        task = send_invoice_task.delay(invoice.id)
+        return self._task_response(invoice, task)
+    
+    @action(detail=True, methods=['post'])
+    def queue(self, request, pk=None):
+        """Encolar factura firmada para el próximo envío por lote."""
+        invoice = self.get_object()
+        
+        # Conditional update: a concurrent send or queue of the same invoice wins once
+        queued = Invoice.objects.filter(
+            pk=invoice.pk,
+            status__in=['pending', 'rejected'],
+        ).with_signed_xml().update(
+            status='queued',
+            lote=None,
+            lote_attempts=0,
+            lote_retry_at=None,
+        )
+        if not queued:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Solo se pueden encolar facturas firmadas pendientes o rechazadas'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        
+        invoice.refresh_from_db()
+        return Response(self.get_serializer(invoice).data)
     
     @action(detail=True, methods=['get'])
     def xml(self, request, pk=None):
@@ -1,6 +1,11 @@
 """SIFEN admin."""
 from django.contrib import admin
-from .models import SifenLog
+from django.utils.html import format_html
+from .models import SifenLog, SifenLote, SifenPayload
+
+
+def _pre(text):
+    return format_html('<pre style="white-space: pre-wrap; max-height: 40em; overflow: auto">{}</pre>', text)
 
 
 @admin.register(SifenLog)
@@ -8,5 +13,36 @@ class SifenLogAdmin(admin.ModelAdmin):
     list_display = ['action', 'cdc', 'response_code', 'duration_ms', 'created_at']
     list_filter = ['action', 'response_code']
     search_fields = ['cdc', 'batch_id']
-    readonly_fields = ['request_xml', 'response_xml']
+    readonly_fields = ['request_xml', 'response_xml', 'request_full_xml', 'response_full_xml']
+    exclude = ['request_payload', 'response_payload']
+    date_hierarchy = 'created_at'
+    
+    @admin.display(description='Request completo')
+    def request_full_xml(self, obj):
+        # Decompressed only on the detail page
+        return _pre(obj.request_full)
+    
+    @admin.display(description='Response completo')
+    def response_full_xml(self, obj):
+        return _pre(obj.response_full)
+
+
+@admin.register(SifenPayload)
+class SifenPayloadAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'codec', 'size', 'created_at']
+    list_filter = ['codec']
+    search_fields = ['sha256']
+    exclude = ['data']
+    readonly_fields = ['sha256', 'codec', 'size', 'created_at', 'contenido']
+    
+    @admin.display(description='Contenido')
+    def contenido(self, obj):
+        return _pre(obj.text)
+
+
+@admin.register(SifenLote)
+class SifenLoteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company', 'protocolo', 'status', 'document_count', 'poll_attempts', 'created_at']
+    list_filter = ['status', 'company']
+    search_fields = ['protocolo']
     date_hierarchy = 'created_at'
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class SifenConfig(AppConfig):
+    name = 'sifen'
+
+    def ready(self):
+        from . import signals  # noqa: F401
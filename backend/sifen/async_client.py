@@ -0,0 +1,213 @@
+"""
+Asyncio SOAP client for SIFEN Web Services.
+
+Mirrors SifenSoapClient on top of httpx.AsyncClient so one process can keep
+hundreds of SIFEN requests in flight without blocking a worker per call.
+
+Usage:
+    async with AsyncSifenSoapClient() as client:
+        response = await client.send_de(xml_signed)
+        responses = await client.query_many(cdcs, concurrency=50)
+"""
+import asyncio
+import time
+from typing import Optional, Iterable, List, Callable, Awaitable, Any
+
+import httpx
+from django.conf import settings
+
+from .log_sink import alog_sifen_call
+from .soap_client import BaseSifenSoapClient, SifenResponse
+from .transport import get_client_options, record_error
+
+
+async def gather_bounded(
+    func: Callable[[Any], Awaitable[Any]],
+    args: Iterable[Any],
+    concurrency: int,
+) -> List[Any]:
+    """
+    Run ``func(arg)`` for every arg with at most ``concurrency`` in flight.
+
+    Args:
+        func: Coroutine function taking a single argument
+        args: Arguments to fan out
+        concurrency: Maximum simultaneous calls
+
+    Returns:
+        Results in the same order as ``args``
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(arg):
+        async with semaphore:
+            return await func(arg)
+
+    return await asyncio.gather(*(run(arg) for arg in args))
+
+
+class AsyncSifenSoapClient(BaseSifenSoapClient):
+    """
+    Asyncio SOAP client for SIFEN web services.
+
+    The underlying httpx.AsyncClient (and its keep-alive pool) lives as long
+    as the client; use it as an async context manager or call ``aclose()``.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: float = 30.0,
+        concurrency: Optional[int] = None,
+    ):
+        """
+        Initialize async SOAP client.
+
+        Args:
+            base_url: SIFEN API base URL (default from settings)
+            timeout: Request timeout in seconds
+            concurrency: Default fan-out limit (default SIFEN_ASYNC_CONCURRENCY)
+        """
+        super().__init__(base_url=base_url, timeout=timeout)
+        self.concurrency = concurrency or settings.SIFEN_ASYNC_CONCURRENCY
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(**get_client_options(self.timeout))
+        return self._client
+
+    async def aclose(self):
+        """Close the connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        self._get_client()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _make_request(
+        self,
+        endpoint: str,
+        body: str,
+        action: str,
+    ) -> SifenResponse:
+        """
+        Make SOAP request to SIFEN.
+
+        Args:
+            endpoint: URL endpoint (relative to base_url)
+            body: SOAP body content
+            action: Action name for logging
+
+        Returns:
+            SifenResponse with result
+        """
+        start_time = time.time()
+        url = f"{self.base_url}{endpoint}"
+        soap_request = self._build_soap_request(body)
+
+        try:
+            response = await self._get_client().post(
+                url,
+                content=soap_request,
+                headers=self._headers(action),
+            )
+            response.raise_for_status()
+        except Exception as e:
+            record_error()
+            return self._error_response(e, int((time.time() - start_time) * 1000))
+
+        duration_ms = int((time.time() - start_time) * 1000)
+        result, log_fields = self._build_response(
+            action, soap_request, response.text, duration_ms
+        )
+
+        # Log request
+        await alog_sifen_call(**log_fields)
+
+        return result
+
+    async def send_de(self, xml_de: str, id_lote: str = "1") -> SifenResponse:
+        """Send electronic document to SIFEN (see SifenSoapClient.send_de)."""
+        body = self._send_de_body(xml_de, id_lote)
+        return await self._make_request(self.ENDPOINT_SEND, body, "send")
+
+    async def query_cdc(self, cdc: str) -> SifenResponse:
+        """Query document status by CDC."""
+        body = self._query_cdc_body(cdc)
+        return await self._make_request(self.ENDPOINT_QUERY_CDC, body, "query")
+
+    async def query_ruc(self, ruc: str) -> SifenResponse:
+        """Query taxpayer information by RUC."""
+        body = self._query_ruc_body(ruc)
+        return await self._make_request(self.ENDPOINT_QUERY_RUC, body, "query")
+
+    async def cancel_de(
+        self,
+        cdc: str,
+        motivo: str = "Anulación solicitada",
+    ) -> SifenResponse:
+        """Cancel (annul) an electronic document."""
+        body = self._cancel_de_body(cdc, motivo)
+        return await self._make_request(self.ENDPOINT_CANCEL, body, "cancel")
+
+    async def send_batch(self, documents: list, id_lote: str = None) -> SifenResponse:
+        """Send multiple documents in a batch (async)."""
+        if not id_lote:
+            id_lote = str(int(time.time()))
+
+        body = self._send_batch_body(documents, id_lote)
+        return await self._make_request(self.ENDPOINT_BATCH, body, "batch")
+
+    async def query_lote(self, protocolo: str) -> SifenResponse:
+        """Query the processing result of a lote."""
+        body = self._query_lote_body(protocolo)
+        return await self._make_request(self.ENDPOINT_QUERY_LOTE, body, "query")
+
+    async def send_many(
+        self,
+        documents: Iterable[str],
+        concurrency: Optional[int] = None,
+    ) -> List[SifenResponse]:
+        """
+        Send many signed DEs concurrently (one rEnviDe per document).
+
+        Args:
+            documents: Signed XML documents
+            concurrency: Max requests in flight (default self.concurrency)
+
+        Returns:
+            List of SifenResponse in input order
+        """
+        return await gather_bounded(
+            self.send_de, documents, concurrency or self.concurrency
+        )
+
+    async def query_many(
+        self,
+        cdcs: Iterable[str],
+        concurrency: Optional[int] = None,
+    ) -> List[SifenResponse]:
+        """
+        Query many CDCs concurrently.
+
+        Args:
+            cdcs: CDC codes
+            concurrency: Max requests in flight (default self.concurrency)
+
+        Returns:
+            List of SifenResponse in input order
+        """
+        return await gather_bounded(
+            self.query_cdc, cdcs, concurrency or self.concurrency
+        )
+
+
+def get_async_soap_client(**kwargs) -> AsyncSifenSoapClient:
+    """Get configured async SOAP client."""
+    return AsyncSifenSoapClient(**kwargs)
@@ -0,0 +1,358 @@
+"""
+Throughput benchmarks for the generate → sign → send pipeline.
+
+Covers CDC generation/validation, DE XML building (1/100/5000 items, tree,
+skeleton and streamed), signing (MockSigner and SifenSigner with a
+self-signed .p12), SOAP response parsing, catalog lookups and an end-to-end
+generate_invoice + send_to_sifen against a local StubSifenServer.
+
+Results are plain JSON so runs can be compared for regressions:
+
+    python manage.py sifen_benchmark --output bench/main.json
+    python manage.py sifen_benchmark --compare bench/main.json
+"""
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .catalogs import buscar_actividad, buscar_unidad, listar_actividades
+from .catalogs.unidades import get_codigo_sifen
+from .cdc import generate_cdc, validate_cdc
+from .signer import MockSigner, SifenSigner
+from .soap_client import BaseSifenSoapClient
+from .testing import StubSifenServer, generate_test_certificate, RESPONSE_TEMPLATE, NS
+from .xml_builder import SifenXMLBuilder
+
+SAMPLE_CDC = "01800123456001001000000122024011512345678909"
+
+
+@dataclass
+class BenchmarkResult:
+    """Timings of one benchmark (milliseconds per operation)."""
+    name: str
+    iterations: int
+    mean_ms: float
+    median_ms: float
+    p95_ms: float
+    min_ms: float
+    ops_per_s: float
+
+
+def measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 1) -> BenchmarkResult:
+    """
+    Time ``func`` over a number of iterations.
+
+    Args:
+        name: Benchmark name
+        func: Operation to time (no arguments)
+        iterations: Timed calls
+        warmup: Untimed calls first (caches, imports)
+
+    Returns:
+        BenchmarkResult
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    mean = statistics.fmean(timings)
+    return BenchmarkResult(
+        name=name,
+        iterations=iterations,
+        mean_ms=round(mean, 4),
+        median_ms=round(statistics.median(timings), 4),
+        p95_ms=round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        min_ms=round(timings[0], 4),
+        ops_per_s=round(1000 / mean, 2) if mean else 0.0,
+    )
+
+
+def sample_de_data(item_count: int) -> dict:
+    """build_de arguments for a factura with ``item_count`` items."""
+    item = {
+        "codigo": "PROD001",
+        "descripcion": "Producto de prueba",
+        "cantidad": Decimal("1"),
+        "precio_unitario": Decimal("110000"),
+        "unidad_medida": "Unidad",
+        "tasa_iva": 10,
+        "subtotal": Decimal("110000"),
+        "iva": Decimal("10000"),
+        "total": Decimal("110000"),
+    }
+    total = Decimal("110000") * item_count
+    return {
+        "cdc": SAMPLE_CDC,
+        "tipo_de": 1,
+        "fecha_emision": datetime(2024, 1, 15, 10, 30, 0),
+        "emisor_ruc": "80012345-6",
+        "emisor_razon_social": "Empresa Test S.A.",
+        "emisor_nombre_fantasia": "Test Corp",
+        "emisor_actividad": "47111",
+        "emisor_timbrado": "12345678",
+        "emisor_establecimiento": "001",
+        "emisor_punto": "001",
+        "emisor_numero": 1,
+        "emisor_direccion": "Av. España 1234",
+        "emisor_departamento": "CENTRAL",
+        "emisor_distrito": "SAN LORENZO",
+        "emisor_ciudad": "SAN LORENZO",
+        "receptor_contribuyente": True,
+        "receptor_ruc": "12345678-9",
+        "receptor_razon_social": "Cliente Test",
+        "total": total,
+        "total_iva_10": total,
+        "items": [dict(item, codigo=f"PROD{n:05d}") for n in range(item_count)],
+    }
+
+
+class BenchmarkSuite:
+    """Runs the pipeline benchmarks."""
+
+    # name -> default iterations
+    ITERATIONS = {
+        "cdc.generate": 5000,
+        "cdc.validate": 5000,
+        "xml.build_de[1]": 500,
+        "xml.build_de[100]": 50,
+        "xml.build_de[5000]": 3,
+        "xml.build_de_skeleton[1]": 500,
+        "xml.stream_de[5000]": 3,
+        "sign.mock[1]": 500,
+        "sign.xmlsec[1]": 50,
+        "sign.xmlsec[100]": 20,
+        "soap.parse_response": 2000,
+        "catalog.buscar_actividad": 5000,
+        "catalog.buscar_unidad": 5000,
+        "catalog.listar_actividades": 5000,
+        "catalog.get_codigo_sifen": 20000,
+        "e2e.generate_invoice": 20,
+        "e2e.send_to_sifen": 20,
+    }
+
+    def __init__(self, scale: float = 1.0, only: Optional[str] = None, e2e: bool = True):
+        """
+        Args:
+            scale: Multiplier for the default iteration counts
+            only: Run only benchmarks whose name starts with this prefix
+            e2e: Include the database-backed end-to-end benchmarks
+        """
+        self.scale = scale
+        self.only = only
+        self.e2e = e2e
+        self.results: List[BenchmarkResult] = []
+
+    def _selected(self, name: str) -> bool:
+        return not self.only or name.startswith(self.only)
+
+    def _run(self, name: str, func: Callable[[], object]):
+        if self._selected(name):
+            iterations = max(1, int(self.ITERATIONS[name] * self.scale))
+            self.results.append(measure(name, func, iterations))
+
+    def run(self) -> List[BenchmarkResult]:
+        """Run every selected benchmark."""
+        self.results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            cert_path = generate_test_certificate(os.path.join(tmp, "bench.p12"), "bench")
+            self._bench_cdc()
+            self._bench_xml()
+            self._bench_sign(cert_path, "bench")
+            self._bench_parse()
+            self._bench_catalogs()
+            if self.e2e and any(self._selected(n) for n in self.ITERATIONS if n.startswith("e2e.")):
+                self._bench_e2e(cert_path, "bench")
+        return self.results
+
+    def _bench_cdc(self):
+        fecha = datetime(2024, 1, 15)
+        self._run("cdc.generate", lambda: generate_cdc(
+            tipo_de=1,
+            ruc="80012345-6",
+            establecimiento="001",
+            punto="001",
+            numero=1,
+            tipo_contribuyente=2,
+            fecha_emision=fecha,
+        ))
+        self._run("cdc.validate", lambda: validate_cdc(SAMPLE_CDC))
+
+    def _bench_xml(self):
+        for count in (1, 100, 5000):
+            data = sample_de_data(count)
+            self._run(f"xml.build_de[{count}]", lambda data=data: SifenXMLBuilder().build_de(**data))
+
+        data = sample_de_data(1)
+        emisor = {k: v for k, v in data.items()
+                  if k.startswith("emisor_") and k not in ("emisor_timbrado", "emisor_numero")}
+        skeleton = SifenXMLBuilder().build_skeleton(**emisor)
+        self._run("xml.build_de_skeleton[1]", lambda: SifenXMLBuilder().build_de(skeleton=skeleton, **data))
+
+        data = sample_de_data(5000)
+        self._run("xml.stream_de[5000]", lambda: SifenXMLBuilder().build_de(output=io.BytesIO(), **data))
+
+    def _bench_sign(self, cert_path: str, cert_password: str):
+        documents = {}
+        for count in (1, 100):
+            builder = SifenXMLBuilder()
+            builder.build_de(**sample_de_data(count))
+            documents[count] = builder.to_string()
+
+        mock = MockSigner()
+        self._run("sign.mock[1]", lambda: mock.sign_string(documents[1]))
+
+        signer = SifenSigner(cert_path, cert_password)
+        for count, xml in documents.items():
+            self._run(f"sign.xmlsec[{count}]", lambda xml=xml: signer.sign_string(xml))
+
+    def _bench_parse(self):
+        response = RESPONSE_TEMPLATE.format(
+            root="rRetEnviDe",
+            ns=NS,
+            processing_id=1,
+            cdc=SAMPLE_CDC,
+            code="0260",
+            message="Autorización del DE satisfactoria",
+        )
+        client = BaseSifenSoapClient(base_url="http://localhost")
+        self._run("soap.parse_response", lambda: client._parse_response(response))
+
+    def _bench_catalogs(self):
+        self._run("catalog.buscar_actividad", lambda: buscar_actividad("venta al por menor de"))
+        self._run("catalog.buscar_unidad", lambda: buscar_unidad("metro"))
+        self._run("catalog.listar_actividades", lambda: listar_actividades(seccion="47", offset=20, limit=50))
+        self._run("catalog.get_codigo_sifen", lambda: get_codigo_sifen("kg"))
+
+    def _bench_e2e(self, cert_path: str, cert_password: str):
+        """generate_invoice + send_to_sifen on throwaway rows (rolled back)."""
+        from django.db import transaction
+        from companies.models import Company, EstablishmentPoint
+        from invoicing.models import Invoice, InvoiceItem
+        from .services import SifenService
+
+        # Real signer and SOAP client, but against the local stub
+        with StubSifenServer() as server, override_settings(
+            SIFEN_ENVIRONMENT="production",
+            SIFEN_API_URL=server.url,
+            SIFEN_CERT_PATH=cert_path,
+            SIFEN_CERT_PASSWORD=cert_password,
+            # Buffered logs are flushed on another connection, outside the rollback
+            SIFEN_LOG_MODE="sync",
+        ), transaction.atomic():
+            company = Company.objects.create(
+                ruc="80099999-1",
+                razon_social="Benchmark S.A.",
+                actividad_economica="47111",
+                departamento="CENTRAL",
+                distrito="SAN LORENZO",
+                ciudad="SAN LORENZO",
+                direccion="Av. España 1234",
+                email="bench@example.com",
+            )
+            establishment = EstablishmentPoint.objects.create(
+                company=company,
+                codigo_establecimiento="001",
+                codigo_punto="001",
+                descripcion="Benchmark",
+            )
+            invoice = Invoice.objects.create(
+                company=company,
+                establishment=establishment,
+                numero=1,
+                timbrado="12345678",
+                receptor_ruc="12345678-9",
+                receptor_nombre="Cliente Test",
+                fecha_emision=timezone.now(),
+                total=110000,
+                subtotal_gravado_10=110000,
+            )
+            InvoiceItem.objects.create(
+                invoice=invoice,
+                descripcion="Producto",
+                cantidad=1,
+                precio_unitario=110000,
+            )
+            invoice = Invoice.objects.select_related("company", "establishment").get(pk=invoice.pk)
+
+            service = SifenService(mock_mode=False)
+            self._run("e2e.generate_invoice", lambda: service.generate_invoice(invoice))
+            self._run("e2e.send_to_sifen", lambda: service.send_to_sifen(invoice))
+
+            transaction.set_rollback(True)
+
+
+def save_results(results: List[BenchmarkResult], path: str):
+    """Write results with environment metadata as JSON."""
+    from lxml import etree
+
+    data = {
+        "created_at": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "lxml": ".".join(str(v) for v in etree.LXML_VERSION),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": [asdict(r) for r in results],
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="UTF-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_results(path: str) -> List[BenchmarkResult]:
+    """Read results written by save_results."""
+    with open(path, encoding="UTF-8") as f:
+        data = json.load(f)
+    return [BenchmarkResult(**r) for r in data["results"]]
+
+
+def compare(
+    results: List[BenchmarkResult],
+    baseline: List[BenchmarkResult],
+    threshold: float = 0.10,
+) -> List[dict]:
+    """
+    Compare mean timings against a baseline run.
+
+    Args:
+        results: Current run
+        baseline: Previous run
+        threshold: Allowed slowdown (0.10 = 10%)
+
+    Returns:
+        One dict per benchmark present in both runs, with name,
+        baseline_ms, current_ms, change (fraction) and regression
+    """
+    previous = {r.name: r for r in baseline}
+    rows = []
+    for result in results:
+        before = previous.get(result.name)
+        if before is None or not before.mean_ms:
+            continue
+        change = (result.mean_ms - before.mean_ms) / before.mean_ms
+        rows.append({
+            "name": result.name,
+            "baseline_ms": before.mean_ms,
+            "current_ms": result.mean_ms,
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+    return rows
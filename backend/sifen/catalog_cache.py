@@ -0,0 +1,140 @@
+"""
+Precomputed catalog API responses.
+
+Catalog endpoints return static data that the frontend requests on every
+form load. Each response is serialized once per catalog version and kept
+with its gzip (and brotli, when the ``brotli`` package is installed)
+encodings, so a request only picks bytes:
+
+- strong ETag per body (``"<sha256>"``, ``"<sha256>-gzip"``, ``"<sha256>-br"``);
+  ``If-None-Match`` gets a 304 without a body
+- ``?v=<version>`` (the ``X-Catalog-Version`` header of a previous response)
+  is served with ``Cache-Control: immutable`` for a year; unversioned URLs
+  are cached for SIFEN_CATALOG_MAX_AGE seconds and then revalidated
+
+The version of a data-file catalog is the sha256 of its data file (see
+catalogs/store.py), so update_catalogs invalidates the responses.
+
+Usage:
+    return cached_response(request, "monedas", lambda: [...])
+"""
+import gzip
+import hashlib
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Preference order when the client accepts several
+ENCODINGS = ("br", "gzip")
+
+
+class PrecomputedResponse:
+    """A JSON body serialized and compressed once."""
+
+    def __init__(self, data, version: str = ""):
+        """
+        Args:
+            data: Response data (as for a DRF Response)
+            version: Catalog version it was built from
+        """
+        self.source_version = version
+        self.body = JSONRenderer().render(data)
+        self.version = hashlib.sha256(self.body).hexdigest()[:32]
+        self.bodies: Dict[str, bytes] = {"gzip": gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            self.bodies["br"] = brotli.compress(self.body, quality=11)
+        # Tiny bodies may grow when compressed
+        self.bodies = {k: v for k, v in self.bodies.items() if len(v) < len(self.body)}
+
+    def etag(self, encoding: str = "") -> str:
+        return f'"{self.version}-{encoding}"' if encoding else f'"{self.version}"'
+
+    def not_modified(self, request) -> bool:
+        """Whether If-None-Match names any encoding of this body."""
+        header = request.headers.get("If-None-Match", "")
+        if header.strip() == "*":
+            return True
+        for tag in header.split(","):
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag.split("-", 1)[0] == self.version:
+                return True
+        return False
+
+    def encoding_for(self, request) -> str:
+        """Best precomputed encoding accepted by the client ('' for none)."""
+        accepted = {}
+        for part in request.headers.get("Accept-Encoding", "").split(","):
+            coding, _, params = part.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding.lower()] = quality
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return ""
+
+    def response(self, request) -> HttpResponse:
+        """200 with the best encoding, or 304 if the client has it."""
+        if request.GET.get("v") == self.version:
+            cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            cache_control = f"public, max-age={settings.SIFEN_CATALOG_MAX_AGE}, must-revalidate"
+
+        encoding = self.encoding_for(request)
+        if self.not_modified(request):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.bodies.get(encoding, self.body), content_type="application/json")
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = self.etag(encoding)
+        response["Cache-Control"] = cache_control
+        response["X-Catalog-Version"] = self.version
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+
+_responses: Dict[str, PrecomputedResponse] = {}
+
+
+def cached_response(request, key: str, build: Callable[[], object], version: str = "") -> HttpResponse:
+    """
+    Serve a precomputed catalog response, building it on first use.
+
+    Args:
+        request: Current request
+        key: Name of the response (e.g. "departamentos", "departamento:11")
+        build: Returns the response data
+        version: Version of the catalog data; the response is rebuilt when
+            it changes (empty for catalogs defined in code)
+
+    Returns:
+        HttpResponse (200 or 304)
+    """
+    precomputed = _responses.get(key)
+    if precomputed is None or precomputed.source_version != version:
+        precomputed = PrecomputedResponse(build(), version)
+        _responses[key] = precomputed
+    return precomputed.response(request)
+
+
+def clear_responses():
+    """Drop every precomputed response of this process."""
+    _responses.clear()
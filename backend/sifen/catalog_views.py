@@ -1,45 +1,63 @@
 """API views for SIFEN catalogs."""
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from .catalogs import (
     DEPARTAMENTOS, get_departamento,
-    ACTIVIDADES_ECONOMICAS, buscar_actividad,
+    buscar_actividad, listar_actividades,
     TIPOS_DOCUMENTO, MONEDAS, TASAS_IVA,
     UNIDADES_MEDIDA, buscar_unidad,
 )
+from .catalogs.departamentos import DISTRITOS
 from .catalogs.documentos import TIPOS_DE, TIPO_OPERACION
+from .catalog_cache import cached_response
+
+# Maximum rows per page of actividades_list
+ACTIVIDADES_MAX_LIMIT = 500
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def departamentos_list(request):
-    """List all departments."""
-    result = []
-    for codigo, data in DEPARTAMENTOS.items():
-        result.append({
-            "codigo": codigo,
-            "nombre": data["nombre"],
-            "distritos_count": len(data.get("distritos", {}))
-        })
-    return Response(sorted(result, key=lambda x: int(x["codigo"])))
+    """List all departments (precomputed, see catalog_cache.py)."""
+    def build():
+        result = []
+        for codigo, data in DEPARTAMENTOS.items():
+            result.append({
+                "codigo": codigo,
+                "nombre": data["nombre"],
+                "distritos_count": len(data.get("distritos", {}))
+            })
+        return sorted(result, key=lambda x: int(x["codigo"]))
+    
+    return cached_response(request, "departamentos", build, _departamentos_version())
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def departamento_detail(request, codigo):
     """Get department with districts."""
-    data = get_departamento(codigo)
-    distritos = [
-        {"codigo": k, "nombre": v}
-        for k, v in data.get("distritos", {}).items()
-    ]
-    return Response({
-        "codigo": codigo,
-        "nombre": data["nombre"],
-        "distritos": sorted(distritos, key=lambda x: int(x["codigo"]))
-    })
+    def build():
+        data = get_departamento(codigo)
+        distritos = [
+            {"codigo": k, "nombre": v}
+            for k, v in data.get("distritos", {}).items()
+        ]
+        return {
+            "codigo": codigo,
+            "nombre": data["nombre"],
+            "distritos": sorted(distritos, key=lambda x: int(x["codigo"]))
+        }
+    
+    if codigo not in DEPARTAMENTOS:
+        return Response(build())
+    return cached_response(request, f"departamento:{codigo}", build, _departamentos_version())
+
+
+def _departamentos_version() -> str:
+    return f"{DEPARTAMENTOS.version}:{DISTRITOS.version}"
 
 
 @api_view(['GET'])
@@ -57,26 +75,36 @@ def actividades_search(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def actividades_list(request):
-    """List economic activities (paginated)."""
-    limit = int(request.GET.get('limit', 50))
-    offset = int(request.GET.get('offset', 0))
+    """
+    List economic activities by code, paginated.
     
-    items = list(ACTIVIDADES_ECONOMICAS.items())[offset:offset+limit]
-    result = [
-        {"codigo": k, "descripcion": v}
-        for k, v in items
-    ]
-    return Response({
-        "count": len(ACTIVIDADES_ECONOMICAS),
-        "results": result
-    })
+    Query params: limit, offset, after (keyset: next_after of the previous
+    page), seccion (CNAEP code prefix) and q (search, ranked).
+    """
+    return Response(listar_actividades(
+        seccion=request.GET.get('seccion', ''),
+        termino=request.GET.get('q', ''),
+        offset=_int_param(request, 'offset', 0),
+        limit=min(_int_param(request, 'limit', 50), ACTIVIDADES_MAX_LIMIT),
+        despues=request.GET.get('after', ''),
+    ))
+
+
+def _int_param(request, name: str, default: int) -> int:
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValidationError({name: "Debe ser un entero no negativo"})
+    return value
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def tipos_documento_list(request):
     """List document types."""
-    return Response({
+    return cached_response(request, "documentos", lambda: {
         "tipos_de": [{"codigo": k, "descripcion": v} for k, v in TIPOS_DE.items()],
         "tipos_identidad": [{"codigo": k, "descripcion": v} for k, v in TIPOS_DOCUMENTO.items()],
         "tipos_operacion": [{"codigo": k, "descripcion": v} for k, v in TIPO_OPERACION.items()],
@@ -87,7 +115,7 @@ def tipos_documento_list(request):
 @permission_classes([AllowAny])
 def monedas_list(request):
     """List currencies."""
-    result = [
+    return cached_response(request, "monedas", lambda: [
         {
             "codigo": k,
             "nombre": v["nombre"],
@@ -95,35 +123,31 @@ def monedas_list(request):
             "decimales": v["decimales"]
         }
         for k, v in MONEDAS.items()
-    ]
-    return Response(result)
+    ])
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def tasas_iva_list(request):
     """List IVA rates."""
-    result = [
+    return cached_response(request, "iva", lambda: [
         {
             "tasa": k,
             "descripcion": v["descripcion"],
             "codigo_afectacion": v["codigo_afectacion"],
         }
         for k, v in TASAS_IVA.items()
-    ]
-    return Response(result)
+    ])
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def unidades_search(request):
-    """Search units of measure."""
+    """Search units of measure (the full list is precomputed)."""
     termino = request.GET.get('q', '')
     if termino:
-        resultados = buscar_unidad(termino)
-    else:
-        resultados = [
-            {"codigo_sifen": k, "codigo": v["codigo"], "descripcion": v["descripcion"]}
-            for k, v in UNIDADES_MEDIDA.items()
-        ]
-    return Response(resultados)
+        return Response(buscar_unidad(termino))
+    return cached_response(request, "unidades", lambda: [
+        {"codigo_sifen": k, "codigo": v["codigo"], "descripcion": v["descripcion"]}
+        for k, v in UNIDADES_MEDIDA.items()
+    ], UNIDADES_MEDIDA.version)
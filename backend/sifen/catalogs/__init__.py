@@ -1,6 +1,6 @@
 """SIFEN Catalogs from DNIT."""
 from .departamentos import DEPARTAMENTOS, get_departamento, buscar_departamento
-from .actividades import ACTIVIDADES_ECONOMICAS, get_actividad, buscar_actividad
+from .actividades import ACTIVIDADES_ECONOMICAS, get_actividad, buscar_actividad, listar_actividades
 from .documentos import TIPOS_DOCUMENTO, get_tipo_documento
 from .monedas import MONEDAS, get_moneda
 from .impuestos import TASAS_IVA, get_tasa_iva
@@ -8,7 +8,7 @@ from .unidades import UNIDADES_MEDIDA, get_unidad_medida, buscar_unidad
 
 __all__ = [
     'DEPARTAMENTOS', 'get_departamento', 'buscar_departamento',
-    'ACTIVIDADES_ECONOMICAS', 'get_actividad', 'buscar_actividad',
+    'ACTIVIDADES_ECONOMICAS', 'get_actividad', 'buscar_actividad', 'listar_actividades',
     'TIPOS_DOCUMENTO', 'get_tipo_documento',
     'MONEDAS', 'get_moneda',
     'TASAS_IVA', 'get_tasa_iva',
@@ -0,0 +1,180 @@
+"""
+Geographic codes (department, district, city) for the DE.
+
+The DE carries catalog codes next to the names (cDepEmi/cDisEmi/cCiuEmi
+and cDepRec/cDisRec/cCiuRec), while companies and invoices store names as
+typed. resolver_ubicacion turns names into codes:
+
+- department: code or exact name (case and accents ignored), a few common
+  abbreviations, the department of a district with that name
+  (ASUNCION -> CAPITAL), then the best partial match
+- district: exact name within the department, then the best partial match
+- city: exact name within the district, then within the department. The
+  DNIT city table is imported with update_catalogs (data/ciudades.csv
+  ships without rows)
+
+A part that does not resolve has code None and keeps the given name; it is
+never guessed. The receptor location is only written when it resolves
+(Ubicacion.resuelta); the emisor one is mandatory, so its unresolved codes
+fall back to the historical defaults (EMISOR_POR_DEFECTO) with a warning.
+
+Results are memoized per names and catalog version; ubicacion_empresa also
+keeps one entry per Company (keyed on updated_at, evicted by sifen.signals).
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .departamentos import CIUDADES, DEPARTAMENTOS, DISTRITOS, buscar_departamento, codigo_departamento
+from .index import CatalogIndex, tokenize
+
+# Codes written for an unresolved emisor location (mandatory in the DE)
+EMISOR_POR_DEFECTO = {"departamento": "11", "distrito": "1", "ciudad": "1"}
+
+# Folded names missing from the catalog -> department code
+ALIAS_DEPARTAMENTOS = {
+    "asuncion": "0",
+    "pte hayes": "15",
+    "pdte hayes": "15",
+}
+
+
+@dataclass(frozen=True)
+class Ubicacion:
+    """Codes and catalog names of a location (code None: not resolved)."""
+    departamento: Optional[str]
+    departamento_nombre: str
+    distrito: Optional[str]
+    distrito_nombre: str
+    ciudad: Optional[str]
+    ciudad_nombre: str
+
+    @property
+    def sin_resolver(self) -> List[str]:
+        """Parts without a catalog code."""
+        return [parte for parte in ("departamento", "distrito", "ciudad") if getattr(self, parte) is None]
+
+    @property
+    def resuelta(self) -> bool:
+        """
+        Whether the location can be written as is: department and district
+        resolved, and the city too once the DNIT city table is imported.
+        """
+        sin_resolver = self.sin_resolver
+        if sin_resolver == ["ciudad"]:
+            return not len(CIUDADES)
+        return not sin_resolver
+
+
+def _clave(texto: str) -> str:
+    return " ".join(tokenize(texto or ""))
+
+
+def _versiones() -> Tuple[str, str, str]:
+    return DEPARTAMENTOS.version, DISTRITOS.version, CIUDADES.version
+
+
+def resolver_ubicacion(departamento: str, distrito: str = "", ciudad: str = "") -> Ubicacion:
+    """
+    Codes of a location given by name.
+
+    Args:
+        departamento: Department name or code
+        distrito: District name
+        ciudad: City name
+
+    Returns:
+        Ubicacion with the codes (memoized)
+    """
+    return _resolver(departamento or "", distrito or "", ciudad or "", _versiones())
+
+
+@lru_cache(maxsize=4096)
+def _resolver(departamento: str, distrito: str, ciudad: str, versiones: tuple) -> Ubicacion:
+    dep = _resolver_departamento(departamento)
+    dis = dis_nombre = ciu = ciu_nombre = None
+    if dep is not None:
+        dis, dis_nombre = _buscar(
+            [(codigo, nombre) for _, codigo, nombre in DISTRITOS.rows(dep)], distrito, parcial=True
+        )
+        ciudades = CIUDADES.rows(dep)
+        ciu, ciu_nombre = _buscar([(c, n) for _, d, c, n in ciudades if d == dis], ciudad)
+        if ciu is None:
+            ciu, ciu_nombre = _buscar([(c, n) for _, _, c, n in ciudades], ciudad)
+    return Ubicacion(
+        departamento=dep,
+        departamento_nombre=DEPARTAMENTOS[dep]["nombre"] if dep is not None else departamento,
+        distrito=dis,
+        distrito_nombre=dis_nombre or distrito,
+        ciudad=ciu,
+        ciudad_nombre=ciu_nombre or ciudad,
+    )
+
+
+def _resolver_departamento(nombre: str) -> Optional[str]:
+    codigo = codigo_departamento(nombre) or ALIAS_DEPARTAMENTOS.get(_clave(nombre))
+    if codigo is None:
+        # A district name: its department when only one has it
+        departamentos = DISTRITOS.derive("departamentos_por_nombre", _departamentos_por_nombre)
+        candidatos = departamentos.get(_clave(nombre), ())
+        if len(candidatos) == 1:
+            codigo = candidatos[0]
+    return codigo or buscar_departamento(nombre, default=None)
+
+
+def _departamentos_por_nombre(catalogo) -> Dict[str, tuple]:
+    """Folded district name -> codes of the departments with that district."""
+    resultado = {}
+    for departamento, _, nombre in catalogo.pack:
+        codigos = resultado.setdefault(_clave(nombre), ())
+        if departamento not in codigos:
+            resultado[_clave(nombre)] = codigos + (departamento,)
+    return resultado
+
+
+def _buscar(filas, nombre: str, parcial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    """(codigo, nombre) of the row named ``nombre``; best partial match if ``parcial``."""
+    clave = _clave(nombre)
+    if not clave or not filas:
+        return None, None
+    for codigo, nombre_catalogo in filas:
+        if _clave(nombre_catalogo) == clave:
+            return codigo, nombre_catalogo
+    if parcial:
+        nombres = dict(filas)
+        codigos = CatalogIndex({codigo: (n,) for codigo, n in filas}).search(clave, limit=1)
+        if codigos:
+            return codigos[0], nombres[codigos[0]]
+    return None, None
+
+
+# Company pk -> (updated_at, catalog versions, Ubicacion)
+_empresas: Dict[int, tuple] = {}
+
+
+def ubicacion_empresa(company) -> Ubicacion:
+    """
+    Location codes of a company (emisor), cached per Company.
+
+    Args:
+        company: Company (departamento, distrito, ciudad)
+
+    Returns:
+        Ubicacion of the company
+    """
+    versiones = _versiones()
+    cached = _empresas.get(company.pk)
+    if cached is not None and cached[:2] == (company.updated_at, versiones):
+        return cached[2]
+    ubicacion = resolver_ubicacion(company.departamento, company.distrito, company.ciudad)
+    if company.pk is not None:
+        _empresas[company.pk] = (company.updated_at, versiones, ubicacion)
+    return ubicacion
+
+
+def invalidar_ubicaciones(company_id: Optional[int] = None):
+    """Forget cached company locations (all, or one company's)."""
+    if company_id is None:
+        _empresas.clear()
+    else:
+        _empresas.pop(company_id, None)
@@ -0,0 +1,110 @@
+"""
+In-memory search index for the SIFEN catalogs.
+
+The catalog lookups used to scan every entry and call ``.lower()`` /
+``.upper()`` on each one per call; the full DNIT activity catalog has
+8000+ entries. Each catalog now builds a CatalogIndex once, at import:
+
+- texts are accent-folded and lower-cased (``"Kilómetro"`` → ``"kilometro"``)
+  and split into tokens
+- a token index maps each token to the entries containing it
+- a prefix index maps each prefix of the vocabulary to the tokens starting
+  with it, so ``"farmac"`` finds ``farmacias`` and ``farmaceuticos``
+  without scanning
+
+A search matches the entries where every query token is a prefix of one of
+their tokens, ranked by exact token matches, then by whether the text
+(code or description) starts with the query, then by catalog order.
+
+Usage:
+    index = CatalogIndex({"83": ["KG", "Kilogramo"], "21": ["LT", "Litro"]})
+    index.search("kilo")  # ["83"]
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lower-case ``text`` and strip its accents (``"Año"`` → ``"ano"``)."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Folded alphanumeric tokens of ``text``."""
+    return _TOKEN_RE.findall(fold(text))
+
+
+class CatalogIndex:
+    """Token and prefix inverted indexes over the texts of a catalog."""
+
+    def __init__(self, entries: Dict[str, Iterable[str]]):
+        """
+        Args:
+            entries: Catalog key -> texts to index (code, description...),
+                in catalog order
+        """
+        self.keys: List[str] = []
+        self._texts: List[tuple] = []
+        self._tokens: Dict[str, set] = {}
+        for position, (key, texts) in enumerate(entries.items()):
+            texts = [str(t) for t in texts if t]
+            self.keys.append(key)
+            tokenized = [tokenize(t) for t in texts]
+            self._texts.append(tuple(" ".join(tokens) for tokens in tokenized))
+            for tokens in tokenized:
+                for token in tokens:
+                    self._tokens.setdefault(token, set()).add(position)
+
+        self._prefixes: Dict[str, List[str]] = {}
+        for token in self._tokens:
+            for end in range(1, len(token) + 1):
+                self._prefixes.setdefault(token[:end], []).append(token)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _matches(self, term: str) -> Dict[int, int]:
+        """Entries matching one query token: position -> 2 (exact) or 1 (prefix)."""
+        scores = {}
+        for token in self._prefixes.get(term, ()):
+            score = 2 if token == term else 1
+            for position in self._tokens[token]:
+                if scores.get(position, 0) < score:
+                    scores[position] = score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Keys of the entries matching every token of ``query``, best first.
+
+        Args:
+            query: Free text, case and accents are ignored
+            limit: Maximum number of keys returned
+
+        Returns:
+            Matching keys (empty if the query has no tokens)
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Rarest term first keeps the intersection small
+        matches = sorted((self._matches(term) for term in dict.fromkeys(terms)), key=len)
+        scores = matches[0]
+        for other in matches[1:]:
+            scores = {p: s + other[p] for p, s in scores.items() if p in other}
+            if not scores:
+                return []
+
+        phrase = " ".join(terms)
+        ranked = sorted(
+            scores,
+            key=lambda p: (-scores[p], not any(t.startswith(phrase) for t in self._texts[p]), p),
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.keys[p] for p in ranked]
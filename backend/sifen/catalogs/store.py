@@ -0,0 +1,476 @@
+"""
+Catalog data files and their compiled, memory-mapped form.
+
+The large DNIT catalogs (economic activities, units, departments,
+districts and cities) are versioned CSV files instead of Python dict literals:
+
+- ``sifen/catalogs/data/<name>.csv``: catalogs bundled with the code
+- ``SIFEN_CATALOG_DIR/<name>.csv``: newer versions imported with
+  ``manage.py update_catalogs``; they take precedence over the bundled ones
+
+Without SIFEN_CATALOG_DIR only the bundled files are read: data files are
+never taken from a shared directory such as the temp dir.
+
+Nothing is read at import. On first access a catalog is compiled into
+``<pack dir>/<name>.pack`` (recompiled when its source changes) and
+memory-mapped read-only: every gunicorn/Celery worker on the host shares
+the same pages of the OS cache instead of holding its own copy of the
+dicts. The pack dir is SIFEN_CATALOG_DIR, or a directory private to the
+user in the temp dir; if it is not usable the pack is built in memory.
+
+Pack layout (native byte order, rebuilt on any other host):
+
+    MAGIC | header length (u32) | JSON header
+    | record offsets (u32 × count+1) | key order (u32 × count) | records
+
+Records are the UTF-8 fields of a row joined by ``\\x1f``, in source order;
+the key order (rows sorted by first field) allows binary search.
+
+Usage:
+    ACTIVIDADES_ECONOMICAS = LazyCatalog("actividades", lambda row: row[1])
+    ACTIVIDADES_ECONOMICAS["47111"]
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import stat
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import ItemsView, Mapping
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .index import fold
+
+logger = logging.getLogger(__name__)
+
+# Catalog name -> columns of its data file (the first one is the key)
+CATALOGS = {
+    "actividades": ["codigo", "descripcion"],
+    "unidades": ["codigo_sifen", "codigo", "descripcion"],
+    "departamentos": ["codigo", "nombre"],
+    "distritos": ["departamento", "codigo", "nombre"],
+    "ciudades": ["departamento", "distrito", "codigo", "nombre"],
+}
+
+# Columns that identify a row (must be unique)
+UNIQUE = {
+    "distritos": ["departamento", "codigo"],
+    "ciudades": ["departamento", "distrito", "codigo"],
+}
+
+BUNDLED_DIR = os.path.join(os.path.dirname(__file__), "data")
+MANIFEST_NAME = "manifest.json"
+
+MAGIC = b"SIFENCAT1\n"
+SEPARATOR = "\x1f"
+
+
+def catalog_dir() -> str:
+    """Directory of updated sources (SIFEN_CATALOG_DIR; empty: bundled data only)."""
+    return settings.SIFEN_CATALOG_DIR
+
+
+def pack_dir() -> str:
+    """
+    Directory of compiled packs.
+
+    SIFEN_CATALOG_DIR, else ``sifen-catalogs-<uid>`` in the temp dir, created
+    with mode 0700.
+
+    Raises:
+        OSError: If the private directory is a link, belongs to another
+            user or others can write to it
+    """
+    if settings.SIFEN_CATALOG_DIR:
+        return settings.SIFEN_CATALOG_DIR
+    path = os.path.join(tempfile.gettempdir(), f"sifen-catalogs-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{path} no es un directorio privado")
+    return path
+
+
+def source_path(name: str) -> str:
+    """Data file of a catalog: the updated one if present, else the bundled one."""
+    if catalog_dir():
+        path = os.path.join(catalog_dir(), f"{name}.csv")
+        if os.path.exists(path):
+            return path
+    return os.path.join(BUNDLED_DIR, f"{name}.csv")
+
+
+def read_manifest(directory: str) -> Dict[str, dict]:
+    """Versions of the catalogs in a directory (empty if it has no manifest)."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="UTF-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def catalog_version(name: str) -> str:
+    """Version of the data file currently used for a catalog."""
+    entry = read_manifest(os.path.dirname(source_path(name))).get(name, {})
+    return entry.get("version", "")
+
+
+def read_rows(path: str, columns: Sequence[str]) -> List[tuple]:
+    """Rows of a catalog data file, as tuples in ``columns`` order."""
+    with open(path, encoding="UTF-8", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = set(columns) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{os.path.basename(path)}: faltan columnas {', '.join(sorted(missing))}")
+        return [tuple(row[c].strip() for c in columns) for row in reader]
+
+
+def write_rows(path: str, columns: Sequence[str], rows: Sequence[Sequence[str]]):
+    """Write a catalog data file (atomically)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="UTF-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_pack(name: str, source: str) -> bytes:
+    """Compile a catalog data file into the pack format."""
+    rows = read_rows(source, CATALOGS[name])
+    records = [SEPARATOR.join(row).encode("UTF-8") for row in rows]
+
+    offsets = array("I", [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    order = array("I", sorted(range(len(rows)), key=lambda i: (rows[i][0], i)))
+
+    header = json.dumps({
+        "name": name,
+        "version": catalog_version(name),
+        "sha256": _digest(source),
+        "columns": CATALOGS[name],
+        "count": len(rows),
+        "byteorder": sys.byteorder,
+    }).encode("UTF-8")
+    # Keep the u32 arrays aligned
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 4)
+    return b"".join([
+        MAGIC,
+        array("I", [len(header)]).tobytes(),
+        header,
+        offsets.tobytes(),
+        order.tobytes(),
+        *records,
+    ])
+
+
+def compile_catalog(name: str, source: Optional[str] = None, target: Optional[str] = None) -> str:
+    """
+    Write the pack of a catalog.
+
+    Args:
+        name: Catalog (see CATALOGS)
+        source: Data file (default source_path(name))
+        target: Pack file (default <pack_dir()>/<name>.pack)
+
+    Returns:
+        Path of the pack
+    """
+    source = source or source_path(name)
+    target = target or os.path.join(pack_dir(), f"{name}.pack")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Unique temporary name: several workers may compile at once
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", dir=os.path.dirname(target))
+    with os.fdopen(fd, "wb") as f:
+        f.write(build_pack(name, source))
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, target)
+    return target
+
+
+class PackedCatalog:
+    """Read-only view of a compiled catalog (a file mapped in memory, or bytes)."""
+
+    def __init__(self, path: Optional[str] = None, data: Optional[bytes] = None):
+        if path is not None:
+            with open(path, "rb") as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = data
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("No es un catálogo compilado")
+
+        view = memoryview(self._buffer)
+        start = len(MAGIC) + 4
+        end = start + view[len(MAGIC):start].cast("I")[0]
+        self.header = json.loads(bytes(view[start:end]))
+        count = self.header["count"]
+        self._offsets = view[end:end + 4 * (count + 1)].cast("I")
+        end += 4 * (count + 1)
+        self._order = view[end:end + 4 * count].cast("I")
+        self._base = end + 4 * count
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def __iter__(self) -> Iterator[tuple]:
+        return (self.row(i) for i in range(len(self)))
+
+    def row(self, index: int) -> tuple:
+        """Fields of the row at ``index`` (source order)."""
+        start = self._base + self._offsets[index]
+        end = self._base + self._offsets[index + 1]
+        return tuple(self._buffer[start:end].decode("UTF-8").split(SEPARATOR))
+
+    def _key(self, index: int) -> str:
+        start = self._base + self._offsets[index]
+        end = self._base + self._offsets[index + 1]
+        separator = self._buffer.find(SEPARATOR.encode(), start, end)
+        return self._buffer[start:end if separator < 0 else separator].decode("UTF-8")
+
+    def lower_bound(self, key: str) -> int:
+        """Position in key order of the first key >= ``key`` (binary search)."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(self._order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def key_range(self, prefix: str = "") -> Tuple[int, int]:
+        """Positions in key order (start, end) of the keys starting with ``prefix``."""
+        if not prefix:
+            return 0, len(self)
+        return self.lower_bound(prefix), self.lower_bound(prefix + "\U0010ffff")
+
+    def sorted_row(self, position: int) -> tuple:
+        """Row at ``position`` in key order."""
+        return self.row(self._order[position])
+
+    def find(self, key: str) -> List[tuple]:
+        """Rows whose first field is ``key``, in source order."""
+        position = self.lower_bound(key)
+        rows = []
+        while position < len(self) and self._key(self._order[position]) == key:
+            rows.append(self.sorted_row(position))
+            position += 1
+        return rows
+
+
+def _is_current(pack: str, source: str) -> bool:
+    try:
+        header = PackedCatalog(pack).header
+    except (OSError, ValueError):
+        return False
+    return header["byteorder"] == sys.byteorder and header["sha256"] == _digest(source)
+
+
+def load_catalog(name: str) -> PackedCatalog:
+    """Compiled catalog, compiling it first if missing or stale."""
+    source = source_path(name)
+    pack = f"{name}.pack"
+    try:
+        pack = os.path.join(pack_dir(), pack)
+        if not _is_current(pack, source):
+            compile_catalog(name, source, pack)
+        return PackedCatalog(pack)
+    except OSError as e:
+        logger.warning("No se pudo compilar el catálogo %s en %s (%s), se usa en memoria", name, pack, e)
+        return PackedCatalog(data=build_pack(name, source))
+
+
+class _CatalogItems(ItemsView):
+
+    def __iter__(self):
+        for row in self._mapping.pack:
+            yield row[0], self._mapping.value(row)
+
+
+class LazyCatalog(Mapping):
+    """
+    Read-only mapping over a catalog, loaded on first access.
+
+    Values are built from the row on each access (``value(row)``) instead of
+    being kept as Python objects.
+    """
+
+    def __init__(self, name: str, value: Callable[[tuple], object]):
+        """
+        Args:
+            name: Catalog (see CATALOGS)
+            value: Builds the value of a key from its row
+        """
+        self.name = name
+        self.value = value
+        self._pack: Optional[PackedCatalog] = None
+        self._derived: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        _registry.append(self)
+
+    @property
+    def pack(self) -> PackedCatalog:
+        if self._pack is None:
+            with self._lock:
+                if self._pack is None:
+                    self._pack = load_catalog(self.name)
+        return self._pack
+
+    @property
+    def version(self) -> str:
+        """sha256 of the data file the loaded pack was compiled from."""
+        return self.pack.header["sha256"]
+
+    def rows(self, key) -> List[tuple]:
+        """Every row whose key is ``key`` (catalogs with repeated keys)."""
+        return self.pack.find(str(key))
+
+    def __getitem__(self, key):
+        rows = self.rows(key)
+        if not rows:
+            raise KeyError(key)
+        return self.value(rows[0])
+
+    def __contains__(self, key) -> bool:
+        return bool(self.rows(key))
+
+    def __iter__(self):
+        return (row[0] for row in self.pack)
+
+    def __len__(self) -> int:
+        return len(self.pack)
+
+    def items(self):
+        return _CatalogItems(self)
+
+    def derive(self, name: str, build: Callable[["LazyCatalog"], object]):
+        """
+        Structure computed once from this catalog (search index, reverse map).
+
+        It is rebuilt after reload().
+        """
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+    def reload(self):
+        """Forget the loaded pack; the next access loads the current data file."""
+        with self._lock:
+            self._pack = None
+            self._derived = {}
+
+    def __repr__(self):
+        return f"<LazyCatalog {self.name}{'' if self._pack is None else f' ({len(self)})'}>"
+
+
+_registry: List[LazyCatalog] = []
+
+
+def reload_catalogs():
+    """Reload every catalog of this process (after update_catalogs)."""
+    for catalog in _registry:
+        catalog.reload()
+
+
+def read_export(name: str, path: str) -> List[tuple]:
+    """
+    Rows of a DNIT export for a catalog.
+
+    Accepts CSV (``,`` or ``;``, UTF-8 or Latin-1) with a header naming the
+    columns of CATALOGS[name] (case and accents ignored), or JSON: a list of
+    objects with those keys, or ``{codigo: descripcion}`` for two-column
+    catalogs.
+    """
+    columns = CATALOGS[name]
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1")
+
+    if path.lower().endswith(".json"):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            if len(columns) != 2:
+                raise ValueError(f"{name}: se espera una lista de objetos con {', '.join(columns)}")
+            return [(str(k).strip(), str(v).strip()) for k, v in data.items()]
+        records = [{fold(k): v for k, v in item.items()} for item in data]
+    else:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;")
+        reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+        records = [{fold(k or "").strip(): v for k, v in row.items()} for row in reader]
+
+    if records:
+        missing = [c for c in columns if c not in records[0]]
+        if missing:
+            raise ValueError(f"{os.path.basename(path)}: faltan columnas {', '.join(missing)}")
+    return [tuple(str(record[c] or "").strip() for c in columns) for record in records]
+
+
+def update_catalog(name: str, rows: Sequence[Sequence[str]], version: str, source: str = "") -> str:
+    """
+    Replace a catalog with new rows in SIFEN_CATALOG_DIR and compile it.
+
+    Args:
+        name: Catalog (see CATALOGS)
+        rows: Tuples in CATALOGS[name] column order
+        version: Version of the new data (e.g. the DNIT publication date)
+        source: Original file, recorded in the manifest
+
+    Returns:
+        Path of the pack
+    """
+    columns = CATALOGS[name]
+    unique = [columns.index(c) for c in UNIQUE.get(name, columns[:1])]
+    seen = set()
+    for row in rows:
+        if len(row) != len(columns) or not row[0]:
+            raise ValueError(f"{name}: fila inválida {list(row)}")
+        identity = tuple(row[i] for i in unique)
+        if identity in seen:
+            raise ValueError(f"{name}: código repetido {'/'.join(identity)}")
+        seen.add(identity)
+    if not rows:
+        raise ValueError(f"{name}: el archivo no tiene filas")
+
+    directory = catalog_dir()
+    if not directory:
+        raise ValueError("Configure SIFEN_CATALOG_DIR para guardar los catálogos importados")
+    os.makedirs(directory, exist_ok=True)
+    write_rows(os.path.join(directory, f"{name}.csv"), columns, rows)
+
+    manifest = read_manifest(directory)
+    manifest[name] = {
+        "version": version,
+        "rows": len(rows),
+        "source": os.path.basename(source),
+        "updated_at": timezone.now().isoformat(),
+    }
+    tmp = os.path.join(directory, f"{MANIFEST_NAME}.tmp")
+    with open(tmp, "w", encoding="UTF-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, os.path.join(directory, MANIFEST_NAME))
+
+    return compile_catalog(name)
@@ -0,0 +1,77 @@
+"""
+Compression for stored XML documents.
+
+Signed DEs are verbose, repetitive XML and compress 5-10x. Every blob is
+stored next to the name of its codec, so the codec can change (e.g. when
+``zstandard`` gets installed) without rewriting old rows.
+
+Codecs:
+- gzip: standard library, always available (mtime=0, so equal input gives
+  equal output)
+- zstd: requires the ``zstandard`` package; faster and smaller
+
+Settings:
+- SIFEN_XML_COMPRESSION: codec for new documents (default: zstd when
+  available, otherwise gzip)
+"""
+import gzip
+from typing import Tuple
+
+from django.conf import settings
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def default_codec() -> str:
+    """Codec for new documents."""
+    codec = getattr(settings, 'SIFEN_XML_COMPRESSION', '') or ('zstd' if ZSTD_AVAILABLE else 'gzip')
+    if codec == 'zstd' and not ZSTD_AVAILABLE:
+        return 'gzip'
+    return codec
+
+
+def compress(data: bytes, codec: str = None) -> Tuple[str, bytes]:
+    """
+    Compress a document.
+
+    Args:
+        data: Raw bytes
+        codec: "gzip" or "zstd" (default: default_codec())
+
+    Returns:
+        Tuple of (codec, compressed bytes)
+    """
+    codec = codec or default_codec()
+    if codec == 'zstd':
+        return codec, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == 'gzip':
+        return codec, gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Códec de compresión desconocido: {codec}")
+
+
+def decompress(codec: str, data) -> bytes:
+    """
+    Decompress a document stored with compress().
+
+    Args:
+        codec: Codec returned by compress()
+        data: Compressed bytes (bytes or memoryview)
+
+    Returns:
+        Raw bytes
+    """
+    data = bytes(data)
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Se necesita el paquete zstandard para leer este documento")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Códec de compresión desconocido: {codec}")
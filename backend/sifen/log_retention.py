@@ -0,0 +1,290 @@
+"""
+SifenLog partitioning, archiving and retention.
+
+On PostgreSQL the SifenLog table is partitioned by month on created_at
+(migration 0004): ``sifen_sifenlog_2024_01``, ``sifen_sifenlog_2024_02``...
+plus ``sifen_sifenlog_default`` for rows outside every partition. Queries
+filtered by date (admin date_hierarchy, retention) only touch the months
+they need, and expiring a month is a DROP TABLE instead of a huge DELETE.
+
+On other databases the table is a plain table with the same indexes and
+expired months are deleted in batches.
+
+Retention archives each expired month to ``sifen_log_YYYY_MM.jsonl.gz``
+(with the full request/response XML of SifenPayload) before removing it,
+then deletes the payloads no log references anymore. Archiving a month
+again (late rows) never overwrites: the new rows go to
+``sifen_log_YYYY_MM_2.jsonl.gz``, ``_3``...
+
+Settings:
+- SIFEN_LOG_RETENTION_MONTHS: full months kept in the database
+- SIFEN_LOG_ARCHIVE_DIR: where archives are written (empty: no automatic
+  retention)
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .compression import decompress
+from .models import SifenLog, SifenPayload
+
+TABLE = SifenLog._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+# Partitions created ahead of time
+MONTHS_AHEAD = 3
+
+# Rows per DELETE on databases without partitions
+DELETE_BATCH_SIZE = 5000
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month of ``value`` (local time zone)."""
+    value = timezone.localtime(value)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Start of the month ``count`` months after ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    naive = datetime(index // 12, index % 12 + 1, 1)
+    return timezone.make_aware(naive, timezone.get_current_timezone())
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def _bound(value: datetime) -> str:
+    """Partition bound literal (DDL does not take query parameters)."""
+    return f"'{value.isoformat()}'"
+
+
+def is_partitioned() -> bool:
+    """Whether SifenLog is a partitioned table (PostgreSQL only)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions() -> List[str]:
+    """Names of the partitions of SifenLog (empty if not partitioned)."""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid) ORDER BY c.relname",
+            [TABLE],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(month: datetime) -> bool:
+    """
+    Create the partition of one month.
+
+    Rows of that month already in the default partition are moved into it.
+
+    Returns:
+        True if it was created, False if it already existed
+    """
+    name = partition_name(month)
+    if name in list_partitions():
+        return False
+
+    start, end = month, add_months(month, 1)
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+            f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM ({_bound(start)}) TO ({_bound(end)})"
+        )
+    return True
+
+
+def ensure_partitions(months_ahead: int = MONTHS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+    """
+    Create the partitions of the current and next months.
+
+    Returns:
+        Names of the partitions created (nothing when not partitioned)
+    """
+    if not is_partitioned():
+        return []
+    current = month_start(now or timezone.now())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(month):
+            created.append(partition_name(month))
+    return created
+
+
+def expired_months(keep_months: int, now: Optional[datetime] = None) -> List[datetime]:
+    """
+    Months with rows older than the retention period, oldest first.
+
+    The current month plus ``keep_months`` full months are kept.
+    """
+    cutoff = add_months(month_start(now or timezone.now()), -keep_months)
+    oldest = (
+        SifenLog.objects
+        .filter(created_at__lt=cutoff)
+        .order_by("created_at")
+        .values_list("created_at", flat=True)
+        .first()
+    )
+    months = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(month: datetime, directory: str) -> tuple:
+    """
+    Write every log of one month to a gzip-compressed JSONL file.
+
+    Returns:
+        Tuple of (path, rows written); path is None for an empty month
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".sifen_log_{month:%Y_%m}.{os.getpid()}.tmp")
+
+    payload_fields = [
+        f"{side}_payload__{field}" for side in ("request", "response") for field in ("codec", "data")
+    ]
+    rows = (
+        SifenLog.objects
+        .filter(created_at__gte=month, created_at__lt=add_months(month, 1))
+        .order_by("created_at", "id")
+        .values(*[f.attname for f in SifenLog._meta.concrete_fields], *payload_fields)
+    )
+    count = 0
+    with gzip.open(tmp, "wt", encoding="UTF-8") as f:
+        for row in rows.iterator(chunk_size=2000):
+            for side in ("request", "response"):
+                codec = row.pop(f"{side}_payload__codec")
+                data = row.pop(f"{side}_payload__data")
+                row[f"{side}_full"] = decompress(codec, data).decode("UTF-8") if codec else None
+            f.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    if not count:
+        os.remove(tmp)
+        return None, 0
+    path = _reserve_archive_path(directory, month)
+    os.replace(tmp, path)
+    return path, count
+
+
+def _reserve_archive_path(directory: str, month: datetime) -> str:
+    """Create (empty) the first archive name of a month not taken yet."""
+    suffix = ""
+    number = 1
+    while True:
+        path = os.path.join(directory, f"sifen_log_{month:%Y_%m}{suffix}.jsonl.gz")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return path
+        except FileExistsError:
+            number += 1
+            suffix = f"_{number}"
+
+
+def drop_month(month: datetime) -> None:
+    """Remove every log of one month (DROP of its partition when partitioned)."""
+    start, end = month, add_months(month, 1)
+    queryset = SifenLog.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    if is_partitioned():
+        name = partition_name(month)
+        if name in list_partitions():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+        # Leftovers in the default partition
+        queryset.delete()
+        return
+
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            break
+        SifenLog.objects.filter(pk__in=ids).delete()
+
+
+def purge_payloads(before: datetime) -> int:
+    """
+    Delete payloads created before ``before`` that no log references.
+
+    Newer payloads are kept: a buffered log may not be written yet.
+    """
+    deleted, _ = SifenPayload.objects.filter(
+        created_at__lt=before,
+        request_logs__isnull=True,
+        response_logs__isnull=True,
+    ).delete()
+    return deleted
+
+
+def apply_retention(
+    keep_months: Optional[int] = None,
+    directory: Optional[str] = None,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> List[dict]:
+    """
+    Archive and remove the months older than the retention period.
+
+    Args:
+        keep_months: Full months kept (default SIFEN_LOG_RETENTION_MONTHS)
+        directory: Archive directory (default SIFEN_LOG_ARCHIVE_DIR)
+        now: Reference time (default now)
+        dry_run: Only report the months that would be archived
+
+    Returns:
+        One dict per month with month, path and rows
+    """
+    keep_months = settings.SIFEN_LOG_RETENTION_MONTHS if keep_months is None else keep_months
+    directory = directory or settings.SIFEN_LOG_ARCHIVE_DIR
+    if not directory and not dry_run:
+        raise ValueError("Falta el directorio de archivo (SIFEN_LOG_ARCHIVE_DIR)")
+
+    months = expired_months(keep_months, now)
+    results = []
+    for month in months:
+        if dry_run:
+            rows = SifenLog.objects.filter(created_at__gte=month, created_at__lt=add_months(month, 1)).count()
+            results.append({"month": f"{month:%Y-%m}", "path": None, "rows": rows})
+            continue
+        path, rows = archive_month(month, directory)
+        drop_month(month)
+        results.append({"month": f"{month:%Y-%m}", "path": path, "rows": rows})
+
+    if months and not dry_run:
+        purge_payloads(before=add_months(months[-1], 1))
+    return results
@@ -0,0 +1,289 @@
+"""
+Buffered SifenLog writer.
+
+Writing a SifenLog row used to be an INSERT on the critical path of every
+SIFEN call. Records are now appended to an in-memory queue and written
+with bulk_create by a background thread, once SIFEN_LOG_BUFFER_SIZE
+records are waiting or every SIFEN_LOG_FLUSH_INTERVAL seconds.
+
+With SIFEN_LOG_CAPTURE="full" the complete request/response XML passed as
+``request_full`` / ``response_full`` is also stored, compressed and
+deduplicated by sha256, in SifenPayload. Hashing and compression happen at
+flush time, off the request path.
+
+The buffer is per process: locks and queue are recreated and the thread
+restarted after a fork, and the queue is flushed at interpreter exit and on
+Celery worker shutdown. Writes fall back to a synchronous INSERT when SIFEN_LOG_MODE is "sync" (tests,
+debugging) or the queue is full (SIFEN_LOG_MAX_PENDING). When a bulk write
+fails its records are written one at a time, and the ones that still fail
+are logged and dropped, so one bad record never blocks the queue.
+
+Usage:
+    log_sifen_call(action="send", cdc=cdc, response_code="0260", ...)
+"""
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import SifenLog, SifenPayload
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedLogSink:
+    """Queues SifenLog records and writes them in bulk."""
+
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        background: bool = True,
+    ):
+        """
+        Args:
+            buffer_size: Records that trigger a flush (default SIFEN_LOG_BUFFER_SIZE)
+            flush_interval: Seconds between flushes (default SIFEN_LOG_FLUSH_INTERVAL)
+            max_pending: Queue size before writing synchronously (default SIFEN_LOG_MAX_PENDING)
+            background: Start a flush thread (False: only explicit flush())
+        """
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self.background = background
+        self._after_fork()
+        if hasattr(os, "register_at_fork"):
+            # A lock held by the parent's flush thread at fork time would
+            # never be released in the child
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()._after_fork())
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"queued": 0, "written": 0, "sync_writes": 0, "flushes": 0, "errors": 0, "dropped": 0}
+
+    @property
+    def buffer_size(self) -> int:
+        return max(1, self._buffer_size or settings.SIFEN_LOG_BUFFER_SIZE)
+
+    @property
+    def flush_interval(self) -> float:
+        return self._flush_interval or settings.SIFEN_LOG_FLUSH_INTERVAL
+
+    @property
+    def max_pending(self) -> int:
+        return self._max_pending or settings.SIFEN_LOG_MAX_PENDING
+
+    def emit(self, **fields):
+        """
+        Queue one log record (SifenLog field values).
+
+        Writes it synchronously instead when buffering is disabled or the
+        queue is full.
+        """
+        record = self.make_record(**fields)
+        if not self.enqueue(record):
+            self.write(record)
+
+    def make_record(self, **fields) -> SifenLog:
+        """
+        Unsaved SifenLog stamped with the time of the call.
+
+        ``request_full`` / ``response_full`` are kept on the record and stored
+        as SifenPayload when it is written (SIFEN_LOG_CAPTURE="full").
+        """
+        payloads = (fields.pop("request_full", ""), fields.pop("response_full", ""))
+        fields.setdefault("created_at", timezone.now())
+        record = SifenLog(**fields)
+        if settings.SIFEN_LOG_CAPTURE == "full" and any(payloads):
+            record._payloads = payloads
+        return record
+
+    def enqueue(self, record: SifenLog) -> bool:
+        """
+        Queue a record for the flush thread.
+
+        Returns:
+            False if it must be written synchronously (sync mode, queue full)
+        """
+        if settings.SIFEN_LOG_MODE == "sync":
+            return False
+
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked: the parent flushes its own queue
+                self._reset()
+            if len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(record)
+            self._stats["queued"] += 1
+            pending = len(self._pending)
+            self._ensure_thread()
+
+        if pending >= self.buffer_size:
+            self._wakeup.set()
+        return True
+
+    def write(self, record: SifenLog):
+        """Synchronous fallback: INSERT one record now."""
+        store_payloads([record])
+        record.save()
+        with self._lock:
+            self._stats["sync_writes"] += 1
+
+    def _ensure_thread(self):
+        """Start the flush thread (caller holds self._lock)."""
+        if not self.background or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="sifen-log-sink", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                close_old_connections()
+                self.flush()
+        finally:
+            connection.close()
+
+    def _take(self, limit: int) -> List[SifenLog]:
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(limit, len(self._pending)))]
+
+    def flush(self) -> int:
+        """
+        Write every queued record.
+
+        Returns:
+            Number of records written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                records = self._take(self.buffer_size)
+                if not records:
+                    break
+                try:
+                    # A payload left without its log is removed by retention
+                    store_payloads(records)
+                    SifenLog.objects.bulk_create(records)
+                except Exception:
+                    logger.exception("No se pudieron guardar %d logs SIFEN en bloque", len(records))
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    written += self._write_each(records)
+                    continue
+                written += len(records)
+
+        if written:
+            with self._lock:
+                self._stats["written"] += written
+                self._stats["flushes"] += 1
+        return written
+
+    def _write_each(self, records: List[SifenLog]) -> int:
+        """Write records one at a time, dropping the ones that fail."""
+        written = 0
+        for record in records:
+            record.pk = None
+            try:
+                store_payloads([record])
+                record.save(force_insert=True)
+                written += 1
+            except Exception:
+                logger.exception(
+                    "Log SIFEN descartado (action=%s, cdc=%s)", record.action, record.cdc
+                )
+                with self._lock:
+                    self._stats["dropped"] += 1
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue counters of this process."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending) if self._pid == os.getpid() else 0
+        stats["mode"] = settings.SIFEN_LOG_MODE
+        stats["thread_alive"] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+def store_payloads(records: List[SifenLog]):
+    """
+    Save the full XML of the records as SifenPayload and link them.
+
+    Payloads already stored (same sha256) are neither compressed nor
+    inserted again.
+    """
+    texts = {}
+    for record in records:
+        payloads = getattr(record, "_payloads", None)
+        if not payloads:
+            continue
+        for field, text in zip(("request_payload_id", "response_payload_id"), payloads):
+            if text:
+                digest = hashlib.sha256(text.encode("UTF-8")).hexdigest()
+                texts.setdefault(digest, text)
+                setattr(record, field, digest)
+    if not texts:
+        return
+
+    stored = set(SifenPayload.objects.filter(pk__in=list(texts)).values_list("pk", flat=True))
+    SifenPayload.objects.bulk_create(
+        [SifenPayload.build(text) for digest, text in texts.items() if digest not in stored],
+        ignore_conflicts=True,
+    )
+
+
+sink = BufferedLogSink()
+
+
+def log_sifen_call(**fields):
+    """Record a SIFEN call (see BufferedLogSink.emit)."""
+    sink.emit(**fields)
+
+
+async def alog_sifen_call(**fields):
+    """log_sifen_call for coroutines (the synchronous fallback runs in a thread)."""
+    record = sink.make_record(**fields)
+    if not sink.enqueue(record):
+        await sync_to_async(sink.write)(record)
+
+
+def flush_sifen_logs(**kwargs) -> int:
+    """Flush this process's queue (shutdown hook; accepts signal kwargs)."""
+    if sink._pid != os.getpid():
+        return 0
+    try:
+        return sink.flush()
+    except Exception:
+        logger.exception("No se pudieron guardar los logs SIFEN pendientes")
+        return 0
+
+
+def log_sink_stats() -> Dict[str, Any]:
+    """Counters of the log buffer (see BufferedLogSink.stats)."""
+    return sink.stats()
+
+
+atexit.register(flush_sifen_logs)
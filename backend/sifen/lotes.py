@@ -0,0 +1,388 @@
+"""
+Lote (batch) pipeline for SIFEN.
+
+Invoices queued for lote sending (status "queued", see the queue action)
+are grouped per company into lotes of up to MAX_DES_POR_LOTE documents,
+submitted through recibe-lote and then polled through consulta-lote with
+exponential backoff. Once SIFEN finishes processing a lote, the per-DE
+results are fanned back onto each Invoice.
+
+Invoices are claimed for a lote (conditional UPDATE of their lote) before
+the SOAP call, so concurrent runs never send the same DE twice.
+
+Codes (Manual Técnico v150):
+- 0300: Lote recibido con éxito
+- 0361: Lote en procesamiento
+- 0362: Procesamiento de lote concluido
+- 0364: Consulta extemporánea (más de 48h), consultar por CDC
+
+A lote SIFEN refuses (any other code) rejects its DEs with that code. When
+the submission outcome is unknown (transport failure) or a lote cannot be
+resolved (0364, unknown lote, or no result after SIFEN_LOTE_MAX_POLLS) each
+of its DEs is queried by CDC: the ones SIFEN has are approved, the ones it
+reports as inexistent go back to the queue (without lote, after a backoff,
+at most SIFEN_LOTE_MAX_SUBMITS times), and the rest stay in the lote until
+a later query answers.
+"""
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SifenLote
+
+# Maximum DEs per lote accepted by SIFEN
+MAX_DES_POR_LOTE = 50
+
+LOTE_RECIBIDO = "0300"
+LOTE_EN_PROCESAMIENTO = "0361"
+LOTE_CONCLUIDO = "0362"
+LOTE_EXTEMPORANEO = "0364"
+
+# consulta DE: the CDC exists (SIFEN only keeps approved DEs)
+CDC_ENCONTRADO = "0422"
+# consulta DE: SIFEN does not have the CDC (never received, or rejected)
+CDC_INEXISTENTE = "0420"
+
+# Transport failures: SIFEN may or may not have received the request
+RETRYABLE_CODES = ["TIMEOUT", "ERROR", "PARSE_ERROR", "UNKNOWN"]
+
+
+def _transport_failure(code: str) -> bool:
+    return code in RETRYABLE_CODES or code.startswith("HTTP_5")
+
+
+class LoteService:
+    """Builds, submits and polls SIFEN lotes."""
+
+    def __init__(self, client=None, mock_mode: bool = None):
+        """
+        Initialize lote service.
+
+        Args:
+            client: SOAP client (default: get_soap_client())
+            mock_mode: Override mock mode (default: based on SIFEN_ENVIRONMENT)
+        """
+        if mock_mode is None:
+            mock_mode = settings.SIFEN_ENVIRONMENT == "test"
+
+        self.mock_mode = mock_mode
+        if client is None and not mock_mode:
+            from .soap_client import get_soap_client
+            client = get_soap_client()
+        self.client = client
+
+    def pending_invoices(self, company, now=None):
+        """Signed invoices of a company queued for sending in a lote."""
+        from invoicing.models import Invoice  # Avoid circular import
+
+        now = now or timezone.now()
+        return (
+            Invoice.objects
+            .filter(company=company, status="queued", lote__isnull=True)
+            .filter(Q(lote_retry_at__isnull=True) | Q(lote_retry_at__lte=now))
+            .with_signed_xml()
+            .select_related("document")
+            .order_by("id")
+        )
+
+    def submit_pending(self, company=None, now=None) -> List[SifenLote]:
+        """
+        Pack all queued invoices into lotes and submit them.
+
+        Args:
+            company: Restrict to one company (default: all companies)
+            now: Current time (invoices waiting for a retry are skipped)
+
+        Returns:
+            List of created SifenLote
+        """
+        from companies.models import Company
+
+        companies = [company] if company else Company.objects.filter(
+            invoices__status="queued",
+            invoices__lote__isnull=True,
+        ).distinct()
+
+        lotes = []
+        for company in companies:
+            invoices = list(self.pending_invoices(company, now=now))
+            for start in range(0, len(invoices), MAX_DES_POR_LOTE):
+                chunk = invoices[start:start + MAX_DES_POR_LOTE]
+                lote = self.submit(company, chunk)
+                if lote is not None:
+                    lotes.append(lote)
+        return lotes
+
+    def submit(self, company, invoices: list) -> Optional[SifenLote]:
+        """
+        Submit one lote.
+
+        Args:
+            company: Emisor of every invoice in the lote
+            invoices: Up to MAX_DES_POR_LOTE signed, queued invoices
+
+        Returns:
+            SifenLote (status "sent", or "failed" if SIFEN refused it), or
+            None if another run already claimed every invoice
+        """
+        if len(invoices) > MAX_DES_POR_LOTE:
+            raise ValueError(f"Un lote admite como máximo {MAX_DES_POR_LOTE} DEs")
+
+        lote, invoices = self._claim(company, invoices)
+        if lote is None:
+            return None
+
+        if self.mock_mode:
+            return self._complete_mock(lote, invoices)
+
+        response = self.client.send_batch(
+            [invoice.xml_signed for invoice in invoices],
+            id_lote=str(lote.pk),
+        )
+        code = response.response_code
+        lote.response_code = code
+        lote.response_message = response.response_message
+        protocolo = (response.data or {}).get("lote_protocol", "")
+
+        with transaction.atomic():
+            if code == LOTE_RECIBIDO and protocolo:
+                lote.protocolo = protocolo
+                lote.status = "sent"
+                lote.next_poll_at = timezone.now() + timedelta(
+                    seconds=settings.SIFEN_LOTE_POLL_INITIAL
+                )
+                lote.invoices.update(status="sent", sifen_batch_id=protocolo)
+            elif code == LOTE_RECIBIDO or _transport_failure(code):
+                # SIFEN may have the lote: its DEs are resolved by CDC (see
+                # poll) once it had time to process it, before any is resent
+                lote.status = "sent"
+                lote.next_poll_at = timezone.now() + timedelta(
+                    seconds=settings.SIFEN_LOTE_POLL_MAX
+                )
+                lote.invoices.update(status="sent")
+            else:
+                # Refused: sending the same DEs again would be refused too
+                lote.status = "failed"
+                lote.invoices.update(
+                    status="rejected",
+                    sifen_response_code=code,
+                    sifen_response_message=response.response_message,
+                )
+            lote.save()
+
+        return lote
+
+    @transaction.atomic
+    def _claim(self, company, invoices: list):
+        """
+        Create a lote and take the invoices still queued for it.
+
+        The conditional UPDATE only matches invoices without lote, so when
+        two runs race for the same invoice exactly one of them sends it.
+
+        Returns:
+            (SifenLote, claimed invoices), or (None, []) if none was left
+        """
+        from invoicing.models import Invoice
+
+        lote = SifenLote.objects.create(company=company, document_count=len(invoices))
+        Invoice.objects.filter(
+            pk__in=[invoice.pk for invoice in invoices],
+            status="queued",
+            lote__isnull=True,
+        ).update(lote=lote)
+
+        claimed = list(lote.invoices.select_related("document").order_by("id"))
+        if not claimed:
+            lote.delete()
+            return None, []
+        if len(claimed) != lote.document_count:
+            lote.document_count = len(claimed)
+            lote.save(update_fields=["document_count"])
+        return lote, claimed
+
+    def poll_due(self, now=None) -> List[SifenLote]:
+        """
+        Poll every lote whose next_poll_at has passed.
+
+        Returns:
+            List of polled SifenLote
+        """
+        now = now or timezone.now()
+        due = SifenLote.objects.filter(status="sent", next_poll_at__lte=now).order_by("next_poll_at")
+        return [self.poll(lote, now=now) for lote in due]
+
+    def poll(self, lote: SifenLote, now=None) -> SifenLote:
+        """
+        Query SIFEN for a lote's result and apply it.
+
+        Returns:
+            Updated SifenLote
+        """
+        now = now or timezone.now()
+        lote.poll_attempts += 1
+        if not lote.protocolo:
+            # Submission outcome unknown: there is no lote to query
+            return self._resolve_by_cdc(lote, now)
+
+        response = self.client.query_lote(lote.protocolo)
+        code = response.response_code
+        lote.response_code = code
+        lote.response_message = response.response_message
+
+        if code == LOTE_CONCLUIDO:
+            self._apply_results(lote, (response.data or {}).get("lote_results", []))
+            lote.status = "completed"
+            lote.next_poll_at = None
+        elif (
+            (code == LOTE_EN_PROCESAMIENTO or code in RETRYABLE_CODES or code.startswith("HTTP_"))
+            and lote.poll_attempts < settings.SIFEN_LOTE_MAX_POLLS
+        ):
+            lote.next_poll_at = now + self._backoff(lote.poll_attempts)
+        else:
+            # 0364, lote unknown or too many polls: results are queried per CDC
+            return self._resolve_by_cdc(lote, now)
+
+        lote.save()
+        return lote
+
+    def _resolve_by_cdc(self, lote: SifenLote, now) -> SifenLote:
+        """
+        Query each DE of a lote by CDC and apply the answers.
+
+        The lote fails once every DE is resolved; DEs SIFEN did not answer
+        for keep it "sent", queried again after a backoff.
+        """
+        responses = self._query_cdcs(lote)
+        with transaction.atomic():
+            self._release_invoices(lote, responses, now)
+            if lote.invoices.filter(status="sent").exists():
+                lote.next_poll_at = now + self._backoff(lote.poll_attempts)
+            else:
+                lote.status = "failed"
+                lote.next_poll_at = None
+            lote.save()
+        return lote
+
+    def _query_cdcs(self, lote: SifenLote) -> dict:
+        """Query each unresolved DE of a lote by CDC; returns cdc -> SifenResponse."""
+        return {
+            cdc: self.client.query_cdc(cdc)
+            for cdc in lote.invoices.filter(status="sent").values_list("cdc", flat=True)
+        }
+
+    def _release_invoices(self, lote: SifenLote, responses: dict, now):
+        """
+        Approve the DEs SIFEN has and return the inexistent ones to the queue.
+
+        DEs whose query failed (transport error, unexpected code) stay in
+        the lote. A DE returned SIFEN_LOTE_MAX_SUBMITS times is rejected.
+        """
+        from invoicing.models import Invoice
+
+        approved, missing = [], []
+        for invoice in lote.invoices.filter(cdc__in=list(responses)):
+            response = responses[invoice.cdc]
+            if response.response_code == CDC_ENCONTRADO:
+                invoice.status = "approved"
+                invoice.sifen_response_code = response.response_code
+                invoice.sifen_response_message = response.response_message
+                approved.append(invoice)
+            elif response.response_code == CDC_INEXISTENTE:
+                missing.append(invoice)
+        Invoice.objects.bulk_update(
+            approved,
+            ["status", "sifen_response_code", "sifen_response_message"],
+        )
+
+        for invoice in missing:
+            invoice.lote_attempts += 1
+            if invoice.lote_attempts >= settings.SIFEN_LOTE_MAX_SUBMITS:
+                invoice.status = "rejected"
+                invoice.sifen_response_code = CDC_INEXISTENTE
+                invoice.sifen_response_message = (
+                    f"SIFEN no recibió el DE tras {invoice.lote_attempts} envíos por lote"
+                )
+            else:
+                invoice.status = "queued"
+                invoice.lote = None
+                invoice.sifen_batch_id = ""
+                invoice.lote_retry_at = now + self._backoff(invoice.lote_attempts)
+        Invoice.objects.bulk_update(
+            missing,
+            [
+                "status", "lote", "sifen_batch_id", "lote_attempts", "lote_retry_at",
+                "sifen_response_code", "sifen_response_message",
+            ],
+        )
+
+    def _backoff(self, attempts: int) -> timedelta:
+        """Exponential backoff between polls, capped at SIFEN_LOTE_POLL_MAX."""
+        seconds = settings.SIFEN_LOTE_POLL_INITIAL * (2 ** attempts)
+        return timedelta(seconds=min(seconds, settings.SIFEN_LOTE_POLL_MAX))
+
+    @transaction.atomic
+    def _apply_results(self, lote: SifenLote, results: list):
+        """Copy per-DE lote results onto each invoice."""
+        from invoicing.models import Invoice
+
+        by_cdc = {r["cdc"]: r for r in results}
+        invoices = list(lote.invoices.all())
+
+        for invoice in invoices:
+            result = by_cdc.get(invoice.cdc)
+            if result is None:
+                invoice.status = "rejected"
+                invoice.sifen_response_code = lote.response_code
+                invoice.sifen_response_message = "DE no incluido en el resultado del lote"
+                continue
+
+            approved = result["status"].lower().startswith("aprobado")
+            invoice.status = "approved" if approved else "rejected"
+            invoice.sifen_response_code = result["response_code"]
+            invoice.sifen_response_message = result["response_message"] or result["status"]
+
+        Invoice.objects.bulk_update(
+            invoices,
+            ["status", "sifen_response_code", "sifen_response_message"],
+        )
+
+    @transaction.atomic
+    def _complete_mock(self, lote: SifenLote, invoices: list) -> SifenLote:
+        """Approve every invoice immediately (test environment)."""
+        from invoicing.models import Invoice
+
+        lote.protocolo = f"MOCK-{lote.pk}"
+        lote.status = "completed"
+        lote.response_code = LOTE_CONCLUIDO
+        lote.response_message = "Procesamiento de lote concluido (MOCK)"
+        lote.save()
+
+        Invoice.objects.filter(pk__in=[i.pk for i in invoices]).update(
+            status="approved",
+            lote=lote,
+            sifen_batch_id=lote.protocolo,
+            sifen_response_code="0260",
+            sifen_response_message="Autorización del DE satisfactoria (MOCK)",
+        )
+        return lote
+
+
+def process_lotes(company=None, client=None) -> dict:
+    """
+    Submit queued invoices and poll due lotes.
+
+    Returns:
+        Dict with submitted and polled lote counts
+    """
+    service = LoteService(client=client)
+    submitted = service.submit_pending(company)
+    polled = [] if service.mock_mode else service.poll_due()
+    return {
+        "submitted": len(submitted),
+        "polled": len(polled),
+    }
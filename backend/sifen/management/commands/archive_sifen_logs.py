@@ -0,0 +1,35 @@
+"""Archive SifenLog months older than the retention period and drop them."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sifen.log_retention import apply_retention, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Archiva en JSONL comprimido los logs SIFEN antiguos y los elimina de la base"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=None,
+                            help='Meses completos a conservar (default: SIFEN_LOG_RETENTION_MONTHS)')
+        parser.add_argument('--output-dir', help='Directorio de archivos (default: SIFEN_LOG_ARCHIVE_DIR)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar qué meses se archivarían')
+
+    def handle(self, *args, **options):
+        for name in ensure_partitions():
+            self.stdout.write(f"Partición creada: {name}")
+
+        try:
+            results = apply_retention(
+                keep_months=options['keep_months'],
+                directory=options['output_dir'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            target = result['path'] or ('(simulación)' if options['dry_run'] else '(vacío)')
+            self.stdout.write(f"{result['month']}: {result['rows']} logs -> {target}")
+        keep = settings.SIFEN_LOG_RETENTION_MONTHS if options['keep_months'] is None else options['keep_months']
+        done = "por archivar" if options['dry_run'] else "archivados"
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} meses {done} (se conservan {keep} meses)"))
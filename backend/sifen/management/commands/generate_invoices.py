@@ -0,0 +1,51 @@
+"""Generate CDC/XML and sign draft invoices in bulk (parallel signing)."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from invoicing.models import Invoice
+from sifen.services import SifenService
+
+
+class Command(BaseCommand):
+    help = "Genera y firma en paralelo las facturas en borrador"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='ID de empresa (default: todas)')
+        parser.add_argument('--workers', type=int, help='Procesos de firma (default: SIFEN_SIGN_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Facturas por tanda')
+
+    def handle(self, *args, **options):
+        queryset = (
+            Invoice.objects
+            .filter(status='draft')
+            .select_related('company', 'establishment')
+            .prefetch_related('items')
+            .order_by('id')
+        )
+        if options['company']:
+            queryset = queryset.filter(company_id=options['company'])
+
+        service = SifenService()
+        batch_size = options['batch_size']
+        ok = failed = 0
+        start = time.time()
+
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for result in service.generate_invoices(batch, max_workers=options['workers']):
+                if result['success']:
+                    ok += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"Factura {result['invoice_id']}: {result['error']}")
+
+        elapsed = max(time.time() - start, 1e-6)
+        self.stdout.write(
+            f"Firmadas: {ok}, fallidas: {failed} ({ok / elapsed:.1f} DE/s)"
+        )
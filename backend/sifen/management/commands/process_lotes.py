@@ -0,0 +1,30 @@
+"""Submit pending invoices in lotes and poll SIFEN for lote results."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from sifen.lotes import process_lotes
+
+
+class Command(BaseCommand):
+    help = "Envía facturas pendientes en lotes y consulta el resultado de lotes enviados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='ID de empresa (default: todas)')
+        parser.add_argument('--loop', action='store_true', help='Ejecutar continuamente')
+        parser.add_argument('--interval', type=int, default=10, help='Segundos entre ciclos con --loop')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company']:
+            from companies.models import Company
+            company = Company.objects.get(pk=options['company'])
+
+        while True:
+            result = process_lotes(company=company)
+            self.stdout.write(
+                f"Lotes enviados: {result['submitted']}, consultados: {result['polled']}"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
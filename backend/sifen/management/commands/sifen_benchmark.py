@@ -0,0 +1,52 @@
+"""Benchmark the generate → sign → send pipeline and compare against a baseline."""
+from django.core.management.base import BaseCommand, CommandError
+
+from sifen.benchmarks import BenchmarkSuite, save_results, load_results, compare
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento de CDC, XML, firma, parseo SOAP y envío (stub local)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Guardar resultados en este archivo JSON')
+        parser.add_argument('--compare', help='Comparar contra resultados JSON anteriores')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Lentitud tolerada al comparar (default: 0.10 = 10%%)')
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplicador de iteraciones (ej: 0.1 para una corrida rápida)')
+        parser.add_argument('--only', help='Solo benchmarks cuyo nombre empieza con este prefijo')
+        parser.add_argument('--skip-e2e', action='store_true',
+                            help='Omitir los benchmarks que usan la base de datos')
+
+    def handle(self, *args, **options):
+        suite = BenchmarkSuite(
+            scale=options['scale'],
+            only=options['only'],
+            e2e=not options['skip_e2e'],
+        )
+        results = suite.run()
+
+        self.stdout.write(f"{'benchmark':<28} {'iter':>6} {'mean ms':>10} {'p95 ms':>10} {'ops/s':>10}")
+        for r in results:
+            self.stdout.write(
+                f"{r.name:<28} {r.iterations:>6} {r.mean_ms:>10.3f} {r.p95_ms:>10.3f} {r.ops_per_s:>10.1f}"
+            )
+
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(f"Resultados guardados en {options['output']}")
+
+        if options['compare']:
+            rows = compare(results, load_results(options['compare']), options['threshold'])
+            regressions = [row for row in rows if row['regression']]
+            for row in rows:
+                mark = " REGRESIÓN" if row['regression'] else ""
+                self.stdout.write(
+                    f"{row['name']:<28} {row['baseline_ms']:>10.3f} -> {row['current_ms']:>10.3f} "
+                    f"({row['change']:+.1%}){mark}"
+                )
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} benchmark(s) más lentos que la línea base: "
+                    + ", ".join(row['name'] for row in regressions)
+                )
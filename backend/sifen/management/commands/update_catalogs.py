@@ -0,0 +1,50 @@
+"""Import DNIT catalog exports into SIFEN_CATALOG_DIR and compile them."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sifen.catalogs.store import (
+    CATALOGS, catalog_version, compile_catalog, load_catalog, pack_dir,
+    read_export, reload_catalogs, source_path, update_catalog,
+)
+
+
+class Command(BaseCommand):
+    help = "Actualiza los catálogos DNIT (actividades, unidades, departamentos, distritos, ciudades) desde exportaciones CSV/JSON"
+
+    def add_arguments(self, parser):
+        for name in CATALOGS:
+            parser.add_argument(f'--{name}', metavar='ARCHIVO', help=f'Exportación DNIT de {name} (CSV o JSON)')
+        parser.add_argument('--data-version',
+                            help='Versión de los datos importados (default: fecha de hoy)')
+
+    def handle(self, *args, **options):
+        version = options['data_version'] or timezone.localdate().isoformat()
+        imports = {name: options[name] for name in CATALOGS if options[name]}
+        if imports and not settings.SIFEN_CATALOG_DIR:
+            raise CommandError("Configure SIFEN_CATALOG_DIR para guardar los catálogos importados")
+
+        for name, path in imports.items():
+            try:
+                rows = read_export(name, path)
+                update_catalog(name, rows, version, source=path)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"{name}: {e}")
+            self.stdout.write(f"{name}: {len(rows)} filas importadas (versión {version})")
+
+        for name in CATALOGS:
+            if name not in imports:
+                try:
+                    compile_catalog(name)
+                except (OSError, ValueError) as e:
+                    raise CommandError(f"{name}: {e}")
+        reload_catalogs()
+
+        for name in CATALOGS:
+            pack = load_catalog(name)
+            self.stdout.write(
+                f"{name}: {len(pack)} filas, versión {catalog_version(name) or '-'} ({source_path(name)})"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Catálogos compilados en {pack_dir()}; reinicie los workers para usar los datos nuevos"
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-17 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('sifen', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SifenLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('protocolo', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente de envío'), ('sent', 'Enviado, en procesamiento'), ('completed', 'Procesado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+                ('response_code', models.CharField(blank=True, max_length=10)),
+                ('response_message', models.TextField(blank=True)),
+                ('poll_attempts', models.PositiveIntegerField(default=0)),
+                ('next_poll_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lotes', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Lote SIFEN',
+                'verbose_name_plural': 'Lotes SIFEN',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sifen', '0002_sifenlote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sifenlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
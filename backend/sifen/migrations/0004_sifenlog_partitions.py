@@ -0,0 +1,89 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:13
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLE = 'sifen_sifenlog'
+OLD_TABLE = 'sifen_sifenlog_unpartitioned'
+MONTHS_AHEAD = 3
+
+
+def _month(index):
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1), timezone.get_current_timezone())
+
+
+def partition_sifenlog(apps, schema_editor):
+    """
+    Turn sifen_sifenlog into a table partitioned by month (PostgreSQL only).
+
+    Partitioned tables cannot have identity columns (before PostgreSQL 17)
+    or a primary key without the partition key, so id gets a plain
+    sequence and the primary key becomes (id, created_at).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s",
+            [TABLE, '%pkey'],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'SELECT MIN(created_at), MAX(created_at) FROM {TABLE}')
+        oldest, newest = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        now = timezone.localtime()
+        first = timezone.localtime(oldest) if oldest else now
+        last = max(timezone.localtime(newest), now) if newest else now
+        start = first.year * 12 + first.month - 1
+        end = last.year * 12 + last.month - 1 + MONTHS_AHEAD
+        for index in range(start, end + 1):
+            month, next_month = _month(index), _month(index + 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_{month:%Y_%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+            )
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+
+        # The cdc indexes, now on the partitioned table
+        for index_def in index_defs:
+            cursor.execute(index_def)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sifen', '0003_sifenlog_created_at'),
+    ]
+
+    operations = [
+        # Not reversible into a plain table; going back leaves it partitioned
+        migrations.RunPython(partition_sifenlog, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sifenlog',
+            index=models.Index(fields=['created_at'], name='sifen_sifen_created_a59b23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sifenlog',
+            index=models.Index(fields=['action', 'created_at'], name='sifen_sifen_action_6cf901_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sifenlog',
+            index=models.Index(fields=['response_code', 'created_at'], name='sifen_sifen_respons_f3543b_idx'),
+        ),
+    ]
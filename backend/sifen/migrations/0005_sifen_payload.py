@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sifen', '0004_sifenlog_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SifenPayload',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('codec', models.CharField(max_length=10)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Contenido SIFEN',
+                'verbose_name_plural': 'Contenidos SIFEN',
+            },
+        ),
+        migrations.AddField(
+            model_name='sifenlog',
+            name='request_payload',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_logs', to='sifen.sifenpayload'),
+        ),
+        migrations.AddField(
+            model_name='sifenlog',
+            name='response_payload',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='response_logs', to='sifen.sifenpayload'),
+        ),
+    ]
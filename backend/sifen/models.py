@@ -1,5 +1,43 @@
 """SIFEN models for audit and tracking."""
+import hashlib
+
 from django.db import models
+from django.utils import timezone
+
+from .compression import compress, decompress
+
+
+class SifenPayload(models.Model):
+    """
+    XML completo de una petición o respuesta SIFEN, comprimido.
+    
+    La clave es el sha256 del XML: un mismo contenido se guarda una sola vez
+    aunque lo referencien muchos logs (consultas repetidas).
+    """
+    
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    codec = models.CharField(max_length=10)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Contenido SIFEN'
+        verbose_name_plural = 'Contenidos SIFEN'
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.codec}, {self.size} bytes)"
+    
+    @classmethod
+    def build(cls, text: str) -> 'SifenPayload':
+        """Compress a payload into an unsaved row keyed by its hash."""
+        raw = text.encode('UTF-8')
+        codec, data = compress(raw)
+        return cls(sha256=hashlib.sha256(raw).hexdigest(), codec=codec, data=data, size=len(raw))
+    
+    @property
+    def text(self) -> str:
+        return decompress(self.codec, self.data).decode('UTF-8')
 
 
 class SifenLog(models.Model):
@@ -17,20 +55,92 @@ class SifenLog(models.Model):
     cdc = models.CharField(max_length=44, blank=True, db_index=True)
     batch_id = models.CharField(max_length=50, blank=True)
     
-    # Request/Response
+    # Request/Response: the first characters here, the full XML (with
+    # SIFEN_LOG_CAPTURE="full") compressed in SifenPayload
     request_xml = models.TextField(blank=True)
     response_xml = models.TextField(blank=True)
+    request_payload = models.ForeignKey(
+        SifenPayload,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_logs'
+    )
+    response_payload = models.ForeignKey(
+        SifenPayload,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='response_logs'
+    )
     response_code = models.CharField(max_length=10)
     response_message = models.TextField(blank=True)
     
-    # Timing
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Timing (set when the call is made; the row may be written later, see log_sink.py)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     duration_ms = models.PositiveIntegerField(null=True)
     
     class Meta:
         verbose_name = 'Log SIFEN'
         verbose_name_plural = 'Logs SIFEN'
         ordering = ['-created_at']
+        # Monthly partitions on PostgreSQL, see log_retention.py
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['action', 'created_at']),
+            models.Index(fields=['response_code', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.action} - {self.response_code} - {self.created_at}"
+    
+    @property
+    def request_full(self) -> str:
+        """Full request XML (decompressed), or the stored prefix."""
+        return self.request_payload.text if self.request_payload_id else self.request_xml
+    
+    @property
+    def response_full(self) -> str:
+        """Full response XML (decompressed), or the stored prefix."""
+        return self.response_payload.text if self.response_payload_id else self.response_xml
+
+
+class SifenLote(models.Model):
+    """Lote (batch) de DEs enviado por recibe-lote."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente de envío'),
+        ('sent', 'Enviado, en procesamiento'),
+        ('completed', 'Procesado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.PROTECT,
+        related_name='lotes'
+    )
+    
+    # dProtConsLote devuelto por SIFEN
+    protocolo = models.CharField(max_length=50, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    document_count = models.PositiveIntegerField(default=0)
+    
+    # Última respuesta
+    response_code = models.CharField(max_length=10, blank=True)
+    response_message = models.TextField(blank=True)
+    
+    # Consulta con backoff
+    poll_attempts = models.PositiveIntegerField(default=0)
+    next_poll_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Lote SIFEN'
+        verbose_name_plural = 'Lotes SIFEN'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Lote {self.pk} ({self.protocolo or 'sin protocolo'}) - {self.status}"
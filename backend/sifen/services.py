@@ -1,10 +1,11 @@
 """
 SIFEN Service - Orchestrates invoice generation and submission.
 """
+import io
 import time
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import httpx
 
 from django.conf import settings
@@ -13,7 +14,9 @@ from django.db import transaction
 from .cdc import generate_cdc
 from .xml_builder import SifenXMLBuilder
 from .signer import get_signer
-from .models import SifenLog
+from .skeletons import get_skeleton
+from .bulk_signing import sign_many
+from .log_sink import log_sifen_call
 
 
 class SifenService:
@@ -33,19 +36,17 @@ class SifenService:
         self.api_url = settings.SIFEN_API_URL
         self.signer = get_signer(mock=mock_mode)
     
-    @transaction.atomic
-    def generate_invoice(self, invoice) -> Dict[str, Any]:
+    def _de_fields(self, invoice, stream: bool = False):
         """
-        Generate CDC, build XML, and sign for an invoice.
+        Generate the CDC and collect the build_de arguments of an invoice.
         
         Args:
             invoice: Invoice model instance
+            stream: Read items lazily (for streamed builds)
         
         Returns:
-            Dict with cdc, xml_unsigned, xml_signed
+            Tuple of (cdc, build_de keyword arguments)
         """
-        from invoicing.models import Invoice  # Avoid circular import
-        
         company = invoice.company
         establishment = invoice.establishment
         
@@ -66,10 +67,14 @@ class SifenService:
             tipo_emision=1,  # Normal
         )
         
-        # Prepare items for XML
-        items = []
-        for item in invoice.items.all():
-            items.append({
+        # Items are fed to the builder one at a time; a streamed build
+        # iterates the queryset instead of loading every row (unless the
+        # caller already prefetched them)
+        invoice_items = invoice.items.all()
+        if stream and "items" not in getattr(invoice, "_prefetched_objects_cache", {}):
+            invoice_items = invoice_items.iterator()
+        items = (
+            {
                 "codigo": item.codigo or str(item.id),
                 "descripcion": item.descripcion,
                 "cantidad": item.cantidad,
@@ -79,11 +84,11 @@ class SifenService:
                 "subtotal": item.subtotal,
                 "iva": item.iva,
                 "total": item.total,
-            })
+            }
+            for item in invoice_items
+        )
         
-        # Build XML
-        builder = SifenXMLBuilder()
-        xml_element = builder.build_de(
+        fields = dict(
             cdc=cdc,
             tipo_de=int(invoice.document_type),
             fecha_emision=invoice.fecha_emision,
@@ -109,6 +114,9 @@ class SifenService:
             receptor_ruc=invoice.receptor_ruc,
             receptor_razon_social=invoice.receptor_nombre,
             receptor_direccion=invoice.receptor_direccion,
+            receptor_departamento=invoice.receptor_departamento,
+            receptor_distrito=invoice.receptor_distrito,
+            receptor_ciudad=invoice.receptor_ciudad,
             receptor_email=invoice.receptor_email,
             
             # Totales
@@ -121,14 +129,70 @@ class SifenService:
             
             # Items
             items=items,
+            
+            # Cached emisor part of the XML
+            skeleton=get_skeleton(company, establishment),
         )
         
-        xml_unsigned = builder.to_string(pretty=True)
+        return cdc, fields
+    
+    def build_invoice_xml(self, invoice):
+        """
+        Generate CDC and build the (unsigned) DE XML for an invoice.
+        
+        Args:
+            invoice: Invoice model instance
         
-        # Sign XML
+        Returns:
+            Tuple of (cdc, builder, xml_element)
+        """
+        cdc, fields = self._de_fields(invoice)
+        builder = SifenXMLBuilder()
+        xml_element = builder.build_de(**fields)
+        return cdc, builder, xml_element
+    
+    def stream_invoice_xml(self, invoice, output=None):
+        """
+        Generate CDC and stream the compact unsigned DE XML of an invoice.
+        
+        No lxml tree is built, so memory stays flat however many items the
+        invoice has.
+        
+        Args:
+            invoice: Invoice model instance
+            output: Path or binary file object (default: returned as bytes)
+        
+        Returns:
+            Tuple of (cdc, XML bytes or None when output was given)
+        """
+        cdc, fields = self._de_fields(invoice, stream=True)
+        buffer = io.BytesIO() if output is None else output
+        SifenXMLBuilder().build_de(output=buffer, **fields)
+        return cdc, buffer.getvalue() if output is None else None
+    
+    @transaction.atomic
+    def generate_invoice(self, invoice) -> Dict[str, Any]:
+        """
+        Generate CDC, build XML, and sign for an invoice.
+        
+        Args:
+            invoice: Invoice model instance
+        
+        Returns:
+            Dict with cdc, xml_unsigned, xml_signed
+        """
+        company = invoice.company
+        cdc, builder, xml_element = self.build_invoice_xml(invoice)
+        
+        # Compact serialization: pretty-printing after signing would add
+        # whitespace the digest does not cover
+        xml_unsigned = builder.to_string()
+        
+        # Sign XML with the emisor's certificate
         try:
-            signed_element, signature = self.signer.sign(xml_element)
-            xml_signed = builder.to_string(pretty=True)
+            signer = get_signer(mock=self.mock_mode, company=company)
+            signed_element, signature = signer.sign(xml_element)
+            xml_signed = builder.to_string()
         except Exception as e:
             # If signing fails, use unsigned (for testing)
             xml_signed = xml_unsigned
@@ -136,7 +200,8 @@ class SifenService:
         # Update invoice
         invoice.cdc = cdc
         invoice.xml_signed = xml_signed
-        invoice.status = "pending"
+        if invoice.status != "sending":  # Claimed by send_invoice_task
+            invoice.status = "pending"
         invoice.save()
         
         return {
@@ -145,6 +210,57 @@ class SifenService:
             "xml_signed": xml_signed,
         }
     
+    def generate_invoices(self, invoices, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Generate and sign many invoices, signing in parallel processes.
+        
+        Documents are grouped by emisor certificate and signed with
+        bulk_signing.sign_many; a failed signature leaves that invoice
+        untouched and is reported instead of aborting the run.
+        
+        Args:
+            invoices: Iterable of Invoice model instances
+            max_workers: Signing processes (default SIFEN_SIGN_WORKERS)
+        
+        Returns:
+            List of dicts with invoice_id, cdc, success and error
+        """
+        groups = {}
+        for invoice in invoices:
+            cdc, xml = self.stream_invoice_xml(invoice)
+            if self.mock_mode:
+                cert = (None, None)
+            else:
+                signer = get_signer(company=invoice.company)
+                cert = (signer.cert_path, signer.cert_password)
+            groups.setdefault(cert, []).append((invoice, cdc, xml.decode("UTF-8")))
+        
+        results = []
+        for (cert_path, cert_password), entries in groups.items():
+            signed = sign_many(
+                [xml for _, _, xml in entries],
+                cert_path=cert_path,
+                cert_password=cert_password,
+                mock=self.mock_mode,
+                max_workers=max_workers,
+            )
+            
+            with transaction.atomic():
+                for (invoice, cdc, _), result in zip(entries, signed):
+                    if result.success:
+                        invoice.cdc = cdc
+                        invoice.xml_signed = result.xml
+                        invoice.status = "pending"
+                        invoice.save()
+                    results.append({
+                        "invoice_id": invoice.id,
+                        "cdc": cdc if result.success else "",
+                        "success": result.success,
+                        "error": result.error,
+                    })
+        
+        return results
+    
     def send_to_sifen(self, invoice) -> Dict[str, Any]:
         """
         Send invoice to SIFEN.
@@ -176,12 +292,13 @@ class SifenService:
             invoice.save()
             
             # Log
-            SifenLog.objects.create(
+            log_sifen_call(
                 action="send",
                 cdc=invoice.cdc,
                 batch_id=result["batch_id"],
-                request_xml=invoice.xml_signed[:1000],  # Truncate for log
+                request_xml=invoice.xml_signed[:1000],  # Preview; full XML in request_full
                 response_xml="<mock>OK</mock>",
+                request_full=invoice.xml_signed,
                 response_code=result["response_code"],
                 response_message=result["response_message"],
                 duration_ms=int((time.time() - start_time) * 1000),
@@ -216,10 +333,11 @@ class SifenService:
             invoice.sifen_response_message = str(e)
             invoice.save()
             
-            SifenLog.objects.create(
+            log_sifen_call(
                 action="send",
                 cdc=invoice.cdc,
                 request_xml=invoice.xml_signed[:1000] if invoice.xml_signed else "",
+                request_full=invoice.xml_signed,
                 response_code="ERROR",
                 response_message=str(e),
                 duration_ms=int((time.time() - start_time) * 1000),
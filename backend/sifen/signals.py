@@ -0,0 +1,21 @@
+"""Signal handlers for SIFEN caches."""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from companies.models import Company, EstablishmentPoint
+
+from .catalogs.geografia import invalidar_ubicaciones
+from .skeletons import invalidate_skeletons
+
+
+@receiver([post_save, post_delete], sender=Company)
+def company_changed(sender, instance, **kwargs):
+    """Emisor data changed: rebuild its DE skeletons and location codes."""
+    invalidate_skeletons(company_id=instance.pk)
+    invalidar_ubicaciones(company_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=EstablishmentPoint)
+def establishment_changed(sender, instance, **kwargs):
+    """Establishment codes changed: rebuild its DE skeleton."""
+    invalidate_skeletons(establishment_id=instance.pk)
@@ -2,8 +2,12 @@
 XML Digital Signature for SIFEN.
 Uses XMLDSig Enveloped signature with PKCS#12 certificates.
 """
+import hashlib
+import logging
 import os
-from typing import Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict
 from lxml import etree
 
 try:
@@ -14,6 +18,90 @@ except ImportError:
 
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
+
+# Parsed PKCS#12 keys: (abs path, mtime_ns, password sha256) -> xmlsec.Key.
+# Loading a .p12 re-reads the file and re-runs the PKCS#12 KDF, so each
+# worker does it once per certificate. xmlsec duplicates the key when it
+# is assigned to a SignatureContext, so cached keys are never mutated.
+# Bounded LRU (SIFEN_KEY_CACHE_SIZE) shared by every tenant in the worker.
+_key_cache: "OrderedDict[tuple, xmlsec.Key]" = OrderedDict()
+_key_cache_lock = threading.Lock()
+_key_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def _key_cache_id(cert_path: str, cert_password: str) -> tuple:
+    """Cache key; a new mtime (rotated certificate) yields a new entry."""
+    return (
+        os.path.abspath(cert_path),
+        os.stat(cert_path).st_mtime_ns,
+        hashlib.sha256((cert_password or "").encode("UTF-8")).hexdigest(),
+    )
+
+
+def load_key(cert_path: str, cert_password: str) -> "xmlsec.Key":
+    """
+    Load a PKCS#12 key, using the process-level cache.
+    
+    Args:
+        cert_path: Path to PKCS#12 (.pfx/.p12) certificate
+        cert_password: Certificate password
+    
+    Returns:
+        xmlsec.Key
+    """
+    cache_id = _key_cache_id(cert_path, cert_password)
+    
+    with _key_cache_lock:
+        key = _key_cache.get(cache_id)
+        if key is not None:
+            _key_cache.move_to_end(cache_id)
+            _key_cache_stats["hits"] += 1
+            return key
+        _key_cache_stats["misses"] += 1
+    
+    key = xmlsec.Key.from_file(
+        cert_path,
+        format=xmlsec.constants.KeyDataFormatPkcs12,
+        password=cert_password
+    )
+    
+    with _key_cache_lock:
+        # Drop keys of previous versions of the same file
+        for stale in [k for k in _key_cache if k[0] == cache_id[0]]:
+            del _key_cache[stale]
+        _key_cache[cache_id] = key
+        while len(_key_cache) > max(1, settings.SIFEN_KEY_CACHE_SIZE):
+            _key_cache.popitem(last=False)
+            _key_cache_stats["evictions"] += 1
+    
+    return key
+
+
+def invalidate_key_cache(cert_path: Optional[str] = None):
+    """
+    Forget cached keys (certificate rotation).
+    
+    Args:
+        cert_path: Only forget this certificate (default: all)
+    """
+    with _key_cache_lock:
+        if cert_path is None:
+            removed = list(_key_cache)
+        else:
+            path = os.path.abspath(cert_path)
+            removed = [k for k in _key_cache if k[0] == path]
+        for cache_id in removed:
+            del _key_cache[cache_id]
+        _key_cache_stats["invalidations"] += len(removed)
+
+
+def key_cache_stats() -> dict:
+    """Hit/miss counters and size of the key cache."""
+    with _key_cache_lock:
+        return {**_key_cache_stats, "size": len(_key_cache)}
+
 
 class SifenSigner:
     """Signs XML documents for SIFEN using XMLDSig."""
@@ -70,6 +158,9 @@ class SifenSigner:
         if not element_id:
             raise ValueError("DE element must have Id attribute")
         
+        # Register Id as an XML ID so the "#<CDC>" reference resolves
+        xmlsec.tree.add_ids(xml_element, ["Id"])
+        
         # Create signature template
         signature_node = xmlsec.template.create(
             xml_element,
@@ -98,13 +189,8 @@ class SifenSigner:
         # Load key and sign
         ctx = xmlsec.SignatureContext()
         
-        # Load PKCS#12 certificate
-        key = xmlsec.Key.from_file(
-            self.cert_path,
-            format=xmlsec.constants.KeyDataFormatPkcs12,
-            password=self.cert_password
-        )
-        ctx.key = key
+        # PKCS#12 key (cached per worker)
+        ctx.key = load_key(self.cert_path, self.cert_password)
         
         # Sign
         ctx.sign(signature_node)
@@ -115,6 +201,18 @@ class SifenSigner:
         
         return xml_element, signature_value
     
+    def preload(self) -> bool:
+        """
+        Load the certificate key into the cache ahead of the first signature.
+        
+        Returns:
+            True if the key was loaded
+        """
+        if not XMLSEC_AVAILABLE or not self.is_configured:
+            return False
+        load_key(self.cert_path, self.cert_password)
+        return True
+    
     def sign_string(self, xml_string: str) -> str:
         """
         Sign an XML string.
@@ -164,16 +262,124 @@ class MockSigner:
         ).decode("UTF-8")
 
 
-def get_signer(mock: bool = False) -> SifenSigner:
+class SignerRegistry:
+    """
+    Resolves the signer of each emisor (multi-tenant).
+    
+    Companies with ``certificado_path`` sign with their own certificate;
+    the others fall back to SIFEN_CERT_PATH. Parsed keys live in the shared
+    LRU key cache, so one worker pool serves every tenant without reloading
+    certificates per request.
+    """
+    
+    def __init__(self):
+        self._signers: Dict[int, SifenSigner] = {}
+        self._lock = threading.Lock()
+    
+    def cert_path_for(self, company) -> str:
+        """Absolute certificate path of a company (or the global one)."""
+        path = company.certificado_path or settings.SIFEN_CERT_PATH
+        if path and not os.path.isabs(path) and settings.SIFEN_CERT_DIR:
+            path = os.path.join(settings.SIFEN_CERT_DIR, path)
+        return path
+    
+    def cert_password_for(self, company) -> str:
+        """Certificate password of a company, by RUC (SIFEN_CERT_PASSWORDS)."""
+        return settings.SIFEN_CERT_PASSWORDS.get(company.ruc, settings.SIFEN_CERT_PASSWORD)
+    
+    def get(self, company) -> SifenSigner:
+        """
+        Get the signer of a company.
+        
+        Args:
+            company: Company model instance
+        
+        Returns:
+            SifenSigner bound to the company certificate
+        """
+        cert_path = self.cert_path_for(company)
+        cert_password = self.cert_password_for(company)
+        
+        with self._lock:
+            signer = self._signers.get(company.pk)
+            if signer is not None and (signer.cert_path, signer.cert_password) == (cert_path, cert_password):
+                return signer
+            # Keys of the old certificate may be shared with other
+            # companies: the LRU evicts them when no longer used
+            signer = SifenSigner(cert_path, cert_password)
+            self._signers[company.pk] = signer
+            return signer
+    
+    def forget(self, company=None):
+        """Drop cached signers (one company or all)."""
+        with self._lock:
+            if company is None:
+                self._signers.clear()
+            else:
+                self._signers.pop(company.pk, None)
+    
+    def prewarm(self, limit: Optional[int] = None, days: int = 30) -> int:
+        """
+        Load the keys of the companies with most recent invoices.
+        
+        Args:
+            limit: Number of companies (default SIFEN_PREWARM_SIGNERS)
+            days: Activity window used to rank companies
+        
+        Returns:
+            Number of keys loaded
+        """
+        from datetime import timedelta
+        from django.db.models import Count, Q
+        from django.utils import timezone
+        from companies.models import Company
+        
+        limit = settings.SIFEN_PREWARM_SIGNERS if limit is None else limit
+        if limit <= 0:
+            return 0
+        
+        since = timezone.now() - timedelta(days=days)
+        companies = (
+            Company.objects
+            .filter(is_active=True)
+            .annotate(recent=Count("invoices", filter=Q(invoices__created_at__gte=since)))
+            .order_by("-recent", "pk")[:limit]
+        )
+        
+        loaded = 0
+        for company in companies:
+            try:
+                loaded += self.get(company).preload()
+            except Exception as e:
+                logger.warning("No se pudo precargar certificado de %s: %s", company.ruc, e)
+        return loaded
+
+
+signer_registry = SignerRegistry()
+
+
+def prewarm_signers(limit: Optional[int] = None) -> int:
+    """Pre-load the hottest companies' keys (worker start hook)."""
+    try:
+        return signer_registry.prewarm(limit)
+    except Exception as e:
+        logger.warning("Precarga de certificados omitida: %s", e)
+        return 0
+
+
+def get_signer(mock: bool = False, company=None) -> SifenSigner:
     """
     Get the appropriate signer.
     
     Args:
         mock: If True, return mock signer for testing
+        company: Emisor; resolves its own certificate when given
     
     Returns:
         SifenSigner or MockSigner instance
     """
     if mock or settings.SIFEN_ENVIRONMENT == "test":
         return MockSigner()
+    if company is not None:
+        return signer_registry.get(company)
     return SifenSigner()
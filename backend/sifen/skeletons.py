@@ -0,0 +1,105 @@
+"""
+Per-establishment cache of precompiled DE skeletons.
+
+Everything build_de emits for the emisor (gEmis, gActEco, dEst/dPunExp and
+the gOpeCom constants) is identical for every invoice of an
+EstablishmentPoint, so it is built once and deep-copied per invoice.
+Entries are keyed on Company.updated_at and the establishment codes, so a
+company or establishment edited in another process is rebuilt on next use;
+sifen.signals evicts them eagerly when a Company or EstablishmentPoint is
+saved or deleted in this process.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+from .catalogs.geografia import ubicacion_empresa
+from .xml_builder import SifenXMLBuilder, DESkeleton
+
+# (company pk, company updated_at, establishment pk, codigo_establecimiento,
+#  codigo_punto) -> DESkeleton
+_skeleton_cache: "OrderedDict[tuple, DESkeleton]" = OrderedDict()
+_skeleton_cache_lock = threading.Lock()
+_skeleton_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def get_skeleton(company, establishment) -> DESkeleton:
+    """
+    Get the DE skeleton of an establishment, building it on first use.
+
+    Args:
+        company: Company (emisor)
+        establishment: EstablishmentPoint of the invoice
+
+    Returns:
+        DESkeleton to pass to SifenXMLBuilder.build_de
+    """
+    cache_id = (
+        company.pk,
+        company.updated_at,
+        establishment.pk,
+        establishment.codigo_establecimiento,
+        establishment.codigo_punto,
+    )
+
+    with _skeleton_cache_lock:
+        skeleton = _skeleton_cache.get(cache_id)
+        if skeleton is not None:
+            _skeleton_cache.move_to_end(cache_id)
+            _skeleton_cache_stats["hits"] += 1
+            return skeleton
+        _skeleton_cache_stats["misses"] += 1
+
+    skeleton = SifenXMLBuilder().build_skeleton(
+        emisor_ruc=company.ruc,
+        emisor_razon_social=company.razon_social,
+        emisor_nombre_fantasia=company.nombre_fantasia,
+        emisor_actividad=company.actividad_economica,
+        emisor_establecimiento=establishment.codigo_establecimiento,
+        emisor_punto=establishment.codigo_punto,
+        emisor_direccion=company.direccion,
+        emisor_departamento=company.departamento,
+        emisor_distrito=company.distrito,
+        emisor_ciudad=company.ciudad,
+        emisor_telefono=company.telefono,
+        emisor_email=company.email,
+        emisor_ubicacion=ubicacion_empresa(company),
+    )
+
+    with _skeleton_cache_lock:
+        # Drop skeletons of previous versions of the same establishment
+        for stale in [k for k in _skeleton_cache if k[0] == company.pk and k[2] == establishment.pk]:
+            del _skeleton_cache[stale]
+        _skeleton_cache[cache_id] = skeleton
+        while len(_skeleton_cache) > max(1, settings.SIFEN_SKELETON_CACHE_SIZE):
+            _skeleton_cache.popitem(last=False)
+            _skeleton_cache_stats["evictions"] += 1
+
+    return skeleton
+
+
+def invalidate_skeletons(company_id: Optional[int] = None, establishment_id: Optional[int] = None):
+    """
+    Forget cached skeletons.
+
+    Args:
+        company_id: Only forget this company's skeletons
+        establishment_id: Only forget this establishment's skeleton
+    """
+    with _skeleton_cache_lock:
+        removed = [
+            k for k in _skeleton_cache
+            if (company_id is None or k[0] == company_id)
+            and (establishment_id is None or k[2] == establishment_id)
+        ]
+        for cache_id in removed:
+            del _skeleton_cache[cache_id]
+        _skeleton_cache_stats["invalidations"] += len(removed)
+
+
+def skeleton_cache_stats() -> dict:
+    """Hit/miss counters and size of the skeleton cache."""
+    with _skeleton_cache_lock:
+        return {**_skeleton_cache_stats, "size": len(_skeleton_cache)}
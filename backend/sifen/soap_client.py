@@ -3,18 +3,21 @@ SOAP Client for SIFEN Web Services.
 
 Endpoints (Manual Técnico v150):
 - /de/ws/sync/recibe.wsdl - Recepción síncrona de DE
+- /de/ws/async/recibe-lote.wsdl - Recepción de lotes
+- /de/ws/consultas/consulta-lote.wsdl - Consulta de lotes
 - /de/ws/consulta/ruc.wsdl - Consulta RUC
 - /de/ws/consulta/cdc.wsdl - Consulta por CDC
 - /de/ws/evento/anulacion.wsdl - Anulación de DE
 """
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from lxml import etree
 import httpx
 
 from django.conf import settings
-from .models import SifenLog
+from .log_sink import log_sifen_call
+from .transport import get_http_client, record_error
 
 
 @dataclass
@@ -28,18 +31,12 @@ class SifenResponse:
     data: Optional[Dict[str, Any]] = None
 
 
-class SifenSoapClient:
+class BaseSifenSoapClient:
     """
-    SOAP client for SIFEN web services.
+    Transport-independent parts of the SIFEN SOAP clients.
     
-    Usage:
-        client = SifenSoapClient()
-        
-        # Send document
-        response = client.send_de(xml_signed)
-        
-        # Query by CDC
-        response = client.query_cdc("01800123456001001...")
+    Builds envelopes and bodies and parses responses; subclasses only
+    implement how the request is sent (sync or asyncio).
     """
     
     # SOAP envelope template
@@ -55,6 +52,23 @@ class SifenSoapClient:
     # SIFEN namespace
     NS = "http://ekuatia.set.gov.py/sifen/xsd"
     
+    # Response codes treated as success
+    SUCCESS_CODES = [
+        "0",
+        "0260",  # already exists / approved
+        "0300",  # lote received
+        "0361",  # lote still processing
+        "0362",  # lote processed
+    ]
+    
+    # Endpoints (relative to base_url)
+    ENDPOINT_SEND = "/de/ws/sync/recibe.wsdl"
+    ENDPOINT_BATCH = "/de/ws/async/recibe-lote.wsdl"
+    ENDPOINT_QUERY_LOTE = "/de/ws/consultas/consulta-lote.wsdl"
+    ENDPOINT_QUERY_CDC = "/de/ws/consulta/cdc.wsdl"
+    ENDPOINT_QUERY_RUC = "/de/ws/consulta/ruc.wsdl"
+    ENDPOINT_CANCEL = "/de/ws/evento/anulacion.wsdl"
+    
     def __init__(
         self,
         base_url: Optional[str] = None,
@@ -120,7 +134,7 @@ class SifenSoapClient:
             # Look for additional data
             # CDC in response
             cdc_elem = root.find(f".//{{{self.NS}}}dCDC")
-            if cdc_elem is not None:
+            if cdc_elem is not None and cdc_elem.text:
                 result["cdc"] = cdc_elem.text
             
             # Processing ID
@@ -128,6 +142,35 @@ class SifenSoapClient:
             if id_elem is not None:
                 result["processing_id"] = id_elem.text
             
+            # Lote (batch) protocol number, returned by recibe-lote
+            prot_elem = root.find(f".//{{{self.NS}}}dProtConsLote")
+            if prot_elem is not None and prot_elem.text:
+                result["lote_protocol"] = prot_elem.text
+            
+            # Lote status (consulta-lote): takes precedence over per-DE codes
+            lot_code = root.find(f".//{{{self.NS}}}dCodResLot")
+            if lot_code is not None and lot_code.text:
+                result["response_code"] = lot_code.text
+                lot_msg = root.find(f".//{{{self.NS}}}dMsgResLot")
+                if lot_msg is not None and lot_msg.text:
+                    result["response_message"] = lot_msg.text
+            
+            # Per-DE results of a processed lote
+            lote_results = []
+            for res in root.iter(f"{{{self.NS}}}gResProcLote"):
+                lote_results.append({
+                    "cdc": res.findtext(f"{{{self.NS}}}id", default=""),
+                    "status": res.findtext(f"{{{self.NS}}}dEstRes", default=""),
+                    "response_code": res.findtext(
+                        f".//{{{self.NS}}}dCodRes", default=""
+                    ),
+                    "response_message": res.findtext(
+                        f".//{{{self.NS}}}dMsgRes", default=""
+                    ),
+                })
+            if lote_results:
+                result["lote_results"] = lote_results
+            
             return result
             
         except Exception as e:
@@ -136,6 +179,141 @@ class SifenSoapClient:
                 "response_message": f"Error parsing response: {str(e)}",
             }
     
+    def _headers(self, action: str) -> Dict[str, str]:
+        """HTTP headers for a SOAP action."""
+        return {
+            "Content-Type": "application/soap+xml; charset=utf-8",
+            "SOAPAction": f'"{self.NS}/{action}"',
+        }
+    
+    def _build_response(
+        self,
+        action: str,
+        soap_request: str,
+        response_text: str,
+        duration_ms: int,
+    ) -> Tuple[SifenResponse, Dict[str, Any]]:
+        """
+        Parse a successful HTTP response into a SifenResponse.
+        
+        Returns:
+            Tuple of (SifenResponse, SifenLog fields)
+        """
+        parsed = self._parse_response(response_text)
+        success = parsed["response_code"] in self.SUCCESS_CODES
+        
+        log_fields = {
+            "action": action,
+            "cdc": parsed.get("cdc", ""),
+            "request_xml": soap_request[:2000],
+            "response_xml": response_text[:2000],
+            "request_full": soap_request,
+            "response_full": response_text,
+            "response_code": parsed["response_code"],
+            "response_message": parsed["response_message"][:500],
+            "duration_ms": duration_ms,
+        }
+        
+        response = SifenResponse(
+            success=success,
+            response_code=parsed["response_code"],
+            response_message=parsed["response_message"],
+            raw_xml=response_text,
+            duration_ms=duration_ms,
+            data=parsed,
+        )
+        return response, log_fields
+    
+    def _error_response(self, exc: Exception, duration_ms: int) -> SifenResponse:
+        """Convert a transport exception into a failed SifenResponse."""
+        if isinstance(exc, httpx.TimeoutException):
+            return SifenResponse(
+                success=False,
+                response_code="TIMEOUT",
+                response_message="Request timeout",
+                raw_xml="",
+                duration_ms=duration_ms,
+            )
+        if isinstance(exc, httpx.HTTPStatusError):
+            return SifenResponse(
+                success=False,
+                response_code=f"HTTP_{exc.response.status_code}",
+                response_message=str(exc),
+                raw_xml=exc.response.text if hasattr(exc.response, 'text') else "",
+                duration_ms=duration_ms,
+            )
+        return SifenResponse(
+            success=False,
+            response_code="ERROR",
+            response_message=str(exc),
+            raw_xml="",
+            duration_ms=duration_ms,
+        )
+    
+    def _send_de_body(self, xml_de: str, id_lote: str = "1") -> str:
+        """Body for rEnviDe (single DE)."""
+        return f'''<rEnviDe xmlns="{self.NS}">
+            <dId>{id_lote}</dId>
+            <xDE>{xml_de}</xDE>
+        </rEnviDe>'''
+    
+    def _query_cdc_body(self, cdc: str) -> str:
+        """Body for rConsDe (query by CDC)."""
+        return f'''<rConsDe xmlns="{self.NS}">
+            <dCDC>{cdc}</dCDC>
+        </rConsDe>'''
+    
+    def _query_ruc_body(self, ruc: str) -> str:
+        """Body for rConsRUC (query by RUC)."""
+        # Extract RUC without check digit
+        ruc_sin_dv = ruc.split("-")[0] if "-" in ruc else ruc
+        
+        return f'''<rConsRUC xmlns="{self.NS}">
+            <dRUCCons>{ruc_sin_dv}</dRUCCons>
+        </rConsRUC>'''
+    
+    def _cancel_de_body(self, cdc: str, motivo: str) -> str:
+        """Body for rEveAnuDE (cancellation event)."""
+        return f'''<rEveAnuDE xmlns="{self.NS}">
+            <dCDC>{cdc}</dCDC>
+            <mOtEve>{motivo}</mOtEve>
+        </rEveAnuDE>'''
+    
+    def _send_batch_body(self, documents: list, id_lote: str) -> str:
+        """Body for rEnviLoteDe (batch of DEs)."""
+        # Build batch body
+        xde_list = "".join(f"<xDE>{doc}</xDE>" for doc in documents)
+        
+        return f'''<rEnviLoteDe xmlns="{self.NS}">
+            <dId>{id_lote}</dId>
+            {xde_list}
+        </rEnviLoteDe>'''
+    
+    def _query_lote_body(self, protocolo: str) -> str:
+        """Body for rEnviConsLoteDe (lote result query)."""
+        return f'''<rEnviConsLoteDe xmlns="{self.NS}">
+            <dId>{int(time.time())}</dId>
+            <dProtConsLote>{protocolo}</dProtConsLote>
+        </rEnviConsLoteDe>'''
+
+
+class SifenSoapClient(BaseSifenSoapClient):
+    """
+    SOAP client for SIFEN web services.
+    
+    Connections come from the process-wide pool in ``transport``, so
+    creating many clients is cheap and keep-alive sockets are reused.
+    
+    Usage:
+        client = SifenSoapClient()
+        
+        # Send document
+        response = client.send_de(xml_signed)
+        
+        # Query by CDC
+        response = client.query_cdc("01800123456001001...")
+    """
+    
     def _make_request(
         self,
         endpoint: str,
@@ -158,69 +336,27 @@ class SifenSoapClient:
         soap_request = self._build_soap_request(body)
         
         try:
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(
-                    url,
-                    content=soap_request,
-                    headers={
-                        "Content-Type": "application/soap+xml; charset=utf-8",
-                        "SOAPAction": f'"{self.NS}/{action}"',
-                    },
-                )
-                response.raise_for_status()
-                
-            duration_ms = int((time.time() - start_time) * 1000)
-            
-            parsed = self._parse_response(response.text)
-            success = parsed["response_code"] in ["0", "0260"]  # 0260 = already exists
-            
-            # Log request
-            SifenLog.objects.create(
-                action=action,
-                cdc=parsed.get("cdc", ""),
-                request_xml=soap_request[:2000],
-                response_xml=response.text[:2000],
-                response_code=parsed["response_code"],
-                response_message=parsed["response_message"][:500],
-                duration_ms=duration_ms,
-            )
-            
-            return SifenResponse(
-                success=success,
-                response_code=parsed["response_code"],
-                response_message=parsed["response_message"],
-                raw_xml=response.text,
-                duration_ms=duration_ms,
-                data=parsed,
-            )
-            
-        except httpx.TimeoutException:
-            duration_ms = int((time.time() - start_time) * 1000)
-            return SifenResponse(
-                success=False,
-                response_code="TIMEOUT",
-                response_message="Request timeout",
-                raw_xml="",
-                duration_ms=duration_ms,
-            )
-        except httpx.HTTPStatusError as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            return SifenResponse(
-                success=False,
-                response_code=f"HTTP_{e.response.status_code}",
-                response_message=str(e),
-                raw_xml=e.response.text if hasattr(e.response, 'text') else "",
-                duration_ms=duration_ms,
+            client = get_http_client(self.timeout)
+            response = client.post(
+                url,
+                content=soap_request,
+                headers=self._headers(action),
+                timeout=self.timeout,
             )
+            response.raise_for_status()
         except Exception as e:
-            duration_ms = int((time.time() - start_time) * 1000)
-            return SifenResponse(
-                success=False,
-                response_code="ERROR",
-                response_message=str(e),
-                raw_xml="",
-                duration_ms=duration_ms,
-            )
+            record_error()
+            return self._error_response(e, int((time.time() - start_time) * 1000))
+        
+        duration_ms = int((time.time() - start_time) * 1000)
+        result, log_fields = self._build_response(
+            action, soap_request, response.text, duration_ms
+        )
+        
+        # Log request (buffered, written in bulk off the request path)
+        log_sifen_call(**log_fields)
+        
+        return result
     
     def send_de(self, xml_de: str, id_lote: str = "1") -> SifenResponse:
         """
@@ -233,12 +369,8 @@ class SifenSoapClient:
         Returns:
             SifenResponse with result
         """
-        body = f'''<rEnviDe xmlns="{self.NS}">
-            <dId>{id_lote}</dId>
-            <xDE>{xml_de}</xDE>
-        </rEnviDe>'''
-        
-        return self._make_request("/de/ws/sync/recibe.wsdl", body, "send")
+        body = self._send_de_body(xml_de, id_lote)
+        return self._make_request(self.ENDPOINT_SEND, body, "send")
     
     def query_cdc(self, cdc: str) -> SifenResponse:
         """
@@ -250,11 +382,8 @@ class SifenSoapClient:
         Returns:
             SifenResponse with document status
         """
-        body = f'''<rConsDe xmlns="{self.NS}">
-            <dCDC>{cdc}</dCDC>
-        </rConsDe>'''
-        
-        return self._make_request("/de/ws/consulta/cdc.wsdl", body, "query")
+        body = self._query_cdc_body(cdc)
+        return self._make_request(self.ENDPOINT_QUERY_CDC, body, "query")
     
     def query_ruc(self, ruc: str) -> SifenResponse:
         """
@@ -266,14 +395,8 @@ class SifenSoapClient:
         Returns:
             SifenResponse with taxpayer data
         """
-        # Extract RUC without check digit
-        ruc_sin_dv = ruc.split("-")[0] if "-" in ruc else ruc
-        
-        body = f'''<rConsRUC xmlns="{self.NS}">
-            <dRUCCons>{ruc_sin_dv}</dRUCCons>
-        </rConsRUC>'''
-        
-        return self._make_request("/de/ws/consulta/ruc.wsdl", body, "query")
+        body = self._query_ruc_body(ruc)
+        return self._make_request(self.ENDPOINT_QUERY_RUC, body, "query")
     
     def cancel_de(
         self,
@@ -290,12 +413,8 @@ class SifenSoapClient:
         Returns:
             SifenResponse with result
         """
-        body = f'''<rEveAnuDE xmlns="{self.NS}">
-            <dCDC>{cdc}</dCDC>
-            <mOtEve>{motivo}</mOtEve>
-        </rEveAnuDE>'''
-        
-        return self._make_request("/de/ws/evento/anulacion.wsdl", body, "cancel")
+        body = self._cancel_de_body(cdc, motivo)
+        return self._make_request(self.ENDPOINT_CANCEL, body, "cancel")
     
     def send_batch(self, documents: list, id_lote: str = None) -> SifenResponse:
         """
@@ -311,17 +430,24 @@ class SifenSoapClient:
         if not id_lote:
             id_lote = str(int(time.time()))
         
-        # Build batch body
-        xde_list = "".join(f"<xDE>{doc}</xDE>" for doc in documents)
+        body = self._send_batch_body(documents, id_lote)
+        return self._make_request(self.ENDPOINT_BATCH, body, "batch")
+    
+    def query_lote(self, protocolo: str) -> SifenResponse:
+        """
+        Query the processing result of a lote.
         
-        body = f'''<rEnviLoteDe xmlns="{self.NS}">
-            <dId>{id_lote}</dId>
-            {xde_list}
-        </rEnviLoteDe>'''
+        Args:
+            protocolo: dProtConsLote returned by send_batch
         
-        return self._make_request("/de/ws/async/recibe-lote.wsdl", body, "batch")
+        Returns:
+            SifenResponse; data["lote_results"] holds per-DE results
+            once the lote is processed (code 0362)
+        """
+        body = self._query_lote_body(protocolo)
+        return self._make_request(self.ENDPOINT_QUERY_LOTE, body, "query")
 
 
 def get_soap_client() -> SifenSoapClient:
-    """Get configured SOAP client."""
+    """Get configured SOAP client (backed by the shared connection pool)."""
     return SifenSoapClient()
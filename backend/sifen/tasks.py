@@ -0,0 +1,134 @@
+"""
+Celery tasks for SIFEN.
+
+Invoice generation (CDC + XML + signature) and submission run here instead
+of the request thread, so API latency no longer depends on SIFEN.
+"""
+from celery import shared_task
+
+from django.conf import settings
+
+from .log_retention import apply_retention, ensure_partitions
+from .lotes import process_lotes
+from .services import SifenService
+
+# Responses worth retrying: SIFEN/transport unavailable
+RETRYABLE_CODES = ["TIMEOUT", "ERROR", "HTTP_502", "HTTP_503", "HTTP_504"]
+
+# Invoices send_invoice_task may take (see the send_to_sifen action)
+SENDABLE_STATUSES = ['draft', 'pending', 'rejected']
+
+
+def _get_invoice(invoice_id: int):
+    from invoicing.models import Invoice  # Avoid circular import
+    return Invoice.objects.select_related('company', 'establishment').get(pk=invoice_id)
+
+
+@shared_task
+def generate_invoice_task(invoice_id: int) -> dict:
+    """Generate CDC, build XML and sign an invoice."""
+    invoice = _get_invoice(invoice_id)
+    result = SifenService().generate_invoice(invoice)
+    return {
+        'invoice_id': invoice_id,
+        'cdc': result['cdc'],
+    }
+
+
+def _claim_invoice(invoice_id: int):
+    """
+    Move an invoice to "sending" unless another path already took it.
+
+    The conditional UPDATE makes concurrent sends (a repeated request, a
+    Celery retry, the queue action) race for the row: only one wins.
+
+    Returns:
+        The status it had before, or None if it could not be claimed
+    """
+    from invoicing.models import Invoice
+
+    status = (
+        Invoice.objects
+        .filter(pk=invoice_id, status__in=SENDABLE_STATUSES, lote__isnull=True)
+        .values_list('status', flat=True)
+        .first()
+    )
+    if status is None:
+        return None
+    claimed = (
+        Invoice.objects
+        .filter(pk=invoice_id, status=status, lote__isnull=True)
+        .update(status='sending')
+    )
+    return status if claimed else None
+
+
+def _still_claimed(invoice) -> bool:
+    from invoicing.models import Invoice
+    return Invoice.objects.filter(pk=invoice.pk, status='sending', lote__isnull=True).exists()
+
+
+def _skipped(invoice_id: int) -> dict:
+    return {
+        'invoice_id': invoice_id,
+        'success': False,
+        'skipped': True,
+        'message': 'La factura ya fue tomada por otro envío',
+    }
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def send_invoice_task(self, invoice_id: int) -> dict:
+    """Generate (if needed), sign and send an invoice to SIFEN."""
+    previous = _claim_invoice(invoice_id)
+    if previous is None:
+        return _skipped(invoice_id)
+
+    invoice = _get_invoice(invoice_id)
+    service = SifenService()
+
+    try:
+        if not invoice.cdc:
+            service.generate_invoice(invoice)
+            invoice.refresh_from_db()
+    except Exception:
+        from invoicing.models import Invoice
+        Invoice.objects.filter(pk=invoice_id, status='sending').update(status=previous)
+        raise
+
+    if not _still_claimed(invoice):
+        return _skipped(invoice_id)
+
+    result = service.send_to_sifen(invoice)
+
+    if not result['success'] and result['response_code'] in RETRYABLE_CODES:
+        raise self.retry()
+
+    return {
+        'invoice_id': invoice_id,
+        'cdc': invoice.cdc,
+        'success': result['success'],
+        'response_code': result['response_code'],
+        'message': result['response_message'],
+    }
+
+
+@shared_task
+def process_lotes_task(company_id: int = None) -> dict:
+    """Submit queued invoices in lotes and poll due lotes."""
+    company = None
+    if company_id:
+        from companies.models import Company
+        company = Company.objects.get(pk=company_id)
+    return process_lotes(company=company)
+
+
+@shared_task
+def maintain_sifen_logs_task() -> dict:
+    """Create upcoming SifenLog partitions and apply retention (if configured)."""
+    created = ensure_partitions()
+    archived = apply_retention() if settings.SIFEN_LOG_ARCHIVE_DIR else []
+    return {
+        'partitions_created': created,
+        'months_archived': [result['month'] for result in archived],
+    }
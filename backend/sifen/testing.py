@@ -0,0 +1,257 @@
+"""
+Local stub of the SIFEN SOAP endpoints for tests and benchmarks.
+
+Usage:
+    with StubSifenServer() as server:
+        client = SifenSoapClient(base_url=server.url)
+        response = client.send_de(xml_signed)
+
+    generate_test_certificate("/tmp/test.p12", "secret")
+"""
+import datetime
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+NS = "http://ekuatia.set.gov.py/sifen/xsd"
+
+RESPONSE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope">
+    <env:Body>
+        <ns2:{root} xmlns:ns2="{ns}">
+            <ns2:dId>{processing_id}</ns2:dId>
+            <ns2:dCDC>{cdc}</ns2:dCDC>
+            <ns2:gResProcDE>
+                <ns2:dCodRes>{code}</ns2:dCodRes>
+                <ns2:dMsgRes>{message}</ns2:dMsgRes>
+            </ns2:gResProcDE>
+        </ns2:{root}>
+    </env:Body>
+</env:Envelope>'''
+
+LOTE_RESPONSE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope">
+    <env:Body>
+        <ns2:rResEnviConsLoteDe xmlns:ns2="{ns}">
+            <ns2:dFecProc>2024-01-15T10:30:00</ns2:dFecProc>
+            <ns2:dCodResLot>{code}</ns2:dCodResLot>
+            <ns2:dMsgResLot>{message}</ns2:dMsgResLot>
+            {results}
+        </ns2:rResEnviConsLoteDe>
+    </env:Body>
+</env:Envelope>'''
+
+LOTE_RESULT_TEMPLATE = '''<ns2:gResProcLote>
+                <ns2:id>{cdc}</ns2:id>
+                <ns2:dEstRes>Aprobado</ns2:dEstRes>
+                <ns2:gResProc>
+                    <ns2:dCodRes>0260</ns2:dCodRes>
+                    <ns2:dMsgRes>Autorización del DE satisfactoria</ns2:dMsgRes>
+                </ns2:gResProc>
+            </ns2:gResProcLote>'''
+
+# path -> (response root element, code, message)
+DEFAULT_RESPONSES = {
+    "/de/ws/sync/recibe.wsdl": ("rRetEnviDe", "0260", "Autorización del DE satisfactoria"),
+    "/de/ws/async/recibe-lote.wsdl": ("rResEnviLoteDe", "0300", "Lote recibido con éxito"),
+    "/de/ws/consulta/cdc.wsdl": ("rEnviConsDeResponse", "0422", "CDC encontrado"),
+    "/de/ws/consulta/ruc.wsdl": ("rResEnviConsRUC", "0502", "RUC encontrado"),
+    "/de/ws/evento/anulacion.wsdl": ("rRetEnviEventoDe", "0600", "Evento registrado correctamente"),
+}
+
+LOTE_QUERY_PATH = "/de/ws/consultas/consulta-lote.wsdl"
+
+_CDC_RE = re.compile(r'(?:Id="|<dCDC>)(\d{44})')
+_PROTOCOL_RE = re.compile(r'<dProtConsLote>(\d+)</dProtConsLote>')
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("UTF-8")
+
+        with server.lock:
+            server.request_count += 1
+            server.requests.append((self.path, body))
+            processing_id = server.request_count
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        with server.lock:
+            server.in_flight -= 1
+
+        if self.path == LOTE_QUERY_PATH:
+            payload = self._lote_result(body)
+        else:
+            payload = self._de_result(body, processing_id)
+
+        self.send_response(server.status_code)
+        self.send_header("Content-Type", "application/soap+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _de_result(self, body: str, processing_id: int) -> bytes:
+        server = self.server
+        root, code, message = server.responses.get(
+            self.path, ("rRetEnviDe", "0160", "Endpoint desconocido")
+        )
+        cdcs = _CDC_RE.findall(body)
+        payload = RESPONSE_TEMPLATE.format(
+            root=root,
+            ns=NS,
+            processing_id=processing_id,
+            cdc=cdcs[0] if cdcs else "",
+            code=code,
+            message=message,
+        )
+        if root == "rResEnviLoteDe":
+            # Remember the lote so consulta-lote can answer per CDC
+            with server.lock:
+                server.lotes[str(processing_id)] = cdcs
+            payload = payload.replace(
+                "<ns2:dId>",
+                f"<ns2:dProtConsLote>{processing_id}</ns2:dProtConsLote><ns2:dId>",
+            )
+        return payload.encode("UTF-8")
+
+    def _lote_result(self, body: str) -> bytes:
+        server = self.server
+        match = _PROTOCOL_RE.search(body)
+        cdcs = server.lotes.get(match.group(1)) if match else None
+        if cdcs is None:
+            code, message, results = "0360", "Número de lote inexistente", ""
+        else:
+            code, message = server.lote_status
+            results = "".join(LOTE_RESULT_TEMPLATE.format(cdc=cdc) for cdc in cdcs)
+            if code != "0362":
+                results = ""
+        return LOTE_RESPONSE_TEMPLATE.format(
+            ns=NS, code=code, message=message, results=results
+        ).encode("UTF-8")
+
+    def log_message(self, format, *args):
+        pass  # keep test output clean
+
+
+class StubSifenServer:
+    """In-process HTTP server answering SIFEN SOAP requests."""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        responses: Optional[Dict[str, tuple]] = None,
+        status_code: int = 200,
+    ):
+        """
+        Args:
+            delay: Seconds to wait before answering (simulated latency)
+            responses: Overrides of DEFAULT_RESPONSES by path
+            status_code: HTTP status returned for every request
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        self._server.request_count = 0
+        self._server.requests = []
+        self._server.in_flight = 0
+        self._server.max_in_flight = 0
+        self._server.delay = delay
+        self._server.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self._server.status_code = status_code
+        self._server.lotes = {}
+        self._server.lote_status = ("0362", "Procesamiento de lote concluido")
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self._server.request_count
+
+    @property
+    def max_in_flight(self) -> int:
+        """Highest number of requests handled simultaneously."""
+        return self._server.max_in_flight
+
+    @property
+    def requests(self) -> list:
+        """List of (path, body) tuples received so far."""
+        return self._server.requests
+
+    def set_response(self, path: str, root: str, code: str, message: str):
+        """Change the canned response for an endpoint."""
+        self._server.responses[path] = (root, code, message)
+
+    def set_lote_status(self, code: str, message: str):
+        """Change the lote status returned by consulta-lote (e.g. 0361)."""
+        self._server.lote_status = (code, message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def generate_test_certificate(path: str, password: str = "test", cn: str = "ERP Paraguay Test") -> str:
+    """
+    Write a self-signed RSA PKCS#12 certificate for signing tests.
+
+    Args:
+        path: Destination .p12 path
+        password: PKCS#12 password
+        cn: Certificate common name
+
+    Returns:
+        The path written
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=365))
+        .sign(key, hashes.SHA256())
+    )
+    data = pkcs12.serialize_key_and_certificates(
+        cn.encode("UTF-8"),
+        key,
+        cert,
+        None,
+        serialization.BestAvailableEncryption(password.encode("UTF-8")),
+    )
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
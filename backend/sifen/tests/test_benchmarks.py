@@ -0,0 +1,42 @@
+"""Tests for the benchmark runner."""
+import pytest
+
+from sifen.benchmarks import BenchmarkSuite, BenchmarkResult, compare, save_results, load_results
+
+
+def _result(name, mean_ms):
+    return BenchmarkResult(name, 1, mean_ms, mean_ms, mean_ms, mean_ms, 1000 / mean_ms)
+
+
+class TestBenchmarks:
+    """Benchmark suite and regression comparison."""
+
+    def test_compare_flags_regressions(self):
+        """Only slowdowns above the threshold are regressions."""
+        baseline = [_result("a", 1.0), _result("b", 1.0), _result("gone", 1.0)]
+        current = [_result("a", 1.05), _result("b", 1.5), _result("new", 1.0)]
+
+        rows = {row["name"]: row for row in compare(current, baseline, threshold=0.10)}
+
+        assert set(rows) == {"a", "b"}
+        assert not rows["a"]["regression"]
+        assert rows["b"]["regression"]
+
+    def test_results_round_trip(self, tmp_path):
+        """Saved results should load back unchanged."""
+        path = str(tmp_path / "bench" / "results.json")
+        results = [_result("a", 2.0)]
+        save_results(results, path)
+        assert load_results(path) == results
+
+    @pytest.mark.django_db(transaction=True)
+    def test_end_to_end(self):
+        """The e2e benchmarks sign and send through the stub and roll back."""
+        from invoicing.models import Invoice
+        from sifen.models import SifenLog
+
+        results = BenchmarkSuite(scale=0.01, only="e2e.").run()
+
+        assert [r.name for r in results] == ["e2e.generate_invoice", "e2e.send_to_sifen"]
+        assert not Invoice.objects.exists()
+        assert not SifenLog.objects.exists()
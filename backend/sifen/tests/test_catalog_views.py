@@ -0,0 +1,152 @@
+"""Tests for the precomputed catalog API responses."""
+import gzip
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from sifen.catalog_cache import clear_responses
+from sifen.catalogs.store import reload_catalogs, update_catalog
+
+
+@pytest.fixture
+def client():
+    clear_responses()
+    yield APIClient()
+    clear_responses()
+
+
+class TestCatalogResponses:
+    """Catalog endpoints are served from precomputed, compressed bodies."""
+    
+    def test_gzip_and_etag(self, client):
+        """gzip is served when accepted, with a strong ETag per encoding."""
+        plain = client.get('/api/sifen/catalogs/departamentos/')
+        compressed = client.get('/api/sifen/catalogs/departamentos/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        assert plain.status_code == compressed.status_code == 200
+        assert 'Content-Encoding' not in plain
+        assert compressed['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(compressed.content) == plain.content
+        data = json.loads(plain.content)
+        assert [d["codigo"] for d in data[:3]] == ["0", "1", "2"]
+        assert data[11]["distritos_count"] > 0
+        
+        version = plain['X-Catalog-Version']
+        assert plain['ETag'] == f'"{version}"'
+        assert compressed['ETag'] == f'"{version}-gzip"'
+        assert 'Accept-Encoding' in compressed['Vary']
+        assert 'immutable' not in plain['Cache-Control']
+    
+    def test_not_modified(self, client):
+        """If-None-Match with any encoding's ETag gets an empty 304."""
+        first = client.get('/api/sifen/catalogs/monedas/', HTTP_ACCEPT_ENCODING='gzip')
+        
+        for etag in (first['ETag'], f'"{first["X-Catalog-Version"]}"', '*'):
+            again = client.get('/api/sifen/catalogs/monedas/', HTTP_IF_NONE_MATCH=etag)
+            assert again.status_code == 304
+            assert again.content == b''
+        
+        changed = client.get('/api/sifen/catalogs/monedas/', HTTP_IF_NONE_MATCH='"other"')
+        assert changed.status_code == 200
+    
+    def test_versioned_url_is_immutable(self, client):
+        """?v=<version> is cacheable for a year; a stale version is not."""
+        version = client.get('/api/sifen/catalogs/iva/')['X-Catalog-Version']
+        
+        current = client.get(f'/api/sifen/catalogs/iva/?v={version}')
+        stale = client.get('/api/sifen/catalogs/iva/?v=old')
+        
+        assert 'immutable' in current['Cache-Control']
+        assert 'immutable' not in stale['Cache-Control']
+    
+    def test_version_header_exposed_to_frontend(self, client):
+        """The frontend origin can read X-Catalog-Version (CORS)."""
+        response = client.get('/api/sifen/catalogs/iva/', HTTP_ORIGIN='http://localhost:5173')
+        
+        assert 'X-Catalog-Version' in response['Access-Control-Expose-Headers']
+    
+    def test_refused_encoding(self, client):
+        """gzip;q=0 falls back to the uncompressed body."""
+        response = client.get('/api/sifen/catalogs/documentos/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        assert 'Content-Encoding' not in response
+        assert "tipos_de" in json.loads(response.content)
+    
+    def test_rebuilt_when_catalog_changes(self, client, settings, tmp_path):
+        """A new catalog version (update_catalogs) invalidates the response."""
+        settings.SIFEN_CATALOG_DIR = str(tmp_path)
+        reload_catalogs()
+        try:
+            before = client.get('/api/sifen/catalogs/unidades/')
+            update_catalog("unidades", [("83", "KG", "Kilogramo")], "2024-06")
+            reload_catalogs()
+            after = client.get('/api/sifen/catalogs/unidades/', HTTP_IF_NONE_MATCH=before['ETag'])
+        finally:
+            reload_catalogs()
+        
+        assert after.status_code == 200
+        assert json.loads(after.content) == [{"codigo_sifen": "83", "codigo": "KG", "descripcion": "Kilogramo"}]
+    
+    def test_search_not_precomputed(self, client):
+        """Searches are regular responses."""
+        response = client.get('/api/sifen/catalogs/unidades/?q=kilo')
+        assert response.status_code == 200
+        assert 'X-Catalog-Version' not in response
+        assert response.json()[0]["codigo"] == "KG"
+
+
+class TestActividadesList:
+    """actividades_list pages through the code-sorted index."""
+    
+    def _get(self, client, **params):
+        response = client.get('/api/sifen/catalogs/actividades/', params)
+        assert response.status_code == 200
+        return response.json()
+    
+    def test_offset_pages_in_code_order(self, client):
+        """Offset pages cover the catalog once, sorted by code."""
+        from sifen.catalogs import ACTIVIDADES_ECONOMICAS
+        first = self._get(client, limit=50)
+        second = self._get(client, limit=50, offset=50)
+        
+        codigos = [r["codigo"] for r in first["results"] + second["results"]]
+        assert first["count"] == len(ACTIVIDADES_ECONOMICAS)
+        assert codigos == sorted(ACTIVIDADES_ECONOMICAS)[:100]
+    
+    def test_keyset_pages(self, client):
+        """after=next_after walks the catalog to the end."""
+        from sifen.catalogs import ACTIVIDADES_ECONOMICAS
+        codigos, after = [], ''
+        while True:
+            page = self._get(client, limit=40, after=after)
+            codigos += [r["codigo"] for r in page["results"]]
+            after = page["next_after"]
+            if after is None:
+                break
+        assert codigos == sorted(ACTIVIDADES_ECONOMICAS)
+    
+    def test_section_filter(self, client):
+        """seccion keeps the codes with that CNAEP prefix."""
+        page = self._get(client, seccion='472', limit=3)
+        
+        assert page["count"] == 6
+        assert [r["codigo"] for r in page["results"]] == ["47211", "47212", "47213"]
+        assert page["next_after"] == "47213"
+        rest = self._get(client, seccion='472', after="47213")
+        assert [r["codigo"] for r in rest["results"]] == ["47214", "47219", "47220"]
+        assert rest["next_after"] is None
+    
+    def test_search_with_section_and_pages(self, client):
+        """q is ranked, combined with seccion and paginated."""
+        page = self._get(client, q='venta al por menor', seccion='475', limit=2)
+        
+        assert page["count"] > 2
+        assert all(r["codigo"].startswith('475') for r in page["results"])
+        rest = self._get(client, q='venta al por menor', seccion='475', after=page["next_after"], limit=100)
+        assert len(page["results"]) + len(rest["results"]) == page["count"]
+    
+    def test_invalid_params(self, client):
+        """Bad limit/offset is a 400."""
+        response = client.get('/api/sifen/catalogs/actividades/', {'limit': 'x'})
+        assert response.status_code == 400
+        assert 'limit' in response.json()
@@ -1,4 +1,6 @@
 """Tests for SIFEN catalogs."""
+import io
+
 import pytest
 from sifen.catalogs import (
     DEPARTAMENTOS, get_departamento,
@@ -8,6 +10,7 @@ from sifen.catalogs import (
     TASAS_IVA, get_tasa_iva,
     UNIDADES_MEDIDA, get_unidad_medida,
 )
+from sifen.catalogs.index import CatalogIndex, fold
 from sifen.catalogs.departamentos import buscar_departamento, get_distrito
 from sifen.catalogs.impuestos import calcular_iva, calcular_iva_desde_base
 from sifen.catalogs.unidades import get_codigo_sifen
@@ -43,6 +46,12 @@ class TestDepartamentos:
         codigo = buscar_departamento("central")
         assert codigo == "11"
     
+    def test_buscar_departamento_accents_and_prefix(self):
+        """buscar_departamento should ignore accents and match word prefixes."""
+        assert buscar_departamento("Itapúa") == "7"
+        assert buscar_departamento("alto parag") == "17"
+        assert buscar_departamento("inexistente") == "11"  # Default: Central
+    
     def test_central_has_districts(self):
         """Central department should have San Lorenzo."""
         central = get_departamento("11")
@@ -74,6 +83,13 @@ class TestActividades:
         assert len(results) > 0
         assert any("farmac" in r["descripcion"].lower() for r in results)
     
+    def test_buscar_actividad_ranked(self):
+        """Every word must match; accents are ignored; codes are searchable."""
+        results = buscar_actividad("VENTA carnes")
+        assert [r["codigo"] for r in results] == ["47212"]
+        assert buscar_actividad("farmaceuticos")[0]["codigo"] == "47720"
+        assert buscar_actividad("4711")[0]["codigo"] == "47111"
+    
     def test_buscar_actividad_short_term(self):
         """buscar_actividad with single char should return empty (min is 2)."""
         results = buscar_actividad("q")  # Single char, function requires min 2
@@ -171,7 +187,219 @@ class TestUnidades:
         codigo = get_codigo_sifen("KG")
         assert codigo == "83"
     
+    def test_get_codigo_sifen_case_and_accents(self):
+        """get_codigo_sifen should ignore case and accents."""
+        assert get_codigo_sifen("kg") == "83"
+        assert get_codigo_sifen("año") == get_codigo_sifen("ANO") == "58"
+    
     def test_get_codigo_sifen_default(self):
         """get_codigo_sifen should return default for unknown."""
         codigo = get_codigo_sifen("UNKNOWN")
         assert codigo == "77"  # Default: Unidad
+
+
+class TestCatalogIndex:
+    """Tests for the catalog search index."""
+    
+    def test_fold(self):
+        """fold should lower-case and strip accents."""
+        assert fold("Kilómetro CÚBICO") == "kilometro cubico"
+    
+    def test_search_ranks_exact_tokens_first(self):
+        """Exact token matches rank before prefix matches, then catalog order."""
+        index = CatalogIndex({
+            "1": ["Metro cuadrado"],
+            "2": ["Metro"],
+            "3": ["Metrónomo"],
+            "4": ["Litro"],
+        })
+        assert index.search("metro") == ["1", "2", "3"]
+        assert index.search("metr") == ["1", "2", "3"]
+        assert index.search("metro cuad") == ["1"]
+        assert index.search("metro", limit=1) == ["1"]
+    
+    def test_search_no_tokens(self):
+        """A query without letters or digits matches nothing."""
+        index = CatalogIndex({"1": ["Metro"]})
+        assert index.search("  ..  ") == []
+        assert index.search("xyz") == []
+
+
+@pytest.fixture
+def catalog_dir(settings, tmp_path):
+    """Empty SIFEN_CATALOG_DIR; catalogs are reloaded before and after."""
+    from sifen.catalogs.store import reload_catalogs
+    settings.SIFEN_CATALOG_DIR = str(tmp_path / "catalogs")
+    reload_catalogs()
+    yield tmp_path / "catalogs"
+    reload_catalogs()
+
+
+class TestCatalogStore:
+    """Tests for catalog data files, packs and update_catalogs."""
+    
+    def test_pack_lookup(self, tmp_path):
+        """A pack finds every row of a key by binary search, in source order."""
+        from sifen.catalogs.store import PackedCatalog, build_pack, write_rows
+        source = str(tmp_path / "distritos.csv")
+        write_rows(source, ["departamento", "codigo", "nombre"], [
+            ("2", "1", "SAN PEDRO"), ("11", "1", "AREGUA"), ("2", "2", "ANTEQUERA"), ("11", "14", "SAN LORENZO"),
+        ])
+        pack = PackedCatalog(data=build_pack("distritos", source))
+        
+        assert len(pack) == 4
+        assert pack.find("11") == [("11", "1", "AREGUA"), ("11", "14", "SAN LORENZO")]
+        assert pack.find("2") == [("2", "1", "SAN PEDRO"), ("2", "2", "ANTEQUERA")]
+        assert pack.find("3") == []
+        assert [row[2] for row in pack] == ["SAN PEDRO", "AREGUA", "ANTEQUERA", "SAN LORENZO"]
+        # Key order: "11" < "2"
+        assert pack.key_range("1") == (0, 2)
+        assert pack.key_range("2") == (2, 4)
+        assert pack.sorted_row(2) == ("2", "1", "SAN PEDRO")
+    
+    def test_lazy_load_from_pack(self, catalog_dir):
+        """Catalogs load on first access from a pack compiled in SIFEN_CATALOG_DIR."""
+        assert ACTIVIDADES_ECONOMICAS._pack is None
+        assert ACTIVIDADES_ECONOMICAS["47111"].startswith("Venta al por menor")
+        assert (catalog_dir / "actividades.pack").exists()
+        assert list(DEPARTAMENTOS)[:2] == ["0", "1"]
+    
+    def test_default_ignores_temp_dir_sources(self, settings, tmp_path, monkeypatch):
+        """Without SIFEN_CATALOG_DIR data files in the temp dir are never read."""
+        import os
+        import tempfile
+        from sifen.catalogs.store import reload_catalogs, write_rows
+        settings.SIFEN_CATALOG_DIR = ""
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        planted = tmp_path / "sifen-catalogs"
+        planted.mkdir()
+        write_rows(str(planted / "actividades.csv"), ["codigo", "descripcion"], [("99999", "Falsa")])
+        reload_catalogs()
+        try:
+            assert "99999" not in ACTIVIDADES_ECONOMICAS
+            private = tmp_path / f"sifen-catalogs-{os.getuid()}"
+            assert (private / "actividades.pack").exists()
+            assert private.stat().st_mode & 0o777 == 0o700
+        finally:
+            reload_catalogs()
+    
+    def test_shared_pack_dir_refused(self, settings, tmp_path, monkeypatch):
+        """A pack dir others can write to is not used; the pack is built in memory."""
+        import os
+        import tempfile
+        from sifen.catalogs.store import reload_catalogs
+        settings.SIFEN_CATALOG_DIR = ""
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        shared = tmp_path / f"sifen-catalogs-{os.getuid()}"
+        shared.mkdir()
+        shared.chmod(0o777)
+        reload_catalogs()
+        try:
+            assert ACTIVIDADES_ECONOMICAS["47111"].startswith("Venta al por menor")
+            assert not (shared / "actividades.pack").exists()
+        finally:
+            reload_catalogs()
+    
+    def test_update_catalogs_command(self, catalog_dir, tmp_path):
+        """update_catalogs imports DNIT CSV/JSON exports and takes precedence."""
+        from django.core.management import call_command
+        from sifen.catalogs.store import catalog_version
+        export = tmp_path / "actividades.csv"
+        export.write_bytes("CODIGO;DESCRIPCIÓN\n01110;Cultivo de cereales\n".encode("latin-1"))
+        unidades = tmp_path / "unidades.json"
+        unidades.write_text('[{"CODIGO_SIFEN": "83", "Codigo": "KG", "Descripcion": "Kilogramo"}]')
+        
+        call_command("update_catalogs", actividades=str(export), unidades=str(unidades),
+                     data_version="2024-06", stdout=io.StringIO())
+        
+        assert catalog_version("actividades") == "2024-06"
+        assert dict(ACTIVIDADES_ECONOMICAS) == {"01110": "Cultivo de cereales"}
+        assert buscar_actividad("cereales")[0]["codigo"] == "01110"
+        assert len(UNIDADES_MEDIDA) == 1 and get_codigo_sifen("kg") == "83"
+        assert len(DEPARTAMENTOS) == 18  # Bundled
+    
+    def test_update_catalogs_rejects_duplicates(self, catalog_dir, tmp_path):
+        """Repeated codes in an export are rejected and nothing is replaced."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        export = tmp_path / "actividades.json"
+        export.write_text('[{"codigo": "1", "descripcion": "A"}, {"codigo": "1", "descripcion": "B"}]')
+        
+        with pytest.raises(CommandError, match="repetido"):
+            call_command("update_catalogs", actividades=str(export), stdout=io.StringIO())
+        assert not (catalog_dir / "actividades.csv").exists()
+    
+    def test_update_catalogs_requires_dir(self, settings, tmp_path):
+        """Imports need SIFEN_CATALOG_DIR (without it only bundled data is read)."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        settings.SIFEN_CATALOG_DIR = ""
+        
+        with pytest.raises(CommandError, match="SIFEN_CATALOG_DIR"):
+            call_command("update_catalogs", actividades=str(tmp_path / "x.csv"), stdout=io.StringIO())
+
+
+class TestGeografia:
+    """Tests for the geographic code resolver."""
+    
+    def test_resolver_ubicacion(self):
+        """Names resolve to catalog codes, ignoring case and accents."""
+        from sifen.catalogs.geografia import resolver_ubicacion
+        ubicacion = resolver_ubicacion("Central", "San Lorenzo", "San Lorenzo")
+        
+        assert (ubicacion.departamento, ubicacion.departamento_nombre) == ("11", "CENTRAL")
+        assert (ubicacion.distrito, ubicacion.distrito_nombre) == ("14", "SAN LORENZO")
+        # No city table bundled: no code, name kept
+        assert (ubicacion.ciudad, ubicacion.ciudad_nombre) == (None, "San Lorenzo")
+        assert ubicacion.resuelta
+    
+    def test_department_aliases_and_districts(self):
+        """Abbreviations, district names and codes find the department."""
+        from sifen.catalogs.geografia import resolver_ubicacion
+        assert resolver_ubicacion("PTE. HAYES").departamento == "15"
+        assert resolver_ubicacion("Asunción", "Asunción").distrito == "1"
+        assert resolver_ubicacion("Asunción").departamento == "0"
+        assert resolver_ubicacion("10").departamento_nombre == "ALTO PARANA"
+        assert resolver_ubicacion("Itapúa", "Encarnacion").distrito_nombre == "ENCARNACION"
+    
+    def test_unknown_district(self):
+        """An unknown district gets no code and keeps its name."""
+        from sifen.catalogs.geografia import resolver_ubicacion
+        ubicacion = resolver_ubicacion("Central", "Barrio Inexistente")
+        assert (ubicacion.distrito, ubicacion.distrito_nombre) == (None, "Barrio Inexistente")
+        assert not ubicacion.resuelta
+    
+    def test_unknown_department_not_guessed(self):
+        """An unknown department is not replaced by CENTRAL."""
+        from sifen.catalogs.geografia import resolver_ubicacion
+        ubicacion = resolver_ubicacion("XYZ", "Foo", "Bar")
+        assert (ubicacion.departamento, ubicacion.distrito, ubicacion.ciudad) == (None, None, None)
+        assert ubicacion.departamento_nombre == "XYZ"
+        assert ubicacion.sin_resolver == ["departamento", "distrito", "ciudad"]
+    
+    def test_cities_from_imported_catalog(self, catalog_dir):
+        """Cities resolve once the DNIT city table is imported."""
+        from sifen.catalogs.geografia import resolver_ubicacion
+        from sifen.catalogs.store import update_catalog
+        update_catalog("ciudades", [("11", "14", "6106", "SAN LORENZO"), ("11", "9", "6101", "LUQUE")], "2024-06")
+        
+        assert resolver_ubicacion("CENTRAL", "SAN LORENZO", "San Lorenzo").ciudad == "6106"
+        # Not in the district: searched in the department
+        assert resolver_ubicacion("CENTRAL", "SAN LORENZO", "Luque").ciudad == "6101"
+        # With a city table the city must resolve too
+        assert not resolver_ubicacion("CENTRAL", "SAN LORENZO", "Inexistente").resuelta
+    
+    @pytest.mark.django_db
+    def test_ubicacion_empresa_cached(self, company):
+        """Company locations are cached until the company is saved."""
+        from sifen.catalogs import geografia
+        geografia.invalidar_ubicaciones()
+        first = geografia.ubicacion_empresa(company)
+        assert geografia.ubicacion_empresa(company) is first
+        assert first.distrito == "14"
+        
+        company.distrito = "LUQUE"
+        company.save()
+        
+        assert company.pk not in geografia._empresas
+        assert geografia.ubicacion_empresa(company).distrito == "9"
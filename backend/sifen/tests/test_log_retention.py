@@ -0,0 +1,105 @@
+"""Tests for SifenLog archiving and retention."""
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from sifen.log_retention import add_months, apply_retention, expired_months, month_start, partition_name
+from sifen.log_sink import log_sifen_call
+from sifen.models import SifenLog, SifenPayload
+
+
+def _at(year, month, day=15):
+    return timezone.make_aware(datetime(year, month, day, 12, 0))
+
+
+def _log(created_at, action="query"):
+    return SifenLog.objects.create(action=action, response_code="0422", created_at=created_at)
+
+
+class TestMonths:
+    """Month arithmetic used for partition bounds."""
+
+    def test_month_boundaries(self):
+        """Months roll over the year and keep the local time zone."""
+        month = month_start(_at(2024, 12, 31))
+        assert (month.year, month.month, month.day, month.hour) == (2024, 12, 1, 0)
+        assert add_months(month, 1).strftime("%Y-%m") == "2025-01"
+        assert add_months(month, -12).strftime("%Y-%m") == "2023-12"
+        assert partition_name(month) == "sifen_sifenlog_2024_12"
+
+
+@pytest.mark.django_db
+class TestRetention:
+    """Expired months are archived to .jsonl.gz and removed."""
+
+    def test_expired_months(self):
+        """Only months before the retention window are returned."""
+        _log(_at(2024, 1))
+        _log(_at(2024, 5))
+        months = expired_months(keep_months=2, now=_at(2024, 6))
+        assert [m.strftime("%Y-%m") for m in months] == ["2024-01", "2024-02", "2024-03"]
+
+    def test_archive_and_drop(self, tmp_path):
+        """Old rows go to one compressed JSONL file per month; recent rows stay."""
+        _log(_at(2024, 1, 3), action="send")
+        _log(_at(2024, 1, 20))
+        _log(_at(2024, 2, 10))
+        recent = _log(_at(2024, 6, 1))
+
+        results = apply_retention(keep_months=1, directory=str(tmp_path), now=_at(2024, 6, 20))
+
+        assert [(r["month"], r["rows"]) for r in results] == [
+            ("2024-01", 2), ("2024-02", 1), ("2024-03", 0), ("2024-04", 0),
+        ]
+        assert list(SifenLog.objects.values_list("pk", flat=True)) == [recent.pk]
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "sifen_log_2024_01.jsonl.gz", "sifen_log_2024_02.jsonl.gz",
+        ]
+
+        with gzip.open(tmp_path / "sifen_log_2024_01.jsonl.gz", "rt", encoding="UTF-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert [row["action"] for row in rows] == ["send", "query"]
+
+    def test_archiving_again_keeps_previous_archive(self, tmp_path):
+        """Late rows of an archived month go to a new file, not over the old one."""
+        _log(_at(2024, 1, 3), action="send")
+        apply_retention(keep_months=1, directory=str(tmp_path), now=_at(2024, 6, 20))
+        _log(_at(2024, 1, 4))
+
+        results = apply_retention(keep_months=1, directory=str(tmp_path), now=_at(2024, 6, 20))
+
+        assert results[0]["path"].endswith("sifen_log_2024_01_2.jsonl.gz")
+        archives = {}
+        for name in ("sifen_log_2024_01.jsonl.gz", "sifen_log_2024_01_2.jsonl.gz"):
+            with gzip.open(tmp_path / name, "rt", encoding="UTF-8") as f:
+                archives[name] = [json.loads(line)["action"] for line in f]
+        assert archives == {
+            "sifen_log_2024_01.jsonl.gz": ["send"],
+            "sifen_log_2024_01_2.jsonl.gz": ["query"],
+        }
+
+    def test_dry_run_keeps_rows(self, tmp_path):
+        """--dry-run only reports."""
+        _log(_at(2020, 1))
+        call_command("archive_sifen_logs", "--keep-months", "1", "--dry-run")
+        assert SifenLog.objects.count() == 1
+
+    def test_archive_includes_full_payloads(self, tmp_path):
+        """Archived rows carry the decompressed XML; unreferenced payloads are purged."""
+        log_sifen_call(action="send", response_code="0260", created_at=_at(2024, 1),
+                       request_full="<rEnviDe>full</rEnviDe>")
+        log_sifen_call(action="send", response_code="0260", created_at=_at(2024, 6),
+                       request_full="<rEnviDe>recent</rEnviDe>")
+        SifenPayload.objects.update(created_at=_at(2024, 1))
+
+        apply_retention(keep_months=1, directory=str(tmp_path), now=_at(2024, 6, 20))
+
+        with gzip.open(tmp_path / "sifen_log_2024_01.jsonl.gz", "rt", encoding="UTF-8") as f:
+            row = json.loads(f.readline())
+        assert row["request_full"] == "<rEnviDe>full</rEnviDe>"
+        assert row["response_full"] is None
+        assert [p.text for p in SifenPayload.objects.all()] == ["<rEnviDe>recent</rEnviDe>"]
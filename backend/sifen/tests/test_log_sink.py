@@ -0,0 +1,146 @@
+"""Tests for the buffered SifenLog writer."""
+import time
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from sifen.log_sink import BufferedLogSink
+from sifen.models import SifenLog, SifenPayload
+
+
+def _fields(n=0):
+    return {"action": "query", "cdc": f"{n:044d}", "response_code": "0422", "duration_ms": 5}
+
+
+@pytest.fixture(autouse=True)
+def buffered(settings):
+    settings.SIFEN_LOG_MODE = "buffered"
+
+
+@pytest.mark.django_db
+class TestBufferedLogSink:
+    """Records are queued and written in bulk."""
+
+    def test_queued_until_flush(self, django_assert_num_queries):
+        """emit() does not touch the database; flush() writes in one INSERT."""
+        sink = BufferedLogSink(buffer_size=100, background=False)
+        called_at = timezone.now()
+
+        with django_assert_num_queries(0):
+            for n in range(5):
+                sink.emit(**_fields(n))
+        assert not SifenLog.objects.exists()
+
+        with django_assert_num_queries(1):
+            assert sink.flush() == 5
+
+        # Stamped when the call was made, not when written
+        log = SifenLog.objects.order_by("cdc").first()
+        assert called_at <= log.created_at < called_at + timedelta(seconds=1)
+        assert sink.stats()["written"] == 5
+
+    def test_full_queue_writes_synchronously(self):
+        """Beyond max_pending records are written immediately."""
+        sink = BufferedLogSink(max_pending=2, background=False)
+        for n in range(3):
+            sink.emit(**_fields(n))
+
+        assert SifenLog.objects.count() == 1
+        assert sink.stats()["pending"] == 2
+        assert sink.stats()["sync_writes"] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_bad_record_is_dropped(self):
+        """A record the database refuses is dropped; the rest of its batch is written."""
+        sink = BufferedLogSink(buffer_size=100, background=False)
+        sink.emit(**_fields(1))
+        sink.emit(**{**_fields(2), "response_code": None})
+        sink.emit(**_fields(3))
+
+        assert sink.flush() == 2
+
+        assert SifenLog.objects.count() == 2
+        stats = sink.stats()
+        assert stats["pending"] == 0
+        assert stats["dropped"] == 1
+
+    def test_sync_mode(self, settings):
+        """SIFEN_LOG_MODE=sync keeps the old inline INSERT."""
+        settings.SIFEN_LOG_MODE = "sync"
+        sink = BufferedLogSink(background=False)
+        sink.emit(**_fields())
+        assert SifenLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestPayloadCapture:
+    """Full XML stored compressed and deduplicated."""
+
+    def test_full_payloads_deduplicated(self):
+        """Equal responses share one SifenPayload; logs keep a short preview."""
+        sink = BufferedLogSink(background=False)
+        response = "<rRetConsDe>" + "<x/>" * 1000 + "</rRetConsDe>"
+        for n in range(3):
+            sink.emit(**_fields(n), request_xml="<req/>", request_full=f"<req n='{n}'/>",
+                      response_xml=response[:20], response_full=response)
+        sink.flush()
+
+        assert SifenPayload.objects.count() == 4
+        log = SifenLog.objects.select_related("response_payload").first()
+        assert log.response_full == response
+        assert len(log.response_payload.data) < len(response)
+
+    def test_truncated_mode(self, settings):
+        """SIFEN_LOG_CAPTURE=truncated keeps only the preview."""
+        settings.SIFEN_LOG_CAPTURE = "truncated"
+        sink = BufferedLogSink(background=False)
+        sink.emit(**_fields(), response_xml="<r/>", response_full="<r>full</r>")
+        sink.flush()
+
+        assert not SifenPayload.objects.exists()
+        assert SifenLog.objects.get().response_full == "<r/>"
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFlushThread:
+    """Background flushing (the thread needs committed data to be visible)."""
+
+    def test_flushes_on_size(self):
+        """The flush thread writes once buffer_size records are queued."""
+        sink = BufferedLogSink(buffer_size=3, flush_interval=60)
+        for n in range(3):
+            sink.emit(**_fields(n))
+
+        deadline = time.time() + 5
+        while SifenLog.objects.count() < 3 and time.time() < deadline:
+            time.sleep(0.02)
+
+        assert SifenLog.objects.count() == 3
+        assert sink.stats()["thread_alive"]
+
+    def test_fork_while_locked(self):
+        """A child forked while the parent holds the sink locks can still emit."""
+        import os
+        sink = BufferedLogSink(background=False)
+        with sink._lock, sink._flush_lock:
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    sink.emit(**_fields())
+                    code = 0 if sink.stats()["pending"] == 1 else 2
+                finally:
+                    os._exit(code)
+
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            time.sleep(0.02)
+        else:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+            pytest.fail("The forked child deadlocked")
+        assert os.WEXITSTATUS(status) == 0
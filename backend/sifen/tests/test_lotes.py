@@ -0,0 +1,222 @@
+"""Tests for the lote (batch) pipeline."""
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from invoicing.models import Invoice
+from sifen.lotes import LoteService, MAX_DES_POR_LOTE
+from sifen.soap_client import SifenSoapClient
+from sifen.testing import StubSifenServer
+
+
+@pytest.fixture
+def queued_invoices(company, establishment):
+    def create(count):
+        return [
+            Invoice.objects.create(
+                company=company,
+                establishment=establishment,
+                numero=n,
+                cdc=f"01800123456001001{n:07d}22024011511234567890",
+                timbrado="12345678",
+                receptor_nombre="Cliente",
+                fecha_emision=datetime(2024, 1, 15, tzinfo=dt_timezone.utc),
+                total=1000,
+                status="queued",
+                xml_signed=f'<rDE><DE Id="01800123456001001{n:07d}22024011511234567890"/></rDE>',
+            )
+            for n in range(1, count + 1)
+        ]
+
+    return create
+
+
+@pytest.fixture
+def stub_server():
+    with StubSifenServer() as server:
+        yield server
+
+
+@pytest.mark.django_db
+class TestLoteService:
+    """Tests for lote submission and polling."""
+
+    def test_only_queued_invoices_are_sent(self, company, queued_invoices, stub_server):
+        """Signed invoices still "pending" wait for an explicit queue action."""
+        queued_invoices(2)
+        Invoice.objects.filter(numero=1).update(status="pending")
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+
+        lotes = service.submit_pending(company)
+
+        assert [lote.document_count for lote in lotes] == [1]
+        assert Invoice.objects.get(numero=1).status == "pending"
+
+    def test_claimed_invoices_are_not_sent_twice(self, company, queued_invoices, stub_server):
+        """A run that lost the claim for every invoice sends nothing."""
+        invoices = queued_invoices(2)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        other, _ = service._claim(company, invoices[:1])
+
+        lote = service.submit(company, invoices)
+
+        assert lote.document_count == 1
+        assert Invoice.objects.get(numero=1).lote == other
+        assert service.submit(company, invoices) is None
+        assert stub_server.request_count == 1
+
+    def test_splits_into_lotes_of_max_size(self, company, queued_invoices, stub_server):
+        """Pending invoices should be packed into lotes of at most 50 DEs."""
+        queued_invoices(MAX_DES_POR_LOTE + 5)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+
+        lotes = service.submit_pending(company)
+
+        assert [lote.document_count for lote in lotes] == [MAX_DES_POR_LOTE, 5]
+        assert all(lote.status == "sent" and lote.protocolo for lote in lotes)
+        assert stub_server.request_count == 2
+        assert Invoice.objects.filter(status="sent").count() == MAX_DES_POR_LOTE + 5
+
+    def test_poll_applies_results(self, company, queued_invoices, stub_server):
+        """A processed lote should update every invoice status."""
+        queued_invoices(3)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+
+        lote = service.poll(lote)
+
+        assert lote.status == "completed"
+        assert set(lote.invoices.values_list("status", flat=True)) == {"approved"}
+
+    def test_poll_backoff_while_processing(self, company, queued_invoices, stub_server):
+        """A lote still in processing should be re-polled later, with backoff."""
+        queued_invoices(1)
+        stub_server.set_lote_status("0361", "Lote en procesamiento")
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+
+        first = service.poll(lote).next_poll_at
+        lote.refresh_from_db()
+        second_delay = service.poll(lote, now=first).next_poll_at - first
+
+        assert lote.status == "sent"
+        assert second_delay > service._backoff(1)
+        assert lote.invoices.get().status == "sent"
+
+    def test_mock_mode_approves(self, company, queued_invoices):
+        """In mock mode lotes complete immediately."""
+        queued_invoices(2)
+        lotes = LoteService(mock_mode=True).submit_pending()
+        assert lotes[0].status == "completed"
+        assert Invoice.objects.filter(status="approved").count() == 2
+
+    def test_extemporaneous_lote_queries_each_cdc(self, company, queued_invoices, stub_server):
+        """On 0364 every DE should be queried by CDC and the ones found approved."""
+        queued_invoices(2)
+        stub_server.set_lote_status("0364", "Consulta extemporánea")
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+
+        lote = service.poll(lote)
+
+        assert lote.status == "failed"
+        paths = [path for path, _ in stub_server.requests]
+        assert paths.count("/de/ws/consulta/cdc.wsdl") == 2
+        assert set(lote.invoices.values_list("status", flat=True)) == {"approved"}
+
+    def test_unknown_lote_returns_missing_invoices_to_queue(self, company, queued_invoices, stub_server):
+        """DEs of an unknown lote that SIFEN does not have should be sent again."""
+        queued_invoices(2)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+        stub_server._server.lotes.clear()
+        stub_server.set_response("/de/ws/consulta/cdc.wsdl", "rEnviConsDeResponse", "0420", "CDC inexistente")
+
+        lote = service.poll(lote)
+
+        assert lote.status == "failed"
+        assert not lote.invoices.exists()
+        assert service.pending_invoices(company).count() == 0  # Backoff
+
+        later = timezone.now() + timedelta(hours=1)
+        assert service.pending_invoices(company, now=later).count() == 2
+        assert [lote.document_count for lote in service.submit_pending(company, now=later)] == [2]
+
+    def test_max_polls_queries_each_cdc(self, company, queued_invoices, stub_server, settings):
+        """A lote still processing after SIFEN_LOTE_MAX_POLLS should be resolved per CDC."""
+        settings.SIFEN_LOTE_MAX_POLLS = 1
+        queued_invoices(1)
+        stub_server.set_lote_status("0361", "Lote en procesamiento")
+        stub_server.set_response("/de/ws/consulta/cdc.wsdl", "rEnviConsDeResponse", "0420", "CDC inexistente")
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+
+        lote = service.poll(lote)
+
+        assert lote.status == "failed"
+        assert lote.next_poll_at is None
+        assert Invoice.objects.get().status == "queued"
+        assert Invoice.objects.get().lote is None
+
+    def test_refused_lote_rejects_invoices(self, company, queued_invoices, stub_server):
+        """A lote SIFEN refuses rejects its DEs instead of resending them."""
+        queued_invoices(2)
+        stub_server.set_response("/de/ws/async/recibe-lote.wsdl", "rResEnviLoteDe", "0301", "Lote no encolado")
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+
+        lote = service.submit_pending(company)[0]
+
+        assert lote.status == "failed"
+        assert set(Invoice.objects.values_list("status", "sifen_response_code")) == {("rejected", "0301")}
+        assert service.submit_pending(company) == []
+
+    def test_transport_failure_resolves_by_cdc(self, company, queued_invoices, stub_server):
+        """A lote whose submission timed out is resolved by CDC, never resent blindly."""
+        queued_invoices(2)
+        stub_server._server.status_code = 503
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+
+        lote = service.submit_pending(company)[0]
+
+        assert lote.status == "sent"
+        assert not lote.protocolo
+        assert set(lote.invoices.values_list("status", flat=True)) == {"sent"}
+        assert service.submit_pending(company) == []
+
+        stub_server._server.status_code = 200
+        lote = service.poll(lote)
+
+        assert lote.status == "failed"
+        paths = [path for path, _ in stub_server.requests]
+        assert paths.count("/de/ws/consulta/cdc.wsdl") == 2
+        assert set(lote.invoices.values_list("status", flat=True)) == {"approved"}
+
+    def test_failed_cdc_query_keeps_invoice_in_lote(self, company, queued_invoices, stub_server, settings):
+        """A DE whose CDC query failed is queried again later, not resent."""
+        settings.SIFEN_LOTE_MAX_POLLS = 1
+        queued_invoices(1)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+        stub_server._server.status_code = 503
+
+        now = timezone.now()
+        lote = service.poll(lote, now=now)
+
+        assert lote.status == "sent"
+        assert lote.next_poll_at > now
+        assert Invoice.objects.get().lote == lote
+        assert Invoice.objects.get().status == "sent"
+
+    def test_invoice_rejected_after_max_submits(self, company, queued_invoices, stub_server, settings):
+        """A DE SIFEN never receives is rejected after SIFEN_LOTE_MAX_SUBMITS lotes."""
+        settings.SIFEN_LOTE_MAX_SUBMITS = 1
+        queued_invoices(1)
+        service = LoteService(client=SifenSoapClient(base_url=stub_server.url), mock_mode=False)
+        lote = service.submit_pending(company)[0]
+        stub_server._server.lotes.clear()
+        stub_server.set_response("/de/ws/consulta/cdc.wsdl", "rEnviConsDeResponse", "0420", "CDC inexistente")
+
+        service.poll(lote)
+
+        invoice = Invoice.objects.get()
+        assert (invoice.status, invoice.sifen_response_code) == ("rejected", "0420")
+        assert service.submit_pending(company, now=timezone.now() + timedelta(hours=1)) == []
@@ -0,0 +1,153 @@
+"""Tests for XML signing and the PKCS#12 key cache."""
+import os
+import pytest
+from lxml import etree
+from sifen import signer as signer_module
+from sifen.signer import (
+    SifenSigner, MockSigner, SignerRegistry, invalidate_key_cache, key_cache_stats,
+)
+from sifen.bulk_signing import sign_many
+from sifen.testing import generate_test_certificate
+
+pytestmark = pytest.mark.skipif(
+    not signer_module.XMLSEC_AVAILABLE, reason="xmlsec not installed"
+)
+
+CDC = "01800123456001001000000012202401151234567890"
+XML = (
+    '<rDE xmlns="http://ekuatia.set.gov.py/sifen/xsd">'
+    f'<dVerFor>150</dVerFor><DE Id="{CDC}"><gOpeDE/></DE></rDE>'
+)
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    invalidate_key_cache()
+    path = generate_test_certificate(str(tmp_path / "test.p12"), "secret")
+    yield path
+    invalidate_key_cache()
+
+
+class TestSifenSigner:
+    """Tests for SifenSigner."""
+
+    def test_sign_string(self, certificate):
+        """Signed XML should contain an XMLDSig signature."""
+        signed = SifenSigner(certificate, "secret").sign_string(XML)
+        assert "SignatureValue" in signed
+        assert f'URI="#{CDC}"' in signed
+
+    def test_key_loaded_once(self, certificate):
+        """The PKCS#12 key should be parsed once and then served from cache."""
+        before = key_cache_stats()
+        signer = SifenSigner(certificate, "secret")
+        for _ in range(3):
+            signer.sign_string(XML)
+        stats = key_cache_stats()
+        assert stats["misses"] - before["misses"] == 1
+        assert stats["hits"] - before["hits"] == 2
+        assert stats["size"] == 1
+
+    def test_rotation_reloads_key(self, certificate):
+        """A certificate file with a new mtime should be loaded again."""
+        signer = SifenSigner(certificate, "secret")
+        signer.sign_string(XML)
+        misses = key_cache_stats()["misses"]
+
+        generate_test_certificate(certificate, "secret")
+        stat = os.stat(certificate)
+        os.utime(certificate, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        signer.sign_string(XML)
+
+        assert key_cache_stats()["misses"] == misses + 1
+        assert key_cache_stats()["size"] == 1
+
+    def test_invalidate(self, certificate):
+        """invalidate_key_cache should drop the cached key."""
+        SifenSigner(certificate, "secret").sign_string(XML)
+        invalidate_key_cache(certificate)
+        assert key_cache_stats()["size"] == 0
+
+
+class TestMockSigner:
+    """Tests for MockSigner."""
+
+    def test_mock_signature(self):
+        element, value = MockSigner().sign(etree.fromstring(XML.encode("UTF-8")))
+        assert value == "MOCK_SIGNATURE_VALUE"
+
+
+@pytest.mark.django_db
+class TestSignerRegistry:
+    """Tests for per-company signer resolution."""
+
+    def test_company_certificate(self, certificate, company, settings):
+        """Companies with certificado_path sign with their own certificate."""
+        settings.SIFEN_CERT_PASSWORDS = {company.ruc: "secret"}
+        company.certificado_path = certificate
+        signer = SignerRegistry().get(company)
+        assert signer.cert_path == certificate
+        assert signer.cert_password == "secret"
+
+    def test_fallback_to_global(self, company, settings):
+        """Companies without certificate use SIFEN_CERT_PATH."""
+        settings.SIFEN_CERT_PATH = "/certs/global.p12"
+        assert SignerRegistry().get(company).cert_path == "/certs/global.p12"
+
+    def test_relative_path(self, company, settings):
+        """Relative certificado_path is resolved against SIFEN_CERT_DIR."""
+        settings.SIFEN_CERT_DIR = "/certs"
+        company.certificado_path = "empresa.p12"
+        assert SignerRegistry().get(company).cert_path == "/certs/empresa.p12"
+
+    def test_certificate_change_keeps_shared_key(self, certificate, company, settings):
+        """Switching one company's certificate should not drop keys other companies use."""
+        settings.SIFEN_CERT_PATH = certificate
+        settings.SIFEN_CERT_PASSWORD = "secret"
+        registry = SignerRegistry()
+        registry.get(company).preload()
+
+        company.certificado_path = "/certs/empresa.p12"
+        registry.get(company)
+
+        assert key_cache_stats()["size"] == 1
+
+    def test_prewarm(self, certificate, company, settings):
+        """prewarm should load keys of active companies."""
+        settings.SIFEN_CERT_PASSWORDS = {company.ruc: "secret"}
+        company.certificado_path = certificate
+        company.save()
+        assert SignerRegistry().prewarm(limit=5) == 1
+        assert key_cache_stats()["size"] == 1
+
+    def test_lru_bound(self, tmp_path, settings):
+        """The key cache should never exceed SIFEN_KEY_CACHE_SIZE."""
+        settings.SIFEN_KEY_CACHE_SIZE = 2
+        invalidate_key_cache()
+        for n in range(3):
+            path = generate_test_certificate(str(tmp_path / f"c{n}.p12"), "secret")
+            SifenSigner(path, "secret").preload()
+        assert key_cache_stats()["size"] == 2
+        invalidate_key_cache()
+
+
+class TestBulkSigning:
+    """Tests for parallel bulk signing."""
+
+    def test_preserves_order(self, certificate):
+        """Results should come back in input order, signed."""
+        documents = [XML.replace(CDC, CDC[:-2] + f"{n:02d}") for n in range(12)]
+        results = sign_many(documents, certificate, "secret", max_workers=2)
+
+        assert [r.index for r in results] == list(range(12))
+        assert all(r.success for r in results)
+        assert all(CDC[:-2] + f"{n:02d}" in r.xml for n, r in enumerate(results))
+        assert all("SignatureValue" in r.xml for r in results)
+
+    def test_reports_failures(self, certificate):
+        """A bad document should fail alone without aborting the run."""
+        documents = [XML] * 9 + ["<rDE><sin-DE/></rDE>"]
+        results = sign_many(documents, certificate, "secret", max_workers=2)
+
+        assert [r.success for r in results] == [True] * 9 + [False]
+        assert "DE" in results[-1].error
@@ -0,0 +1,61 @@
+"""Tests for the DE skeleton cache."""
+import pytest
+
+from sifen.skeletons import get_skeleton, invalidate_skeletons, skeleton_cache_stats
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    invalidate_skeletons()
+    yield
+    invalidate_skeletons()
+
+
+def _emisor_name(skeleton):
+    return skeleton.de.find("gDatGralOpe/gEmis/dNomEmi").text
+
+
+@pytest.mark.django_db
+class TestSkeletonCache:
+    """Skeletons are cached per establishment and rebuilt on changes."""
+
+    def test_reused(self, company, establishment):
+        """The same skeleton should be returned for the same establishment."""
+        before = skeleton_cache_stats()
+        first = get_skeleton(company, establishment)
+        second = get_skeleton(company, establishment)
+
+        after = skeleton_cache_stats()
+        assert first is second
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 1
+
+    def test_company_save_invalidates(self, company, establishment):
+        """Saving the company should rebuild its skeletons."""
+        get_skeleton(company, establishment)
+
+        company.razon_social = "Empresa Renombrada S.A."
+        company.save()
+
+        assert skeleton_cache_stats()["size"] == 0
+        assert _emisor_name(get_skeleton(company, establishment)) == "Empresa Renombrada S.A."
+
+    def test_establishment_save_invalidates(self, company, establishment):
+        """Saving the establishment should rebuild its skeleton."""
+        get_skeleton(company, establishment)
+
+        establishment.codigo_punto = "002"
+        establishment.save()
+
+        skeleton = get_skeleton(company, establishment)
+        assert skeleton.de.find("gTimb/dPunExp").text == "002"
+
+    def test_establishment_changed_elsewhere(self, company, establishment):
+        """Establishment codes changed in another process (no signal here) should rebuild."""
+        get_skeleton(company, establishment)
+
+        establishment.codigo_establecimiento = "002"
+
+        skeleton = get_skeleton(company, establishment)
+        assert skeleton.de.find("gTimb/dEst").text == "002"
+        assert skeleton_cache_stats()["size"] == 1
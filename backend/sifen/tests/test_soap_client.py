@@ -0,0 +1,80 @@
+"""Tests for the SIFEN SOAP clients against a local stub server."""
+import pytest
+from asgiref.sync import async_to_sync
+from sifen.async_client import AsyncSifenSoapClient
+from sifen.models import SifenLog
+from sifen.soap_client import SifenSoapClient
+from sifen.testing import StubSifenServer
+
+CDC = "01800123456001001000000012202401151234567890"
+
+
+@pytest.fixture
+def stub_server():
+    with StubSifenServer() as server:
+        yield server
+
+
+@pytest.mark.django_db
+class TestSifenSoapClient:
+    """Tests for the synchronous client."""
+
+    def test_send_de(self, stub_server):
+        """send_de should parse the SIFEN response."""
+        client = SifenSoapClient(base_url=stub_server.url)
+        response = client.send_de(f'<rDE><DE Id="{CDC}"/></rDE>')
+        assert response.success is True
+        assert response.response_code == "0260"
+        assert response.data["cdc"] == CDC
+
+    def test_logs_request(self, stub_server):
+        """Each request should be logged."""
+        client = SifenSoapClient(base_url=stub_server.url)
+        client.query_cdc(CDC)
+        assert SifenLog.objects.filter(action="query", cdc=CDC).exists()
+
+    def test_http_error(self):
+        """HTTP errors should map to HTTP_<status> responses."""
+        with StubSifenServer(status_code=500) as server:
+            client = SifenSoapClient(base_url=server.url)
+            response = client.query_cdc(CDC)
+        assert response.success is False
+        assert response.response_code == "HTTP_500"
+
+
+@pytest.mark.django_db
+class TestAsyncSifenSoapClient:
+    """Tests for the asyncio client."""
+
+    def test_send_de(self, stub_server):
+        """Async send_de should match the sync client result."""
+        async def run():
+            async with AsyncSifenSoapClient(base_url=stub_server.url) as client:
+                return await client.send_de(f'<rDE><DE Id="{CDC}"/></rDE>')
+
+        response = async_to_sync(run)()
+        assert response.success is True
+        assert response.data["cdc"] == CDC
+
+    def test_query_many_preserves_order(self, stub_server):
+        """query_many should return responses in input order."""
+        cdcs = [CDC[:-2] + str(n).zfill(2) for n in range(12)]
+
+        async def run():
+            async with AsyncSifenSoapClient(base_url=stub_server.url) as client:
+                return await client.query_many(cdcs, concurrency=4)
+
+        responses = async_to_sync(run)()
+        assert [r.data["cdc"] for r in responses] == cdcs
+        assert SifenLog.objects.filter(action="query").count() == len(cdcs)
+
+    def test_concurrency_is_bounded(self):
+        """No more than `concurrency` requests should be in flight."""
+        async def run(url):
+            async with AsyncSifenSoapClient(base_url=url) as client:
+                return await client.query_many([CDC] * 10, concurrency=3)
+
+        with StubSifenServer(delay=0.05) as server:
+            async_to_sync(run)(server.url)
+            assert server.request_count == 10
+            assert 1 < server.max_in_flight <= 3
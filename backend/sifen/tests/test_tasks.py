@@ -0,0 +1,79 @@
+"""Tests for the SIFEN Celery tasks."""
+import pytest
+from invoicing.models import Invoice, InvoiceItem
+from sifen.services import SifenService
+from sifen.tasks import send_invoice_task
+
+
+@pytest.fixture
+def draft_invoice(company, establishment):
+    invoice = Invoice.objects.create(
+        company=company,
+        establishment=establishment,
+        numero=1,
+        timbrado="12345678",
+        receptor_ruc="12345678-9",
+        receptor_nombre="Cliente Test",
+        fecha_emision="2024-01-15T10:30:00Z",
+        total=110000,
+        subtotal_gravado_10=110000,
+    )
+    InvoiceItem.objects.create(
+        invoice=invoice,
+        descripcion="Producto",
+        cantidad=1,
+        precio_unitario=110000,
+    )
+    return invoice
+
+
+@pytest.mark.django_db
+class TestSendInvoiceTask:
+    """send_invoice_task claims the invoice before sending it."""
+
+    def test_sends_claimed_invoice(self, draft_invoice):
+        """A draft invoice is generated and sent once."""
+        result = send_invoice_task(draft_invoice.id)
+
+        draft_invoice.refresh_from_db()
+        assert result["success"]
+        assert draft_invoice.status == "approved"
+
+    def test_skips_invoice_being_sent(self, draft_invoice, monkeypatch):
+        """An invoice another task already claimed is not sent again."""
+        Invoice.objects.filter(pk=draft_invoice.pk).update(status="sending")
+        monkeypatch.setattr(SifenService, "send_to_sifen", lambda *args: pytest.fail("sent twice"))
+
+        result = send_invoice_task(draft_invoice.id)
+
+        assert result["skipped"]
+        assert Invoice.objects.get().status == "sending"
+
+    def test_skips_invoice_taken_while_generating(self, draft_invoice, monkeypatch):
+        """The claim is checked again right before the SOAP call."""
+        generate = SifenService.generate_invoice
+
+        def generate_and_queue(service, invoice):
+            result = generate(service, invoice)
+            Invoice.objects.filter(pk=invoice.pk).update(status="queued")
+            return result
+
+        monkeypatch.setattr(SifenService, "generate_invoice", generate_and_queue)
+        monkeypatch.setattr(SifenService, "send_to_sifen", lambda *args: pytest.fail("sent twice"))
+
+        result = send_invoice_task(draft_invoice.id)
+
+        assert result["skipped"]
+        assert Invoice.objects.get().status == "queued"
+
+    def test_failed_generation_releases_claim(self, draft_invoice, monkeypatch):
+        """An error before sending returns the invoice to its previous status."""
+        def fail(service, invoice):
+            raise RuntimeError("firma")
+
+        monkeypatch.setattr(SifenService, "generate_invoice", fail)
+
+        with pytest.raises(RuntimeError):
+            send_invoice_task(draft_invoice.id)
+
+        assert Invoice.objects.get().status == "draft"
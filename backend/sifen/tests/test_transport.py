@@ -0,0 +1,41 @@
+"""Tests for the pooled SIFEN HTTP transport."""
+import pytest
+from sifen.transport import get_http_client, close_http_client, pool_stats
+from sifen.soap_client import get_soap_client
+
+
+class TestHttpPool:
+    """Tests for the process-wide connection pool."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pool(self):
+        close_http_client()
+        yield
+        close_http_client()
+
+    def test_client_is_reused(self):
+        """Repeated calls should return the same pooled client."""
+        assert get_http_client() is get_http_client()
+
+    def test_client_recreated_after_close(self):
+        """Closing the pool should create a new client on next use."""
+        first = get_http_client()
+        close_http_client()
+        second = get_http_client()
+        assert first is not second
+        assert first.is_closed
+
+    def test_soap_clients_share_pool(self):
+        """SOAP clients should not own their own connections."""
+        get_soap_client()
+        get_soap_client()
+        assert pool_stats()["active"] is False
+
+    def test_pool_stats(self):
+        """pool_stats should report limits and connection counts."""
+        get_http_client()
+        stats = pool_stats()
+        assert stats["active"] is True
+        assert stats["connections_open"] == 0
+        assert stats["max_connections"] > 0
+        assert "requests" in stats
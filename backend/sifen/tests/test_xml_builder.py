@@ -1,4 +1,5 @@
 """Tests for XML builder."""
+import io
 import pytest
 from datetime import datetime
 from lxml import etree
@@ -93,6 +94,56 @@ class TestXMLBuilder:
         assert "12345678" in xml_str  # Receptor RUC
         assert "Cliente Test" in xml_str
     
+    def test_location_codes_from_catalog(self, builder, sample_invoice_data):
+        """Emisor and receptor department/district codes come from the catalogs."""
+        sample_invoice_data.update(
+            emisor_distrito="San Lorenzo",
+            receptor_direccion="Calle 1",
+            receptor_departamento="Alto Paraná",
+            receptor_distrito="Ciudad del Este",
+            receptor_ciudad="Ciudad del Este",
+        )
+        builder.build_de(**sample_invoice_data)
+        root = etree.fromstring(builder.to_string().encode("UTF-8"))
+        ns = "{http://ekuatia.set.gov.py/sifen/xsd}"
+        
+        def text(tag):
+            return root.find(f".//{ns}{tag}").text
+        
+        assert (text("cDepEmi"), text("cDisEmi"), text("dDesDisEmi")) == ("11", "14", "SAN LORENZO")
+        assert (text("cDepRec"), text("dDesDepRec")) == ("10", "ALTO PARANA")
+        assert text("dDesDisRec") == "CIUDAD DEL ESTE"
+        # No city table: the city is left out, not written as code 1
+        assert root.find(f".//{ns}cCiuRec") is None
+        assert root.find(f".//{ns}dEmailRec") is None
+    
+    def test_unresolved_receptor_location_omitted(self, builder, sample_invoice_data):
+        """A receptor location that does not resolve is not written with guessed codes."""
+        sample_invoice_data.update(
+            receptor_direccion="Calle 1",
+            receptor_departamento="XYZ",
+            receptor_distrito="Foo",
+            receptor_ciudad="Bar",
+        )
+        builder.build_de(**sample_invoice_data)
+        xml_str = builder.to_string()
+        
+        assert "Calle 1" in xml_str
+        assert "cDepRec" not in xml_str
+        assert "cDisRec" not in xml_str
+    
+    def test_unresolved_emisor_location_logged(self, builder, sample_invoice_data, caplog):
+        """An unresolved emisor location keeps the default codes and is logged."""
+        sample_invoice_data.update(emisor_departamento="XYZ", emisor_distrito="Foo")
+        with caplog.at_level("WARNING", logger="sifen.xml_builder"):
+            builder.build_de(**sample_invoice_data)
+        root = etree.fromstring(builder.to_string().encode("UTF-8"))
+        ns = "{http://ekuatia.set.gov.py/sifen/xsd}"
+        
+        assert root.find(f".//{ns}cDepEmi").text == "11"
+        assert root.find(f".//{ns}cDisEmi").text == "1"
+        assert "'XYZ'" in caplog.text
+    
     def test_has_items(self, builder, sample_invoice_data):
         """XML should have item data."""
         result = builder.build_de(**sample_invoice_data)
@@ -164,3 +215,43 @@ class TestXMLBuilder:
         
         # Should have B2C operation type
         assert "iTiOpe" in xml_str
+    
+    def test_stream_matches_compact(self, builder, sample_invoice_data):
+        """Streamed output should equal the compact serialization."""
+        builder.build_de(**sample_invoice_data)
+        expected = builder.to_string(pretty=False)
+        
+        output = io.BytesIO()
+        result = SifenXMLBuilder().build_de(output=output, **sample_invoice_data)
+        
+        assert result is None
+        assert output.getvalue().decode("UTF-8") == expected
+    
+    def test_stream_items_from_generator(self, builder, sample_invoice_data):
+        """Streaming should consume items lazily from a generator."""
+        item = sample_invoice_data["items"][0]
+        sample_invoice_data["items"] = (
+            dict(item, codigo=f"PROD{n:04d}") for n in range(500)
+        )
+        
+        output = io.BytesIO()
+        builder.build_de(output=output, **sample_invoice_data)
+        root = etree.fromstring(output.getvalue())
+        
+        items = root.findall(".//{http://ekuatia.set.gov.py/sifen/xsd}gCamItem")
+        assert len(items) == 500
+        assert root.find(".//{http://ekuatia.set.gov.py/sifen/xsd}gTotSub") is not None
+    
+    def test_skeleton_matches_full_build(self, builder, sample_invoice_data):
+        """Building from a skeleton should produce the same document."""
+        builder.build_de(**sample_invoice_data)
+        expected = builder.to_string()
+        
+        emisor = {k: v for k, v in sample_invoice_data.items()
+                  if k.startswith("emisor_") and k not in ("emisor_timbrado", "emisor_numero")}
+        skeleton = builder.build_skeleton(**emisor)
+        
+        for _ in range(2):  # the skeleton itself must stay untouched
+            other = SifenXMLBuilder()
+            other.build_de(skeleton=skeleton, **sample_invoice_data)
+            assert other.to_string() == expected
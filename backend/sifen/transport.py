@@ -0,0 +1,177 @@
+"""
+Shared HTTP transport for SIFEN web services.
+
+Every SOAP call used to open its own ``httpx.Client``, paying a fresh TCP +
+TLS handshake per document. This module keeps one long-lived, keep-alive
+connection pool per process (per gunicorn/celery worker) that all
+``SifenSoapClient`` instances reuse.
+
+Settings:
+- SIFEN_HTTP_MAX_CONNECTIONS: max open connections per worker
+- SIFEN_HTTP_MAX_KEEPALIVE: max idle keep-alive connections per worker
+- SIFEN_HTTP_KEEPALIVE_EXPIRY: seconds an idle connection is kept open
+- SIFEN_HTTP2: negotiate HTTP/2 when the ``h2`` package is installed
+- SIFEN_TLS_CERT / SIFEN_TLS_KEY: client certificate (PEM) for mutual TLS
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Optional, Dict, Any
+
+import httpx
+from django.conf import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_client_pid: Optional[int] = None
+_created_at: Optional[float] = None
+_stats = {
+    "requests": 0,
+    "responses": 0,
+    "errors": 0,
+    "clients_created": 0,
+}
+
+
+def _on_request(request: httpx.Request):
+    with _lock:
+        _stats["requests"] += 1
+
+
+def _on_response(response: httpx.Response):
+    with _lock:
+        _stats["responses"] += 1
+
+
+def record_error():
+    """Count a transport-level failure (timeout, connection error...)."""
+    with _lock:
+        _stats["errors"] += 1
+
+
+def get_limits() -> httpx.Limits:
+    """Connection pool limits for this worker."""
+    return httpx.Limits(
+        max_connections=settings.SIFEN_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SIFEN_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SIFEN_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client_options(timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Keyword arguments shared by the sync and async httpx clients.
+
+    Args:
+        timeout: Default request timeout in seconds
+
+    Returns:
+        Dict of httpx client options
+    """
+    options = {
+        "timeout": timeout,
+        "limits": get_limits(),
+        "http2": settings.SIFEN_HTTP2 and HTTP2_AVAILABLE,
+    }
+
+    if settings.SIFEN_TLS_CERT:
+        options["cert"] = (
+            (settings.SIFEN_TLS_CERT, settings.SIFEN_TLS_KEY)
+            if settings.SIFEN_TLS_KEY else settings.SIFEN_TLS_CERT
+        )
+
+    return options
+
+
+def get_http_client(timeout: float = 30.0) -> httpx.Client:
+    """
+    Get the process-wide pooled HTTP client.
+
+    The client is recreated after a fork so workers never share sockets
+    with their parent process.
+
+    Args:
+        timeout: Default request timeout (only used when creating the pool)
+
+    Returns:
+        Shared httpx.Client
+    """
+    global _client, _client_pid, _created_at
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid and not _client.is_closed:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid or _client.is_closed:
+            _client = httpx.Client(
+                event_hooks={
+                    "request": [_on_request],
+                    "response": [_on_response],
+                },
+                **get_client_options(timeout),
+            )
+            _client_pid = pid
+            _created_at = time.time()
+            _stats["clients_created"] += 1
+        return _client
+
+
+def close_http_client():
+    """Close the pooled client (worker shutdown, tests)."""
+    global _client, _client_pid, _created_at
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _created_at = None
+
+
+atexit.register(close_http_client)
+
+
+def _pool_connections(client: Optional[httpx.Client]) -> list:
+    """Best-effort access to the underlying httpcore connections."""
+    if client is None:
+        return []
+    transport = getattr(client, "_transport", None)
+    pool = getattr(transport, "_pool", None)
+    return list(getattr(pool, "connections", []) or [])
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Health metrics of this worker's connection pool.
+
+    Returns:
+        Dict with request counters and open/idle connection counts
+    """
+    connections = _pool_connections(_client if _client_pid == os.getpid() else None)
+    idle = sum(1 for conn in connections if conn.is_idle())
+    limits = get_limits()
+
+    with _lock:
+        stats = dict(_stats)
+
+    stats.update({
+        "pid": os.getpid(),
+        "active": _client is not None and _client_pid == os.getpid(),
+        "http2": settings.SIFEN_HTTP2 and HTTP2_AVAILABLE,
+        "uptime_s": int(time.time() - _created_at) if _created_at else 0,
+        "connections_open": len(connections),
+        "connections_idle": idle,
+        "connections_in_use": len(connections) - idle,
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+    })
+    return stats
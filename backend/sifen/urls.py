@@ -6,6 +6,7 @@ urlpatterns = [
     # Status and validation
     path('status/', views.sifen_status, name='sifen-status'),
     path('validate-cdc/<str:cdc>/', views.validate_cdc_view, name='validate-cdc'),
+    path('tasks/<str:task_id>/', views.task_status, name='sifen-task-status'),
     
     # Catalogs
     path('catalogs/departamentos/', catalog_views.departamentos_list, name='departamentos-list'),
@@ -1,9 +1,14 @@
 """SIFEN views."""
+from celery.result import AsyncResult
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .cdc import validate_cdc
+from .log_sink import log_sink_stats
+from .signer import key_cache_stats
+from .skeletons import skeleton_cache_stats
+from .transport import pool_stats
 
 
 @api_view(['GET'])
@@ -15,6 +20,10 @@ def sifen_status(request):
         'api_url': settings.SIFEN_API_URL,
         'certificate_configured': bool(settings.SIFEN_CERT_PATH),
         'status': 'configured' if settings.SIFEN_CERT_PATH else 'pending_certificate',
+        'http_pool': pool_stats(),
+        'signer_key_cache': key_cache_stats(),
+        'de_skeleton_cache': skeleton_cache_stats(),
+        'log_buffer': log_sink_stats(),
     })
 
 
@@ -45,3 +54,23 @@ def validate_cdc_view(request, cdc: str):
         }
     
     return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def task_status(request, task_id: str):
+    """Status of a background SIFEN task (generate/send)."""
+    result = AsyncResult(task_id)
+    
+    data = {
+        'task_id': task_id,
+        'state': result.state,
+        'ready': result.ready(),
+    }
+    
+    if result.successful():
+        data['result'] = result.result
+    elif result.failed():
+        data['error'] = str(result.result)
+    
+    return Response(data)
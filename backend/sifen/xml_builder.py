@@ -2,13 +2,21 @@
 XML Builder for SIFEN Documents.
 Based on Manual Técnico v150.
 
-Generates the DE (Documento Electrónico) XML structure.
+Generates the DE (Documento Electrónico) XML structure, either as an lxml
+tree (for signing) or streamed with etree.xmlfile so item-heavy documents
+never hold every gCamItem in memory.
 """
+from copy import deepcopy
 from datetime import datetime
+import logging
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, Iterable, Union, BinaryIO
 from lxml import etree
 
+from .catalogs.geografia import EMISOR_POR_DEFECTO, Ubicacion, resolver_ubicacion
+
+logger = logging.getLogger(__name__)
+
 # SIFEN Namespace
 SIFEN_NS = "http://ekuatia.set.gov.py/sifen/xsd"
 NSMAP = {None: SIFEN_NS}
@@ -51,6 +59,9 @@ class SifenXMLBuilder:
         receptor_email: str = "",
         receptor_tipo_doc: int = 1,  # 1=CI, 2=Pasaporte, etc.
         receptor_num_doc: str = "",
+        receptor_departamento: str = "",
+        receptor_distrito: str = "",
+        receptor_ciudad: str = "",
         
         # Totals
         moneda: str = "PYG",
@@ -65,49 +76,187 @@ class SifenXMLBuilder:
         total: Decimal = Decimal("0"),
         
         # Items
-        items: Optional[list] = None,
+        items: Optional[Iterable[dict]] = None,
         
         # Optional
         tipo_emision: int = 1,  # 1=Normal, 2=Contingencia
-    ) -> etree._Element:
+        
+        # Precompiled emisor part (see build_skeleton)
+        skeleton: Optional["DESkeleton"] = None,
+        
+        # Streaming
+        output: Union[str, BinaryIO, None] = None,
+    ) -> Optional[etree._Element]:
         """
         Build the complete DE XML structure.
         
+        With a ``skeleton`` (usually cached per establishment) the emisor
+        groups are deep-copied from it and only the per-invoice fields are
+        set; the emisor_* arguments other than timbrado and numero are then
+        ignored.
+        
+        With ``output`` (a path or binary file object) the document is
+        streamed there instead: items may be any iterable, including a
+        generator, and each gCamItem is serialized and discarded as soon as
+        it is built. The bytes are identical to ``to_string(pretty=False)``.
+        
         Returns:
-            lxml Element ready for signing.
+            lxml Element ready for signing, or None when streaming.
         """
-        items = items or []
+        items = items if items is not None else []
+        
+        values = self._skeleton_values(
+            cdc=cdc,
+            tipo_de=tipo_de,
+            fecha_emision=fecha_emision,
+            timbrado=emisor_timbrado,
+            numero=emisor_numero,
+            moneda=moneda,
+            tipo_emision=tipo_emision,
+        )
+        if skeleton is None:
+            # One-off skeleton: fill it in place instead of copying
+            skeleton = self.build_skeleton(
+                emisor_ruc=emisor_ruc,
+                emisor_razon_social=emisor_razon_social,
+                emisor_nombre_fantasia=emisor_nombre_fantasia,
+                emisor_actividad=emisor_actividad,
+                emisor_establecimiento=emisor_establecimiento,
+                emisor_punto=emisor_punto,
+                emisor_direccion=emisor_direccion,
+                emisor_departamento=emisor_departamento,
+                emisor_distrito=emisor_distrito,
+                emisor_ciudad=emisor_ciudad,
+                emisor_telefono=emisor_telefono,
+                emisor_email=emisor_email,
+            )
+            de = skeleton.fill(values, copy=False)
+        else:
+            de = skeleton.fill(values)
+        de.set("Id", cdc)  # CDC as XML ID for signing
         
-        # Root element: rDE (Raíz Documento Electrónico)
-        self.root = etree.Element("rDE", nsmap=NSMAP)
+        if output is None:
+            # Root element: rDE (Raíz Documento Electrónico)
+            self.root = etree.Element("rDE", nsmap=NSMAP)
+            
+            # dVerFor - Versión del formato
+            etree.SubElement(self.root, "dVerFor").text = "150"
+            
+            # DE - Documento Electrónico
+            self.root.append(de)
+        else:
+            # Detached DE holding only the header groups until streamed
+            self.root = None
         
-        # dVerFor - Versión del formato
-        etree.SubElement(self.root, "dVerFor").text = "150"
+        g_dat_gral = de.find("gDatGralOpe")
         
-        # DE - Documento Electrónico
-        de = etree.SubElement(self.root, "DE")
-        de.set("Id", cdc)  # CDC as XML ID for signing
+        # gDatRec - Datos del receptor
+        g_dat_rec = etree.SubElement(g_dat_gral, "gDatRec")
+        etree.SubElement(g_dat_rec, "iNatRec").text = "1" if receptor_contribuyente else "2"
+        
+        if receptor_contribuyente and receptor_ruc:
+            rec_ruc_parts = receptor_ruc.split("-")
+            etree.SubElement(g_dat_rec, "iTiOpe").text = "1"  # B2B
+            etree.SubElement(g_dat_rec, "dRucRec").text = rec_ruc_parts[0]
+            etree.SubElement(g_dat_rec, "dDVRec").text = rec_ruc_parts[1]
+        else:
+            etree.SubElement(g_dat_rec, "iTiOpe").text = "2"  # B2C
+            if receptor_num_doc:
+                etree.SubElement(g_dat_rec, "iTipIDRec").text = str(receptor_tipo_doc)
+                etree.SubElement(g_dat_rec, "dNumIDRec").text = receptor_num_doc
+        
+        etree.SubElement(g_dat_rec, "dNomRec").text = receptor_razon_social or "Sin Nombre"
+        if receptor_direccion:
+            etree.SubElement(g_dat_rec, "dDirRec").text = receptor_direccion
+            if receptor_departamento:
+                ubicacion = resolver_ubicacion(receptor_departamento, receptor_distrito, receptor_ciudad)
+                # Optional for the receptor: never written with guessed codes
+                if ubicacion.resuelta:
+                    self._add_ubicacion(g_dat_rec, ubicacion, "Rec")
+        if receptor_email:
+            etree.SubElement(g_dat_rec, "dEmailRec").text = receptor_email
+        
+        # gDtipDE - Datos específicos por tipo de DE
+        g_dtip_de = etree.SubElement(de, "gDtipDE")
+        
+        # gCamFE - Campos de Factura Electrónica
+        if tipo_de in [1, 2, 3]:  # Facturas
+            g_cam_fe = etree.SubElement(g_dtip_de, "gCamFE")
+            etree.SubElement(g_cam_fe, "iIndPres").text = "1"  # Presencial
+            etree.SubElement(g_cam_fe, "dDesIndPres").text = "Operación presencial"
+        
+        # gTotSub - Subtotales
+        g_tot_sub = self._build_totals(
+            total_exento=total_exento,
+            total_iva_5=total_iva_5,
+            total_iva_10=total_iva_10,
+            total_descuento=total_descuento,
+            total=total,
+        )
+        
+        if output is not None:
+            self._write_de(output, de, items, g_tot_sub)
+            return None
+        
+        # gCamItem - Items
+        for idx, item in enumerate(items, 1):
+            self._add_item(de, idx, item)
+        
+        de.append(g_tot_sub)
+        return self.root
+    
+    def build_skeleton(
+        self,
+        emisor_ruc: str,
+        emisor_razon_social: str,
+        emisor_nombre_fantasia: str,
+        emisor_actividad: str,
+        emisor_establecimiento: str,
+        emisor_punto: str,
+        emisor_direccion: str,
+        emisor_departamento: str,
+        emisor_distrito: str,
+        emisor_ciudad: str,
+        emisor_telefono: str = "",
+        emisor_email: str = "",
+        emisor_ubicacion: Optional[Ubicacion] = None,
+    ) -> "DESkeleton":
+        """
+        Build the emisor/establishment part of a DE.
+        
+        Contains gOpeDE, gTimb and gDatGralOpe (gOpeCom, gEmis, gActEco)
+        with empty per-invoice fields; see DESkeleton.SLOTS.
+        
+        The department/district/city codes come from ``emisor_ubicacion``
+        (see catalogs.geografia.ubicacion_empresa) or are resolved from
+        the emisor_* names; unresolved ones are logged and written with
+        EMISOR_POR_DEFECTO.
+        
+        Returns:
+            DESkeleton to pass to build_de
+        """
+        de = etree.Element("DE")
         
         # gOpeDE - Datos de la operación
         g_ope_de = etree.SubElement(de, "gOpeDE")
-        etree.SubElement(g_ope_de, "iTipEmi").text = str(tipo_emision)
-        etree.SubElement(g_ope_de, "dDesTipEmi").text = "Normal" if tipo_emision == 1 else "Contingencia"
-        etree.SubElement(g_ope_de, "dCodSeg").text = cdc[34:43]  # Security code from CDC
+        etree.SubElement(g_ope_de, "iTipEmi")
+        etree.SubElement(g_ope_de, "dDesTipEmi")
+        etree.SubElement(g_ope_de, "dCodSeg")  # Security code from CDC
         etree.SubElement(g_ope_de, "dInfoEmi").text = "1"  # Info del emisor
         
         # gTimb - Datos del timbrado
         g_timb = etree.SubElement(de, "gTimb")
-        etree.SubElement(g_timb, "iTiDE").text = str(tipo_de)
-        etree.SubElement(g_timb, "dDesTiDE").text = self._get_tipo_de_desc(tipo_de)
-        etree.SubElement(g_timb, "dNumTim").text = emisor_timbrado
+        etree.SubElement(g_timb, "iTiDE")
+        etree.SubElement(g_timb, "dDesTiDE")
+        etree.SubElement(g_timb, "dNumTim")
         etree.SubElement(g_timb, "dEst").text = emisor_establecimiento
         etree.SubElement(g_timb, "dPunExp").text = emisor_punto
-        etree.SubElement(g_timb, "dNumDoc").text = str(emisor_numero).zfill(7)
+        etree.SubElement(g_timb, "dNumDoc")
         etree.SubElement(g_timb, "dFeIniT").text = "2024-01-01"  # TODO: from company
         
         # gDatGralOpe - Datos generales de la operación
         g_dat_gral = etree.SubElement(de, "gDatGralOpe")
-        etree.SubElement(g_dat_gral, "dFeEmiDE").text = fecha_emision.strftime("%Y-%m-%dT%H:%M:%S")
+        etree.SubElement(g_dat_gral, "dFeEmiDE")
         
         # gOpeCom - Operación comercial
         g_ope_com = etree.SubElement(g_dat_gral, "gOpeCom")
@@ -115,8 +264,8 @@ class SifenXMLBuilder:
         etree.SubElement(g_ope_com, "dDesTipTra").text = "Venta de mercadería"
         etree.SubElement(g_ope_com, "iTImp").text = "1"  # 1=IVA
         etree.SubElement(g_ope_com, "dDesTImp").text = "IVA"
-        etree.SubElement(g_ope_com, "cMoneOpe").text = moneda
-        etree.SubElement(g_ope_com, "dDesMoneOpe").text = "Guarani" if moneda == "PYG" else moneda
+        etree.SubElement(g_ope_com, "cMoneOpe")
+        etree.SubElement(g_ope_com, "dDesMoneOpe")
         
         # gEmis - Datos del emisor
         g_emis = etree.SubElement(g_dat_gral, "gEmis")
@@ -129,12 +278,14 @@ class SifenXMLBuilder:
             etree.SubElement(g_emis, "dNomFanEmi").text = emisor_nombre_fantasia
         etree.SubElement(g_emis, "dDirEmi").text = emisor_direccion
         etree.SubElement(g_emis, "dNumCas").text = "0"
-        etree.SubElement(g_emis, "cDepEmi").text = self._get_depto_code(emisor_departamento)
-        etree.SubElement(g_emis, "dDesDepEmi").text = emisor_departamento
-        etree.SubElement(g_emis, "cDisEmi").text = "1"  # TODO: from catalog
-        etree.SubElement(g_emis, "dDesDisEmi").text = emisor_distrito
-        etree.SubElement(g_emis, "cCiuEmi").text = "1"  # TODO: from catalog
-        etree.SubElement(g_emis, "dDesCiuEmi").text = emisor_ciudad
+        ubicacion = emisor_ubicacion or resolver_ubicacion(emisor_departamento, emisor_distrito, emisor_ciudad)
+        if ubicacion.sin_resolver:
+            logger.warning(
+                "Ubicación del emisor %s sin código de catálogo (%s): se usan los códigos por defecto",
+                emisor_ruc,
+                ", ".join(f"{parte} {getattr(ubicacion, parte + '_nombre')!r}" for parte in ubicacion.sin_resolver),
+            )
+        self._add_ubicacion(g_emis, ubicacion, "Emi", defaults=EMISOR_POR_DEFECTO)
         if emisor_telefono:
             etree.SubElement(g_emis, "dTelEmi").text = emisor_telefono
         if emisor_email:
@@ -145,42 +296,42 @@ class SifenXMLBuilder:
         etree.SubElement(g_act_eco, "cActEco").text = emisor_actividad
         etree.SubElement(g_act_eco, "dDesActEco").text = "Actividad principal"
         
-        # gDatRec - Datos del receptor
-        g_dat_rec = etree.SubElement(g_dat_gral, "gDatRec")
-        etree.SubElement(g_dat_rec, "iNatRec").text = "1" if receptor_contribuyente else "2"
-        
-        if receptor_contribuyente and receptor_ruc:
-            rec_ruc_parts = receptor_ruc.split("-")
-            etree.SubElement(g_dat_rec, "iTiOpe").text = "1"  # B2B
-            etree.SubElement(g_dat_rec, "dRucRec").text = rec_ruc_parts[0]
-            etree.SubElement(g_dat_rec, "dDVRec").text = rec_ruc_parts[1]
-        else:
-            etree.SubElement(g_dat_rec, "iTiOpe").text = "2"  # B2C
-            if receptor_num_doc:
-                etree.SubElement(g_dat_rec, "iTipIDRec").text = str(receptor_tipo_doc)
-                etree.SubElement(g_dat_rec, "dNumIDRec").text = receptor_num_doc
-        
-        etree.SubElement(g_dat_rec, "dNomRec").text = receptor_razon_social or "Sin Nombre"
-        if receptor_direccion:
-            etree.SubElement(g_dat_rec, "dDirRec").text = receptor_direccion
-        if receptor_email:
-            etree.SubElement(g_dat_rec, "dEmailRec").text = receptor_email
-        
-        # gDtipDE - Datos específicos por tipo de DE
-        g_dtip_de = etree.SubElement(de, "gDtipDE")
-        
-        # gCamFE - Campos de Factura Electrónica
-        if tipo_de in [1, 2, 3]:  # Facturas
-            g_cam_fe = etree.SubElement(g_dtip_de, "gCamFE")
-            etree.SubElement(g_cam_fe, "iIndPres").text = "1"  # Presencial
-            etree.SubElement(g_cam_fe, "dDesIndPres").text = "Operación presencial"
-        
-        # gCamItem - Items
-        for idx, item in enumerate(items, 1):
-            self._add_item(de, idx, item)
-        
-        # gTotSub - Subtotales
-        g_tot_sub = etree.SubElement(de, "gTotSub")
+        return DESkeleton(de)
+    
+    def _skeleton_values(
+        self,
+        cdc: str,
+        tipo_de: int,
+        fecha_emision: datetime,
+        timbrado: str,
+        numero: int,
+        moneda: str,
+        tipo_emision: int,
+    ) -> dict:
+        """Per-invoice values of the skeleton slots."""
+        return {
+            "iTipEmi": str(tipo_emision),
+            "dDesTipEmi": "Normal" if tipo_emision == 1 else "Contingencia",
+            "dCodSeg": cdc[34:43],
+            "iTiDE": str(tipo_de),
+            "dDesTiDE": self._get_tipo_de_desc(tipo_de),
+            "dNumTim": timbrado,
+            "dNumDoc": str(numero).zfill(7),
+            "dFeEmiDE": fecha_emision.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cMoneOpe": moneda,
+            "dDesMoneOpe": "Guarani" if moneda == "PYG" else moneda,
+        }
+    
+    def _build_totals(
+        self,
+        total_exento: Decimal,
+        total_iva_5: Decimal,
+        total_iva_10: Decimal,
+        total_descuento: Decimal,
+        total: Decimal,
+    ) -> etree._Element:
+        """Build the gTotSub group."""
+        g_tot_sub = etree.Element("gTotSub")
         etree.SubElement(g_tot_sub, "dSubExe").text = str(total_exento)
         etree.SubElement(g_tot_sub, "dSub5").text = str(total_iva_5)
         etree.SubElement(g_tot_sub, "dSub10").text = str(total_iva_10)
@@ -204,11 +355,37 @@ class SifenXMLBuilder:
                 self._calc_iva(total_iva_5, 5) + self._calc_iva(total_iva_10, 10)
             )
         
-        return self.root
+        return g_tot_sub
+    
+    def _write_de(
+        self,
+        output: Union[str, BinaryIO],
+        de: etree._Element,
+        items: Iterable[dict],
+        g_tot_sub: etree._Element,
+    ):
+        """Stream rDE to output: header groups, items one by one, totals."""
+        with etree.xmlfile(output, encoding="UTF-8") as xf:
+            xf.write_declaration()
+            with xf.element("rDE", nsmap=NSMAP):
+                ver_for = etree.Element("dVerFor")
+                ver_for.text = "150"
+                xf.write(ver_for)
+                
+                with xf.element("DE", Id=de.get("Id")):
+                    for group in de:
+                        xf.write(group)
+                    for idx, item in enumerate(items, 1):
+                        xf.write(self._build_item(idx, item))
+                    xf.write(g_tot_sub)
     
     def _add_item(self, parent: etree._Element, index: int, item: dict):
         """Add an item to the XML."""
-        g_cam_item = etree.SubElement(parent, "gCamItem")
+        parent.append(self._build_item(index, item))
+    
+    def _build_item(self, index: int, item: dict) -> etree._Element:
+        """Build a gCamItem element."""
+        g_cam_item = etree.Element("gCamItem")
         etree.SubElement(g_cam_item, "dCodInt").text = item.get("codigo", str(index))
         
         # gValorItem
@@ -239,6 +416,27 @@ class SifenXMLBuilder:
             item["subtotal"] - item.get("iva", 0)
         )
         etree.SubElement(g_cam_iva, "dLiqIVAItem").text = str(item.get("iva", 0))
+        
+        return g_cam_item
+    
+    def _add_ubicacion(
+        self,
+        parent: etree._Element,
+        ubicacion: Ubicacion,
+        suffix: str,
+        defaults: Optional[dict] = None,
+    ):
+        """
+        Add the department/district/city codes and names (suffix "Emi" or "Rec").
+        
+        Unresolved parts get the code in ``defaults``, or are left out.
+        """
+        for parte, tag in (("departamento", "Dep"), ("distrito", "Dis"), ("ciudad", "Ciu")):
+            codigo = getattr(ubicacion, parte) or (defaults or {}).get(parte)
+            if codigo is None:
+                continue
+            etree.SubElement(parent, f"c{tag}{suffix}").text = codigo
+            etree.SubElement(parent, f"dDes{tag}{suffix}").text = getattr(ubicacion, f"{parte}_nombre")
     
     def _get_tipo_de_desc(self, tipo: int) -> str:
         """Get document type description."""
@@ -253,32 +451,6 @@ class SifenXMLBuilder:
         }
         return tipos.get(tipo, "Factura electrónica")
     
-    def _get_depto_code(self, depto: str) -> str:
-        """Get department code."""
-        # Simplified - should use full catalog
-        deptos = {
-            "CAPITAL": "0",
-            "ASUNCION": "0", 
-            "CONCEPCION": "1",
-            "SAN PEDRO": "2",
-            "CORDILLERA": "3",
-            "GUAIRA": "4",
-            "CAAGUAZU": "5",
-            "CAAZAPA": "6",
-            "ITAPUA": "7",
-            "MISIONES": "8",
-            "PARAGUARI": "9",
-            "ALTO PARANA": "10",
-            "CENTRAL": "11",
-            "ÑEEMBUCU": "12",
-            "AMAMBAY": "13",
-            "CANINDEYU": "14",
-            "PTE. HAYES": "15",
-            "BOQUERON": "16",
-            "ALTO PARAGUAY": "17",
-        }
-        return deptos.get(depto.upper(), "11")  # Default Central
-    
     def _calc_iva(self, base: Decimal, tasa: int) -> Decimal:
         """Calculate IVA from base (IVA included)."""
         if tasa == 0:
@@ -293,3 +465,51 @@ class SifenXMLBuilder:
             xml_declaration=True,
             pretty_print=pretty
         ).decode("UTF-8")
+
+
+class DESkeleton:
+    """
+    Precompiled emisor/establishment part of a DE.
+    
+    Holds a detached DE element whose per-invoice fields (SLOTS) are empty.
+    The position of every slot is resolved once, so filling a deep copy
+    does not search the tree.
+    """
+    
+    SLOTS = (
+        "iTipEmi", "dDesTipEmi", "dCodSeg",
+        "iTiDE", "dDesTiDE", "dNumTim", "dNumDoc",
+        "dFeEmiDE", "cMoneOpe", "dDesMoneOpe",
+    )
+    
+    def __init__(self, de: etree._Element):
+        self.de = de
+        self._paths = {}
+        for element in de.iter():
+            if element.tag in self.SLOTS:
+                path = []
+                node = element
+                while node is not de:
+                    parent = node.getparent()
+                    path.append(parent.index(node))
+                    node = parent
+                self._paths[element.tag] = tuple(reversed(path))
+    
+    def fill(self, values: dict, copy: bool = True) -> etree._Element:
+        """
+        Return a DE element with the slots set.
+        
+        Args:
+            values: Slot name -> text
+            copy: Fill a deep copy (False only for one-off skeletons)
+        
+        Returns:
+            Detached DE element
+        """
+        de = deepcopy(self.de) if copy else self.de
+        for name, path in self._paths.items():
+            element = de
+            for index in path:
+                element = element[index]
+            element.text = values[name]
+        return de
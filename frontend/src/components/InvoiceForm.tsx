@@ -70,12 +70,9 @@ export default function InvoiceForm({ onClose, onSuccess }: Props) {
 
   const onSubmit = async (data: InvoiceFormData) => {
     try {
-      // Get next invoice number (simplified - should come from backend)
-      const numero = Math.floor(Math.random() * 1000000) + 1
-      
+      // numero is assigned by the backend sequence
       const invoiceData = {
         ...data,
-        numero,
         timbrado: selectedCompany?.timbrado || '00000000',
         fecha_emision: new Date().toISOString(),
         ...totals,
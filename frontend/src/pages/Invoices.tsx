@@ -6,6 +6,8 @@ import InvoiceForm from '../components/InvoiceForm'
 const statusConfig = {
   draft: { label: 'Borrador', icon: FileText, color: 'bg-gray-100 text-gray-700' },
   pending: { label: 'Pendiente', icon: Clock, color: 'bg-yellow-100 text-yellow-700' },
+  queued: { label: 'En cola', icon: Clock, color: 'bg-yellow-100 text-yellow-700' },
+  sending: { label: 'Enviando', icon: Send, color: 'bg-blue-100 text-blue-700' },
   sent: { label: 'Enviado', icon: Send, color: 'bg-blue-100 text-blue-700' },
   approved: { label: 'Aprobado', icon: CheckCircle, color: 'bg-green-100 text-green-700' },
   rejected: { label: 'Rechazado', icon: XCircle, color: 'bg-red-100 text-red-700' },
@@ -28,7 +28,7 @@ export interface EstablishmentPoint {
 
 // Invoice types
 export type DocumentType = '1' | '2' | '3' | '4' | '5' | '6' | '7'
-export type InvoiceStatus = 'draft' | 'pending' | 'sent' | 'approved' | 'rejected' | 'cancelled'
+export type InvoiceStatus = 'draft' | 'pending' | 'queued' | 'sending' | 'sent' | 'approved' | 'rejected' | 'cancelled'
 
 export interface InvoiceItem {
   id: number
@@ -56,6 +56,9 @@ export interface Invoice {
   receptor_ruc: string
   receptor_nombre: string
   receptor_direccion: string
+  receptor_departamento?: string
+  receptor_distrito?: string
+  receptor_ciudad?: string
   receptor_email: string
   fecha_emision: string
   moneda: string
@@ -67,5 +70,5 @@ export interface Invoice {
   total_iva_5: number
   total: number
   status: InvoiceStatus
-  items: InvoiceItem[]
+  items?: InvoiceItem[]  // list: only with ?expand=items
 }